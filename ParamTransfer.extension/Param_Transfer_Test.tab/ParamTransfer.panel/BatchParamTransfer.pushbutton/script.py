@@ -0,0 +1,56 @@
+import os
+from pyrevit import script, forms
+from pyrevit import revit
+import filemgr
+from param_transfer.batch import run_job_file
+from param_transfer.partition import LEVEL_STATISTICS_COLUMNS
+
+__logger = script.get_logger()
+__output = script.get_output()
+
+# the job file can be passed through the environment for unattended runs,
+# e.g. with "pyrevit run" over a list of models
+JOB_FILE_ENV_VARIABLE = "PARAMTRANSFER_JOB"
+
+job_file_path = os.getenv(JOB_FILE_ENV_VARIABLE) or forms.pick_file(
+    file_ext="json",
+    init_dir=filemgr.get_user_config_path(),
+    title="Select Param Transfer Job to Run",
+)
+
+if not job_file_path:
+    script.exit()
+
+try:
+    summary = run_job_file(revit.doc, job_file_path)
+except Exception as e:
+    __logger.error("Param transfer job {} failed: {}".format(job_file_path, e))
+    script.exit()
+
+__output.print_md("## Param transfer job: {}".format(summary["job"]))
+__output.print_table(
+    [[key, value] for key, value in sorted(summary.items())
+     if key not in ("timings", "counters", "families", "categories", "mappings",
+                    "instances_by_selection", "levels")],
+    columns=["Key", "Value"])
+__output.print_table(
+    [[label, count, len(summary["mappings"].get(label, []))]
+     for label, count in sorted(summary["instances_by_selection"].items())],
+    columns=["Family / Category", "Instances", "Mappings"],
+    title="Per family and category")
+if summary["levels"]:
+    __output.print_table(
+        [[level["level"], level["spaces"], level["instances"],
+          level["assigned"], level["unassigned"]]
+         for level in summary["levels"]],
+        columns=LEVEL_STATISTICS_COLUMNS,
+        title="Per level")
+__output.print_table(
+    [[phase, "{:.3f}".format(seconds)]
+     for phase, seconds in summary["timings"].items()],
+    columns=["Phase", "Seconds"],
+    title="Time per phase")
+__output.print_table(
+    [[name, value] for name, value in sorted(summary["counters"].items())],
+    columns=["Counter", "Value"],
+    title="API calls")
@@ -14,9 +14,42 @@ clr.AddReference('System.Windows.Forms')
 import sys
 import re
 
-
-
-from System.Windows.Controls import ComboBox, ComboBoxItem  # Import ComboBoxItem
+from param_transfer.collection import collect_spaces, collect_selected_instances
+from param_transfer.discovery import discover_family_parameters, sort_parameter_names, name_matches_filter
+from param_transfer.engine import build_aggregation_plan, build_transfer_plan
+from param_transfer.aggregation import AGGREGATE_FUNCTIONS
+from param_transfer.write_plan import apply_write_plan_chunked
+from param_transfer.audit import AuditLog, get_audit_log_path
+from pyrevit.forms import ProgressBar
+from param_transfer.instrumentation import COUNTER_SET, PhaseTimer, append_run_log
+from param_transfer.preview import print_preview, print_timer
+from param_transfer.selection import InstanceSelection, SelectionResolver, SELECTION_CATEGORY, SELECTION_FAMILY
+from param_transfer.fingerprints import FingerprintStore
+from param_transfer.partition import LEVEL_STATISTICS_COLUMNS
+from param_transfer.containment import Containment, CONTAINMENT_POINT, CONTAINMENT_PROJECTED, CONTAINMENT_TOLERANCE, CONTAINMENT_CALCULATION_POINT
+from param_transfer.distribution import Distribution, DISTRIBUTION_EQUAL, DISTRIBUTION_WEIGHTED, ROUNDING_NONE, ROUNDING_LARGEST_REMAINDER
+from param_transfer.space_cache import get_space_geometry
+from param_transfer.linked import SOURCE_SPACES, SOURCE_ROOMS, get_link_name, get_loaded_link_instances, collect_linked_spaces
+
+
+
+from System.Windows.Controls import ComboBox, ComboBoxItem, Button, Grid, ColumnDefinition  # Import ComboBoxItem
+from System.Windows import Thickness, GridLength, GridUnitType, Visibility
+from System.Windows.Data import CollectionViewSource
+from System.Collections.ObjectModel import ObservableCollection
+from System import Predicate, Object, String
+
+# (label, mode) of the split modes offered when dividing by the number of elements
+SPLIT_MODES = [("Equal split", DISTRIBUTION_EQUAL), ("Weighted by MEP param", DISTRIBUTION_WEIGHTED)]
+
+# (label, mode) of the containment modes, the ceiling void is only matched by the last three
+CONTAINMENTS = [("Location point in space", CONTAINMENT_POINT),
+                ("Projected on level of elevation", CONTAINMENT_PROJECTED),
+                ("Vertical tolerance, feet", CONTAINMENT_TOLERANCE),
+                ("Spatial calculation point", CONTAINMENT_CALCULATION_POINT)]
+
+# (label, aggregate) of the transfer directions, aggregation rolls MEP values up into their spaces
+DIRECTIONS = [("Space -> MEP (transfer)", False), ("MEP -> Space (aggregate)", True)]
 
 xamlfile_family_selection = script.get_bundle_file('SelectMEPFamilyType.xaml')
 
@@ -26,434 +59,576 @@ import wpf
 from System import Windows
 
 
-family_instance_parameters = []
-family_instance_parameters_names = []
-params_names_vs_params_objs_dict = {}
-family_instances_of_selected_family = []
+def create_shared_parameter_list(names):
+    # one sorted collection per side, bound by every mapping row
+    shared_list = ObservableCollection[String]()
+    for name in sort_parameter_names(names):
+        shared_list.Add(name)
+    return shared_list
 
-def isMEPInstanceInSpace(MEPInstance_elem, space_elem):
 
-    mep_instance_space_id = MEPInstance_elem.Space.Id
-    space_id = space_elem.Id
+def set_parameter_list_filter(shared_list, filter_text):
+    # the default view is shared by all combo boxes bound to the list
+    view = CollectionViewSource.GetDefaultView(shared_list)
+    if filter_text:
+        view.Filter = Predicate[Object](lambda name: name_matches_filter(name, filter_text))
+    else:
+        view.Filter = None
 
-    return mep_instance_space_id == space_id
 
+def get_ordered_parameter_names(element):
+    return [parameter.Definition.Name for parameter in element.GetOrderedParameters()]
 
 
 class FamilySelectionWindow(Windows.Window):
 
     def __init__(self):
         wpf.LoadComponent(self, xamlfile_family_selection)
-        self.selected_value = None
+        # one InstanceSelection per list item, families first, then whole categories
+        self.selection_options = []
+        self.selections = []
 
     def btn_ok_clicked(self, sender, e):
+        if not self.selections:
+            print("No Item Selected")
+            return
         self.Close()
-        ParameterPairsSelectionWindow(self.selected_value).ShowDialog()
+        ParameterPairsSelectionWindow(self.selections).ShowDialog()
 
-    def populate_combo_box_family_types(self, doc):
+    def populate_list_family_types(self, doc):
         all_MEP_family_types = filtered_collector.OfClass(db.FamilySymbol).ToElements()
 
-        quantity_MEP_Elements = len(all_MEP_family_types)
+        all_family_names = set()
+        category_names = {}
+        for elem in all_MEP_family_types:
+            all_family_names.add(elem.Family.Name)
+            if elem.Category is not None:
+                category_names[elem.Category.Id.IntegerValue] = elem.Category.Name
 
-        all_family_names = list(set([elem.Family.Name for elem in all_MEP_family_types]))
+        for family_name in sorted(all_family_names):
+            self.selection_options.append(InstanceSelection(SELECTION_FAMILY, family_name))
+        for category_id, category_name in sorted(category_names.items(), key=lambda item: item[1]):
+            self.selection_options.append(InstanceSelection(SELECTION_CATEGORY, category_name, category_id))
 
-        for family_name in all_family_names:
-            combobox_item = ComboBoxItem()
-            combobox_item.Content = family_name
-            self.combo_family_type.Items.Add(combobox_item)
-        
-    def comboBoxFamilyTypes_SelectionChanged(self, sender, e):
-        selected_item = self.combo_family_type.SelectedItem
-        if selected_item:
-            self.selected_value = selected_item.Content
-            # print(self.selected_value)
-        else:
-            print("No Item Selected")
+        for selection in self.selection_options:
+            self.list_family_types.Items.Add(selection.label)
+
+    def list_family_types_selection_changed(self, sender, e):
+        # several families and categories, kept in list order
+        selected_labels = set(self.list_family_types.SelectedItems)
+        self.selections = [selection for selection in self.selection_options if selection.label in selected_labels]
 
 
 
 
 class ParameterPairsSelectionWindow(Windows.Window):
 
-    def __init__(self, selected_value):
+    def __init__(self, selections):
         wpf.LoadComponent(self, xamlfile_parameter_pairs_selection)
 
-        self.selected_value = selected_value
+        # selected families and categories, each with its own space -> MEP mapping table
+        self.selections = selections
+        self.current_selection_index = 0
 
         self.selected_family_instances_list = []
 
-        self.selected_value_space_1 = None
-        self.selected_value_MEP_Instance_1 = None
-
-        self.selected_value_space_2 = None
-        self.selected_value_MEP_Instance_2 = None
-
-        self.selected_value_space_3 = None
-        self.selected_value_MEP_Instance_3 = None
-
-        self.selected_value_space_4 = None
-        self.selected_value_MEP_Instance_4 = None
+        # parameter names shared by all rows of the mapping tables
+        space_parameter_names = []
 
         self.should_divide_by_number_MEP_elements_in_space = False
-
-        MEP_family_name = self.selected_value
-        # Collect all Families in the Document
-        family_collector = DB.FilteredElementCollector(doc).OfClass(DB.Family)
-        # Collect all Spaces and Rooms in the Active View
-        spaces_collector = DB.FilteredElementCollector(doc, doc.ActiveView.Id).OfClass(DB.SpatialElement)
-
-        # # DeBugging (commented)
-        # for f in family_collector:
-        #     print("Family_Name: ".format(f.Name))
-        # print("Family Collector", list(family_collector.ToElements()))
-
-        # Collect only Families which were selected from Combo Box in the First Popup Window
-        MEP_families = [f for f in family_collector if f.Name == MEP_family_name]
-
-        # Transform Filtered Collector to Elements
-        spatial_elements = spaces_collector.ToElements()
-       
-
-        # # DeBugging (commented)
-        # for spatial_family in spatial_elements:
-        #     print("Spatial Element Type {}".format(spatial_family.SpatialElementType))
-
-        # separate Spaces from Rooms
-        self.spaces_elements = [spatial_elem for spatial_elem in spatial_elements if spatial_elem.SpatialElementType == DB.SpatialElementType.Space]
+        self.split_mode = DISTRIBUTION_EQUAL
+        self.weight_parameter_name = None
+        self.should_round_split_parts = False
+        self.rounding_decimals = 0
+        self.containment_mode = CONTAINMENT_POINT
+        self.vertical_tolerance = 0.0
+        self.should_transfer_changes_only = False
+        self.should_transfer_whole_document = False
+        self.should_append_run_log = False
+        self.should_write_audit_log = False
+        self.should_aggregate = False
+
+        # aggregate function combo of every mapping row, only shown while aggregating
+        self.function_combos = []
+
+        # spaces and instances of all levels, collected on first use
+        self.document_spaces = None
+        self.document_family_instances = None
+
+        self.preview_plan = None
+        self.preview_settings = None
+        self.preview_fingerprints = None
+
+        # (label, link instance, spaces or rooms) of every selectable space source, host model first
+        self.space_sources = [("Host model - Spaces", None, SOURCE_SPACES)]
+        for link_instance in get_loaded_link_instances(doc):
+            for source in (SOURCE_SPACES, SOURCE_ROOMS):
+                self.space_sources.append(
+                    ("{} - {}".format(get_link_name(link_instance), source.capitalize()), link_instance, source))
+        # LinkedSpaceSource of the selected link, None for host spaces
+        self.linked_source = None
+
+        # Collect all Spaces in the Active View
+        self.spaces_elements = collect_spaces(doc, doc.ActiveView.Id)
         print("So many spaces: {}".format(len(self.spaces_elements)))
 
         # populate Combo Boxes for Spaces
         if self.spaces_elements:
-            self.spaces_params = list(self.spaces_elements[0].GetOrderedParameters())
-            for space_param in self.spaces_params:
-                space_param_name = space_param.Definition.Name
-                combobox_item_spaces_1 = ComboBoxItem()
-                combobox_item_spaces_2 = ComboBoxItem()
-                combobox_item_spaces_3 = ComboBoxItem()
-                combobox_item_spaces_4 = ComboBoxItem()
-                combobox_item_spaces_1.Content = space_param_name
-                combobox_item_spaces_2.Content = space_param_name
-                combobox_item_spaces_3.Content = space_param_name
-                combobox_item_spaces_4.Content = space_param_name
-                self.combo_parameter_from_space_1.Items.Add(combobox_item_spaces_1)
-                self.combo_parameter_from_space_2.Items.Add(combobox_item_spaces_2)
-                self.combo_parameter_from_space_3.Items.Add(combobox_item_spaces_3)
-                self.combo_parameter_from_space_4.Items.Add(combobox_item_spaces_4)
+            space_parameter_names.extend(get_ordered_parameter_names(self.spaces_elements[0]))
+        elif len(self.space_sources) > 1:
+            print("No spaces in the active view, select a linked model as space source.")
         else:
             print("No spaces elements. Something went wrong. EXIT PROGRAM")
             sys.exit()
             self.Close()
 
 
-        if MEP_families:
-            for MEP_family in MEP_families:
-                # Get the ElementId of the selected family
-                family_ids = list(MEP_family.GetFamilySymbolIds())
-
-                # # DeBugging (commented)
-                # print(type(family_ids))
-                # print(family_ids)
-
-                
-
-                # Define the filter for FamilyInstances of the selected family
-                for family_id in family_ids:
-
-                    # setup family instance filter, it uses FamilySymbolIds
-                    family_instance_filter = DB.FamilyInstanceFilter(doc, family_id)
-
-                    # Get all family instances of the selected family
-                    family_instance_collector = DB.FilteredElementCollector(doc, doc.ActiveView.Id).WherePasses(family_instance_filter)
-                    mep_family_Instances = family_instance_collector.ToElements()
-
-                    self.selected_family_instances_list += mep_family_Instances
-
-                    # family_instances_of_selected_family += mep_family_Instances
-
-                    # print("Len Family Instancies MEP: {}".format(len(mep_family_Instances)))
-
-                    for family_instance in mep_family_Instances:
-                        for param in family_instance.Parameters:
-                            if param not in family_instance_parameters:
-                                param_name = param.Definition.Name
-
-
-                                # Populate param names dictionary, to find each param on its Definition.Name
-                                if param_name not in params_names_vs_params_objs_dict:
-                                    params_names_vs_params_objs_dict[param_name] = [param]
-                                else:
-                                    temp_list_params = params_names_vs_params_objs_dict[param_name]
-                                    temp_list_params.append(param)
-                                    params_names_vs_params_objs_dict[param_name] = temp_list_params
-                                
-
-                                # Populate Combo Boxes
-                                if param_name not in family_instance_parameters_names:
-                                    family_instance_parameters_names.append(param_name)
-                                    combobox_item_1 = ComboBoxItem()
-                                    combobox_item_2 = ComboBoxItem()
-                                    combobox_item_3 = ComboBoxItem()
-                                    combobox_item_4 = ComboBoxItem()
-                                    combobox_item_1.Content = param_name
-                                    combobox_item_2.Content = param_name
-                                    combobox_item_3.Content = param_name
-                                    combobox_item_4.Content = param_name
-                                    self.combo_param_to_1.Items.Add(combobox_item_1)
-                                    self.combo_param_to_2.Items.Add(combobox_item_2)
-                                    self.combo_param_to_3.Items.Add(combobox_item_3)
-                                    self.combo_param_to_4.Items.Add(combobox_item_4)
-
-                    # print("So many Instances of {}: {} ".format(family_id, len(my_family_instances)))
-
-                # Now you can process the family instances as needed
-                for my_family_instance in mep_family_Instances:
-                    # Do something with each family instance
-                    pass
+        # Collect all instances of the Families and Categories which were selected in the First Popup Window
+        # in one collector pass over all of their types
+        # collection and discovery run once per window, their timings are reported with every run
+        self.setup_timer = PhaseTimer()
+        with self.setup_timer.phase("Collection"):
+            self.selected_family_instances_list = collect_selected_instances(doc, self.selections, doc.ActiveView.Id)
+            # the selection, and so the mapping table, of every instance is resolved once per family type
+            self.selection_resolver = SelectionResolver(doc, self.selections)
+            self.selection_resolver.add_instances(self.selected_family_instances_list)
+        print("Collected {} instances of {} in {:.3f} s".format(
+            len(self.selected_family_instances_list), ", ".join(self.get_selection_labels()), self.setup_timer.total))
+
+        # one instance parameter list per selection, weights can be instance or type parameters of any of them
+        self.instance_parameter_names_by_selection = []
+        weight_parameter_names = []
+        with self.setup_timer.phase("Parameter discovery"):
+            for index, selection in enumerate(self.selections):
+                selection_instances = self.selection_resolver.get_instances(self.selected_family_instances_list, index)
+                if not selection_instances:
+                    print("{} not found.".format(selection.label))
+                    self.instance_parameter_names_by_selection.append(create_shared_parameter_list([]))
+                    continue
+                # names come from one instance per family type and the type itself, cached per view and family or category
+                discovered_parameters = discover_family_parameters(doc, selection.label, selection_instances,
+                                                                   doc.ActiveView.Id)
+                self.instance_parameter_names_by_selection.append(
+                    create_shared_parameter_list(discovered_parameters.instance_names))
+                weight_parameter_names += discovered_parameters.instance_names + discovered_parameters.type_names
+
+        # sorted once, every row binds to the same virtualized, filterable list
+        self.space_parameter_names = create_shared_parameter_list(space_parameter_names)
+
+        for label, _, _ in self.space_sources:
+            self.combo_space_source.Items.Add(label)
+        self.combo_space_source.SelectedIndex = 0
+
+        for label, _ in CONTAINMENTS:
+            self.combo_containment.Items.Add(label)
+        self.combo_containment.SelectedIndex = 0
+
+        for label, _ in SPLIT_MODES:
+            self.combo_split_mode.Items.Add(label)
+        self.combo_split_mode.SelectedIndex = 0
+        self.combo_weight_parameter.ItemsSource = create_shared_parameter_list(weight_parameter_names)
+
+        for label, _ in DIRECTIONS:
+            self.combo_direction.Items.Add(label)
+        self.combo_direction.SelectedIndex = 0
+
+        # the mapping rows of one selection are shown at a time, the first one to begin with
+        for label in self.get_selection_labels():
+            self.combo_mapping_selection.Items.Add(label)
+        self.combo_mapping_selection.SelectedIndex = 0
+
+    @property
+    def mapping_table(self):
+        # space -> MEP parameter pairs of the shown selection, any number of rows
+        return self.selections[self.current_selection_index].mapping_table
+
+    @property
+    def instance_parameter_names(self):
+        return self.instance_parameter_names_by_selection[self.current_selection_index]
+
+    def get_selection_labels(self):
+        return [selection.label for selection in self.selections]
+
+    def combo_mapping_selection_changed(self, sender, e):
+        # the rows of the other selections are kept in their mapping tables
+        self.current_selection_index = max(0, self.combo_mapping_selection.SelectedIndex)
+        self.panel_mappings.Children.Clear()
+        self.function_combos = []
+        if not len(self.mapping_table):
+            self.mapping_table.add()
+        for mapping in self.mapping_table:
+            self.add_mapping_row(mapping)
+
+    def combo_space_source_changed(self, sender, e):
+        label, link_instance, source = self.space_sources[self.combo_space_source.SelectedIndex]
+
+        if link_instance is None:
+            self.linked_source = None
+            spaces = self.spaces_elements
         else:
-            print("Family {} not found.".format(MEP_family_name))
+            # the link transform is applied once when the index is built
+            self.linked_source = collect_linked_spaces(link_instance, source)
+            spaces = self.linked_source.spaces
+            print("{}: {} {}".format(label, len(spaces), source))
+
+        self.space_parameter_names.Clear()
+        if spaces:
+            for name in sort_parameter_names(get_ordered_parameter_names(spaces[0])):
+                self.space_parameter_names.Add(name)
+        self.preview_plan = None
+
+    def add_mapping_row(self, mapping):
+        # one row editor per mapping, all rows share the same parameter name lists
+        # editable, type-to-search and a virtualized drop down come from the ComboBox style in SelectParams.xaml
+
+        row = Grid()
+        row.Margin = Thickness(0, 2, 0, 2)
+        row.ColumnDefinitions.Add(ColumnDefinition(Width=GridLength(43, GridUnitType.Star)))
+        row.ColumnDefinitions.Add(ColumnDefinition(Width=GridLength(95, GridUnitType.Star)))
+        row.ColumnDefinitions.Add(ColumnDefinition(Width=GridLength.Auto))
+        row.ColumnDefinitions.Add(ColumnDefinition(Width=GridLength.Auto))
+
+        combo_space = ComboBox()
+        combo_space.ItemsSource = self.space_parameter_names
+        combo_space.SelectedItem = mapping.source
+        combo_space.Margin = Thickness(0, 0, 4, 0)
+        Grid.SetColumn(combo_space, 0)
+
+        combo_MEP = ComboBox()
+        combo_MEP.ItemsSource = self.instance_parameter_names
+        combo_MEP.SelectedItem = mapping.target
+        Grid.SetColumn(combo_MEP, 1)
+
+        combo_function = ComboBox()
+        combo_function.IsEditable = False
+        for function in AGGREGATE_FUNCTIONS:
+            combo_function.Items.Add(function)
+        combo_function.SelectedItem = mapping.function
+        combo_function.Margin = Thickness(4, 0, 0, 0)
+        combo_function.Visibility = Visibility.Visible if self.should_aggregate else Visibility.Collapsed
+        Grid.SetColumn(combo_function, 2)
+
+        btn_remove = Button()
+        btn_remove.Content = "X"
+        btn_remove.Margin = Thickness(4, 0, 0, 0)
+        btn_remove.Padding = Thickness(6, 0, 6, 0)
+        Grid.SetColumn(btn_remove, 3)
+
+        def combo_space_selection_changed(sender, e):
+            # a filter hiding the selected name clears the selection but keeps the text
+            if combo_space.SelectedItem is not None or not combo_space.Text:
+                mapping.source = combo_space.SelectedItem
+
+        def combo_MEP_selection_changed(sender, e):
+            if combo_MEP.SelectedItem is not None or not combo_MEP.Text:
+                mapping.target = combo_MEP.SelectedItem
+
+        def combo_function_selection_changed(sender, e):
+            mapping.function = combo_function.SelectedItem
+
+        def btn_remove_clicked(sender, e):
+            self.mapping_table.remove(mapping)
+            self.function_combos.remove(combo_function)
+            self.panel_mappings.Children.Remove(row)
+
+        combo_space.SelectionChanged += combo_space_selection_changed
+        combo_MEP.SelectionChanged += combo_MEP_selection_changed
+        combo_function.SelectionChanged += combo_function_selection_changed
+        btn_remove.Click += btn_remove_clicked
+
+        row.Children.Add(combo_space)
+        row.Children.Add(combo_MEP)
+        row.Children.Add(combo_function)
+        row.Children.Add(btn_remove)
+        self.function_combos.append(combo_function)
+        self.panel_mappings.Children.Add(row)
+
+    def btn_add_mapping_clicked(self, sender, e):
+        self.add_mapping_row(self.mapping_table.add())
+
+    def tb_parameter_filter_changed(self, sender, e):
+        filter_text = self.tb_parameter_filter.Text
+        set_parameter_list_filter(self.space_parameter_names, filter_text)
+        for instance_parameter_names in self.instance_parameter_names_by_selection:
+            set_parameter_list_filter(instance_parameter_names, filter_text)
 
         
 
-    def transfer_parameters(self, space_elem, MEP_instance, space_parameter_name, MEP_instance_parameter_name, number_MEP_elems_in_space):
+    def get_transfer_settings(self):
+        # everything the write plan depends on, a preview is only reused while this does not change
+        distribution = self.get_distribution()
+        return (self.should_aggregate,
+                tuple(repr(aggregation) for selection in self.selections
+                      for aggregation in selection.mapping_table.aggregations()),
+                tuple(tuple(selection.mapping_table.pairs()) for selection in self.selections),
+                tuple(distribution.as_tokens()) if distribution is not None else None,
+                tuple(self.get_containment().as_tokens()),
+                self.should_transfer_changes_only, self.should_transfer_whole_document,
+                self.combo_space_source.SelectedIndex)
+
+    def get_distribution(self):
+        # None while values are not divided, raises KeyError for a weighted split without weight parameter
+        if not self.should_divide_by_number_MEP_elements_in_space:
+            return None
+        return Distribution(self.split_mode,
+                            self.weight_parameter_name,
+                            ROUNDING_LARGEST_REMAINDER if self.should_round_split_parts else ROUNDING_NONE,
+                            self.rounding_decimals)
+
+    def get_containment(self):
+        # which point of the instances is matched and how the height of the spaces is tested
+        return Containment(self.containment_mode, self.vertical_tolerance)
+
+    def get_transfer_elements(self):
+        # (spaces, instances) of the active view, or of the whole document collected once
+        if not self.should_transfer_whole_document:
+            return self.spaces_elements, self.selected_family_instances_list
+        if self.document_spaces is None:
+            self.document_spaces = collect_spaces(doc)
+            self.document_family_instances = collect_selected_instances(doc, self.selections)
+            self.selection_resolver.add_instances(self.document_family_instances)
+            print("Whole document: {} spaces, {} instances".format(
+                len(self.document_spaces), len(self.document_family_instances)))
+        return self.document_spaces, self.document_family_instances
+
+    def get_space_geometry(self):
+        # boundaries and indexes of the host spaces are kept for the session, dropped when spaces change
+        if self.linked_source is not None:
+            return None
+        return get_space_geometry(doc)
+
+    def build_write_plan(self, timer):
+
+        if self.should_aggregate:
+            return self.build_aggregation_plan(timer), None
+
+        # fingerprints of the last run, only committed once the plan was applied
+        fingerprints = None
+        if self.should_transfer_changes_only:
+            fingerprints = FingerprintStore.for_document(doc)
+
+        spaces, instances = self.get_transfer_elements()
+
+        plan, assignment = build_transfer_plan(doc,
+                                               spaces,
+                                               instances,
+                                               [],
+                                               distribution=self.get_distribution(),
+                                               timer=timer,
+                                               fingerprints=fingerprints,
+                                               partition_by_level=self.should_transfer_whole_document,
+                                               linked_source=self.linked_source,
+                                               space_geometry=self.get_space_geometry(),
+                                               fn_get_mapping_key=self.selection_resolver.get_index,
+                                               pairs_by_key=self.selection_resolver.get_pairs_by_index(),
+                                               containment=self.get_containment())
+
+        print("Instances matched by phase: {}, by geometry: {}, unassigned: {}".format(
+            assignment.matched_by_phase, assignment.matched_by_geometry, len(assignment.unassigned)))
+        if assignment.level_statistics:
+            output.print_table([statistics.as_row() for statistics in assignment.level_statistics],
+                               columns=LEVEL_STATISTICS_COLUMNS, title="Per level")
+        if fingerprints is not None:
+            print("Instances unchanged since last run: {}".format(fingerprints.unchanged_count))
+
+        return plan, fingerprints
+
+    def build_aggregation_plan(self, timer):
+        # MEP values rolled up into the host spaces, linked spaces can not be written
+        if self.linked_source is not None:
+            raise KeyError("Aggregation into spaces of a linked model is not supported")
+
+        spaces, instances = self.get_transfer_elements()
+
+        plan, assignment = build_aggregation_plan(doc,
+                                                  spaces,
+                                                  instances,
+                                                  [],
+                                                  timer=timer,
+                                                  partition_by_level=self.should_transfer_whole_document,
+                                                  space_geometry=self.get_space_geometry(),
+                                                  fn_get_mapping_key=self.selection_resolver.get_index,
+                                                  aggregations_by_key=self.selection_resolver.get_aggregations_by_index(),
+                                                  containment=self.get_containment())
+
+        print("Instances matched by phase: {}, by geometry: {}, unassigned: {}".format(
+            assignment.matched_by_phase, assignment.matched_by_geometry, len(assignment.unassigned)))
+        if assignment.level_statistics:
+            output.print_table([statistics.as_row() for statistics in assignment.level_statistics],
+                               columns=LEVEL_STATISTICS_COLUMNS, title="Per level")
+
+        return plan
+
+    def create_run_timer(self):
+        timer = PhaseTimer()
+        timer.durations.extend(self.setup_timer.durations)
+        return timer
+
+    def btn_preview_clicked(self, sender, e):
+
+        print("Preview in Progress ... ")
+
+        timer = self.create_run_timer()
+        try:
+            plan, fingerprints = self.build_write_plan(timer)
+        except Exception as error:
+            print("ERROR: ", error)
+            return
+
+        # keep the plan, "Apply" commits it without recomputing
+        self.preview_plan = plan
+        self.preview_settings = self.get_transfer_settings()
+        self.preview_fingerprints = fingerprints
 
-        if space_parameter_name is not None and MEP_instance_parameter_name is not None:
+        print_preview(output, plan, timer)
 
-            space_parameter = space_elem.LookupParameter(space_parameter_name)
-            MEP_parameter = MEP_instance.LookupParameter(MEP_instance_parameter_name)
+    def btn_ok_clicked(self, sender, e):
 
-            if (MEP_parameter is not None) and (space_parameter is not None):
+        print("In Progress ... ")
 
-                if number_MEP_elems_in_space > 1 and self.should_divide_by_number_MEP_elements_in_space:
-                    divided_space_parameter_as_value_string = self.divide_by_MEP_elements_number_if_possible(parameter_as_value_string=space_parameter.AsValueString(), MEP_elem_number_in_space=number_MEP_elems_in_space)
-                    MEP_parameter.Set(divided_space_parameter_as_value_string)
-                else:
-                # print("Transaction fire up: MEP instance param: {}; space param: {}".format(MEP_instance_parameter_name, space_parameter_name))
-                    MEP_parameter.Set(space_parameter.AsValueString())
-                
-                #print("Transaction committed")
+        timer = self.create_run_timer()
+        try:
+            if self.preview_plan is not None and self.preview_settings == self.get_transfer_settings():
+                plan, fingerprints = self.preview_plan, self.preview_fingerprints
             else:
-                pass
-                #print("MEP and/or space parameter do not exist")
-        else:
-            pass
-            #print("Parameter not filled")
+                plan, fingerprints = self.build_write_plan(timer)
+            # every changed value is streamed to the audit log, which is only kept if the writes are committed
+            audit_log = AuditLog(get_audit_log_path(doc)) if self.should_write_audit_log else None
+            # chunks of transactions in one group, rolled back as a whole on cancel or error
+            with timer.phase("Writing"):
+                with ProgressBar(cancellable=True, title='Writing parameters... ({value} of {max_value})') as pb:
+                    summary = apply_write_plan_chunked(doc, plan, "Param transfer CUSTOM", progress_bar=pb,
+                                                       audit_log=audit_log)
+        except Exception as error:
+            print("ERROR: ", error)
+            print("Nothing was written, all changes were rolled back.")
+            return
 
+        if summary.cancelled:
+            print(summary)
+            return
 
+        if fingerprints is not None:
+            fingerprints.commit(summary.failed_unique_ids)
+            fingerprints.save()
 
-    def btn_ok_clicked(self, sender, e):
+        timer.count(COUNTER_SET, summary.applied_count + summary.failed_count)
 
-        counter_matches = 0
+        print("Work done successfully!")
 
-        t = DB.Transaction(doc, "Param transfer CUSTOM")
-        t.Start()
+        print("Number of changed {}: {}".format("spaces" if self.should_aggregate else "instances",
+                                                len(plan.element_ids)))
+        print(summary)
+        if audit_log is not None:
+            print("{} changed values written to {}".format(audit_log.row_count, audit_log.file_path))
+        print_timer(output, timer)
+
+        if self.should_append_run_log:
+            log_file_path = append_run_log(timer.as_record(source="window",
+                                                           document=doc.Title,
+                                                           families=self.get_selection_labels(),
+                                                           instances=len(self.selected_family_instances_list),
+                                                           writes_applied=summary.applied_count))
+            print("Run appended to {}".format(log_file_path))
 
-        closed = False
+        self.Close()
 
-        print("In Progress ... ")
+    
+    def handle_checked_division_by_MEP_elem_number(self, sender, e):
 
+        self.should_divide_by_number_MEP_elements_in_space = True
 
+        # print("self.should_divide_by_number_MEP_elements_in_space: ", self.should_divide_by_number_MEP_elements_in_space)
+    
+    def handle_unchecked_division_by_MEP_elem_number(self, sender, e):
 
+        self.should_divide_by_number_MEP_elements_in_space = False
 
+        # print("self.should_divide_by_number_MEP_elements_in_space: ", self.should_divide_by_number_MEP_elements_in_space)
 
-        try: 
-            
-
-            for space_elem in self.spaces_elements:
-
-                MEP_elem_number_in_space = 0
-
-                list_MEP_instances_in_space = []
-
-                for MEP_instance in self.selected_family_instances_list:
-                    phase = list(doc.Phases)[-1]  # retrieve the last phase of the project
-                    # print("MEP Instance Space type: {}".format(type(MEP_instance.Space[phase])))
-                    
-                    # if MEP_instance.Space[phase] is not None:
-                    #     mep_location_space_id = MEP_instance.Space[phase].Id
-                    # else:
-                    #     mep_location_space_id = MEP_instance.Space.Id
-                    mep_location_point = MEP_instance.Location.Point
-                    #print("SPACE: ", space_elem)
-                    if space_elem.IsPointInSpace(mep_location_point):
-                        list_MEP_instances_in_space.append(MEP_instance)
-                        MEP_elem_number_in_space += 1
-
-
-                for MEP_instance in list_MEP_instances_in_space:
-                    
-                    phase = list(doc.Phases)[-1]  # retrieve the last phase of the project
-                    # print("MEP Instance Space type: {}".format(type(MEP_instance.Space[phase])))
-                    
-                    # if MEP_instance.Space[phase] is not None:
-                    #     mep_location_space_id = MEP_instance.Space[phase].Id
-                    # else:
-                    #     mep_location_space_id = MEP_instance.Space.Id
-                    mep_location_point = MEP_instance.Location.Point
-                    #print("SPACE: ", space_elem)
-                  
-
-                    counter_matches += 1
-
-                    self.transfer_parameters(space_elem=space_elem, MEP_instance=MEP_instance,
-                                            space_parameter_name=self.selected_value_space_1, 
-                                            MEP_instance_parameter_name=self.selected_value_MEP_Instance_1, number_MEP_elems_in_space=MEP_elem_number_in_space)
-                    
-                    self.transfer_parameters(space_elem=space_elem, MEP_instance=MEP_instance,
-                                            space_parameter_name=self.selected_value_space_2, 
-                                            MEP_instance_parameter_name=self.selected_value_MEP_Instance_2, number_MEP_elems_in_space=MEP_elem_number_in_space)
-                    
-                    self.transfer_parameters(space_elem=space_elem, MEP_instance=MEP_instance,
-                                            space_parameter_name=self.selected_value_space_3, 
-                                            MEP_instance_parameter_name=self.selected_value_MEP_Instance_3, number_MEP_elems_in_space=MEP_elem_number_in_space)
-                    
-                    self.transfer_parameters(space_elem=space_elem, MEP_instance=MEP_instance,
-                                            space_parameter_name=self.selected_value_space_4, 
-                                            MEP_instance_parameter_name=self.selected_value_MEP_Instance_4, number_MEP_elems_in_space=MEP_elem_number_in_space)
-        
+    def combo_direction_changed(self, sender, e):
 
-        except Exception as error:
-            print("ERROR: ", error)
-            t.Commit()
-            self.Close()
-            closed = True
-                    # print("Match")
-        if not closed:
-            t.Commit()
-            self.Close()
+        self.should_aggregate = DIRECTIONS[self.combo_direction.SelectedIndex][1]
+        visibility = Visibility.Visible if self.should_aggregate else Visibility.Collapsed
+        for combo_function in self.function_combos:
+            combo_function.Visibility = visibility
+        if self.should_aggregate:
+            self.label_space_header.Content = "Space param to write"
+            self.label_MEP_header.Content = "MEP param to aggregate"
+        else:
+            self.label_space_header.Content = "Param to copy from Space"
+            self.label_MEP_header.Content = "Param to copy to MEP"
+        # split, rounding and changes only apply to transfers
+        for control in (self.CheckBoxDivide, self.combo_split_mode, self.CheckBoxRounding, self.CheckBoxIncremental):
+            control.IsEnabled = not self.should_aggregate
 
-        print("Work done successfully!")
-                    
-        print("Number of changed instances: {}". format(counter_matches))
-        
-        
-        self.Close()
+    def combo_split_mode_changed(self, sender, e):
 
-    
-    def combobox_item_spaces_1_SelectionChanged(self, sender, e):
-        selected_item = self.combo_parameter_from_space_1.SelectedItem
-        if selected_item:
-            self.selected_value_space_1 = selected_item.Content
-            # print(self.selected_value)
-        else:
-            print("No Item Selected")
-    
-    def combobox_item_spaces_2_SelectionChanged(self, sender, e):
-        selected_item = self.combo_parameter_from_space_2.SelectedItem
-        if selected_item:
-            self.selected_value_space_2 = selected_item.Content
-            # print(self.selected_value)
-        else:
-            print("No Item Selected")
+        self.split_mode = SPLIT_MODES[self.combo_split_mode.SelectedIndex][1]
+        self.combo_weight_parameter.IsEnabled = self.split_mode == DISTRIBUTION_WEIGHTED
 
-    def combobox_item_spaces_3_SelectionChanged(self, sender, e):
-        selected_item = self.combo_parameter_from_space_3.SelectedItem
-        if selected_item:
-            self.selected_value_space_3 = selected_item.Content
-            # print(self.selected_value)
-        else:
-            print("No Item Selected")
-    
-    def combobox_item_spaces_4_SelectionChanged(self, sender, e):
-        selected_item = self.combo_parameter_from_space_4.SelectedItem
-        if selected_item:
-            self.selected_value_space_4 = selected_item.Content
-            # print(self.selected_value)
-        else:
-            print("No Item Selected")
+    def combo_containment_changed(self, sender, e):
 
+        self.containment_mode = CONTAINMENTS[self.combo_containment.SelectedIndex][1]
+        self.tb_vertical_tolerance.IsEnabled = self.containment_mode == CONTAINMENT_TOLERANCE
 
-    def combobox_item_MEP_1_SelectionChanged(self, sender, e):
-        selected_item = self.combo_param_to_1.SelectedItem
-        if selected_item:
-            self.selected_value_MEP_Instance_1 = selected_item.Content
-            # print(self.selected_value)
-        else:
-            print("No Item Selected")
+    def tb_vertical_tolerance_changed(self, sender, e):
 
-    def combobox_item_MEP_2_SelectionChanged(self, sender, e):
-        selected_item = self.combo_param_to_2.SelectedItem
-        if selected_item:
-            self.selected_value_MEP_Instance_2 = selected_item.Content
-            # print(self.selected_value)
-        else:
-            print("No Item Selected")
+        try:
+            self.vertical_tolerance = max(0.0, float(self.tb_vertical_tolerance.Text))
+        except ValueError:
+            self.vertical_tolerance = 0.0
 
-    def combobox_item_MEP_3_SelectionChanged(self, sender, e):
-        selected_item = self.combo_param_to_3.SelectedItem
-        if selected_item:
-            self.selected_value_MEP_Instance_3 = selected_item.Content
-            # print(self.selected_value)
-        else:
-            print("No Item Selected")
+    def combo_weight_parameter_changed(self, sender, e):
 
-    def combobox_item_MEP_4_SelectionChanged(self, sender, e):
-        selected_item = self.combo_param_to_4.SelectedItem
-        if selected_item:
-            self.selected_value_MEP_Instance_4 = selected_item.Content
-            # print(self.selected_value)
-        else:
-            print("No Item Selected")
+        self.weight_parameter_name = self.combo_weight_parameter.SelectedItem
 
+    def handle_checked_rounding(self, sender, e):
 
-    def handle_checked_division_by_MEP_elem_number(self, sender, e):
+        self.should_round_split_parts = True
 
-        self.should_divide_by_number_MEP_elements_in_space = True
+    def handle_unchecked_rounding(self, sender, e):
 
-        # print("self.should_divide_by_number_MEP_elements_in_space: ", self.should_divide_by_number_MEP_elements_in_space)
-    
-    def handle_unchecked_division_by_MEP_elem_number(self, sender, e):
+        self.should_round_split_parts = False
 
-        self.should_divide_by_number_MEP_elements_in_space = False
+    def tb_rounding_decimals_changed(self, sender, e):
 
-        # print("self.should_divide_by_number_MEP_elements_in_space: ", self.should_divide_by_number_MEP_elements_in_space)
-    
-    def divide_by_MEP_elements_number_if_possible(self, parameter_as_value_string, MEP_elem_number_in_space):
+        try:
+            self.rounding_decimals = max(0, int(self.tb_rounding_decimals.Text))
+        except ValueError:
+            self.rounding_decimals = 0
 
-        re_pattern = r'\d+,\d+|\d+\.\d+|\d+'
+    def handle_checked_incremental(self, sender, e):
 
-        numbers = re.findall(pattern=re_pattern, string=parameter_as_value_string)
+        self.should_transfer_changes_only = True
 
-        print("Numbers recognized", numbers)
+    def handle_unchecked_incremental(self, sender, e):
 
-        last_number_position = re.search(pattern=re_pattern, string=parameter_as_value_string).end()
+        self.should_transfer_changes_only = False
 
-        string_part = parameter_as_value_string[last_number_position:]
+    def handle_checked_run_log(self, sender, e):
 
-        # if numbers is defined, take only the first [0]th element because of possible numbers in the unit names like m2
-        # consider CheckBox' state
-        if numbers is not None and self.should_divide_by_number_MEP_elements_in_space:
-            number_part = numbers[0]
-            # if comma is used as decimal separator, replace it by a decimal point
-            number_part = number_part.replace(",", ".")
-            # check if the string is a correct number
-            if number_part.isnumeric():
+        self.should_append_run_log = True
 
-                float_number_part = float(number_part)
-                result_float_number_part = float_number_part / MEP_elem_number_in_space
+    def handle_unchecked_run_log(self, sender, e):
 
-                # concatenate new number and string part
-                new_parameter_as_value_string = str(result_float_number_part) + string_part
+        self.should_append_run_log = False
 
-                return new_parameter_as_value_string
-            else:
-                return parameter_as_value_string
-        else:
-            return parameter_as_value_string
-        
+    def handle_checked_audit_log(self, sender, e):
 
+        self.should_write_audit_log = True
 
-        
-            
-        
-        
+    def handle_unchecked_audit_log(self, sender, e):
 
+        self.should_write_audit_log = False
 
+    def handle_checked_whole_document(self, sender, e):
 
+        self.should_transfer_whole_document = True
 
-    
-    
+    def handle_unchecked_whole_document(self, sender, e):
 
-        
+        self.should_transfer_whole_document = False
 
 
 
@@ -462,6 +637,7 @@ class ParameterPairsSelectionWindow(Windows.Window):
 if __name__ == "__main__":
     doc = revit.doc
     uidoc = HOST_APP.uidoc
+    output = script.get_output()
     filtered_collector = DB.FilteredElementCollector(doc)
 
     # all_MEPFamilyTypes = DB.FilteredElementCollector(doc, doc.ActiveView.Id).OfCategory(db.BuiltInCategory.OST_DuctAccessory).ToElements()
@@ -480,7 +656,7 @@ if __name__ == "__main__":
     # all_family_types = list(set([elem.GetTypeId() for elem in all_MEP_family_types]))
 
     my_window_obj = FamilySelectionWindow()
-    my_window_obj.populate_combo_box_family_types(doc)
+    my_window_obj.populate_list_family_types(doc)
     my_window_obj.ShowDialog()
 
     # MyWindow().ShowDialog()
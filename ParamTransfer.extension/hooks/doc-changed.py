@@ -0,0 +1,7 @@
+"""Drop the cached space geometry and parameter names changed in the document"""
+from pyrevit import EXEC_PARAMS
+
+from param_transfer import discovery, space_cache
+
+space_cache.on_document_changed(EXEC_PARAMS.event_args)
+discovery.on_document_changed(EXEC_PARAMS.event_args)
@@ -0,0 +1,13 @@
+"""
+Drop everything cached for the synchronized document, the changes of
+others are not reported element by element
+"""
+from pyrevit import EXEC_PARAMS
+
+from param_transfer.discovery import clear_discovery_cache
+from param_transfer.session import get_document_key
+from param_transfer.space_cache import clear_space_geometry_cache
+
+document_key = get_document_key(EXEC_PARAMS.event_args.Document)
+clear_space_geometry_cache(document_key)
+clear_discovery_cache(document_key)
@@ -0,0 +1,180 @@
+"""
+Reverse direction of the parameter transfer: roll instance values up into
+the spaces they are assigned to.
+
+The instance -> space assignment is the same as for the transfer. Every
+space group is visited once and all aggregations of the run are computed
+from it, the results go through the same write plan, diff and chunked write
+engine.
+
+Families or categories that share a mapping are aggregated together, e.g.
+the airflow of diffusers and grilles is summed into one space parameter.
+Every space parameter can only be the target of one mapping.
+"""
+from collections import OrderedDict
+
+from param_transfer.assignment import element_key
+from param_transfer.division import DEFAULT_NUMBER_FORMAT, format_number, parse_number
+from param_transfer.values import STORAGE_DOUBLE, STORAGE_INTEGER, STORAGE_STRING, get_spec_type_id, get_storage_type, read_native
+
+AGGREGATE_SUM = "sum"
+AGGREGATE_MIN = "min"
+AGGREGATE_MAX = "max"
+AGGREGATE_COUNT = "count"
+AGGREGATE_MEAN = "mean"
+AGGREGATE_FUNCTIONS = (AGGREGATE_SUM, AGGREGATE_MIN, AGGREGATE_MAX,
+                       AGGREGATE_COUNT, AGGREGATE_MEAN)
+
+
+class AggregationMapping(object):
+    """Aggregate `source` of the instances into `target` of their space"""
+
+    def __init__(self, source, target, function=AGGREGATE_SUM):
+        # type: (str, str, str) -> None
+        if function not in AGGREGATE_FUNCTIONS:
+            raise KeyError(
+                "Aggregate function {} is not supported".format(function))
+        self.source = source
+        self.target = target
+        self.function = function
+
+    def __repr__(self):
+        return "<AggregationMapping {}({}) -> {}>".format(
+            self.function, self.source, self.target)
+
+
+def aggregate(values, function):
+    # type: (list[float], str) -> float
+    """Aggregate numbers, None if the function needs values and has none"""
+    if function == AGGREGATE_COUNT:
+        return len(values)
+    if function == AGGREGATE_SUM:
+        return sum(values)
+    if not values:
+        return None
+    if function == AGGREGATE_MIN:
+        return min(values)
+    if function == AGGREGATE_MAX:
+        return max(values)
+    return sum(values) / float(len(values))
+
+
+def read_number(parameter, number_format=DEFAULT_NUMBER_FORMAT):
+    # type: (DB.Parameter, NumberFormat) -> float
+    """Numeric value of a parameter, doubles in internal units"""
+    value = read_native(parameter)
+    if isinstance(value, (float, int)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        parsed = parse_number(value, number_format)
+        return parsed.value if parsed is not None else None
+    return None
+
+
+def to_target_value(converter, value, source_spec, target_parameter,
+                    is_count=False):
+    # type: (ValueConverter, float, DB.ForgeTypeId, DB.Parameter, bool) -> object
+    """
+    Native value of an aggregate for the target parameter. Counts are plain
+    numbers, other aggregates keep the spec of the source parameter.
+    """
+    target_type = get_storage_type(target_parameter)
+    if is_count:
+        source_spec = None
+    if target_type == STORAGE_DOUBLE:
+        target_spec = get_spec_type_id(target_parameter)
+        if source_spec is None:
+            return converter.to_internal(float(value), target_spec)
+        return converter.convert_double(value, source_spec, target_spec)
+    if source_spec is not None:
+        value = converter.to_display(value, source_spec)
+    if target_type == STORAGE_INTEGER:
+        return int(round(value))
+    if target_type == STORAGE_STRING:
+        return format_number(value,
+                             converter.number_format.decimal_separator)
+    return None
+
+
+def plan_space_aggregates(plan, resolver, converter, space, instances,
+                          aggregations):
+    # type: (WritePlan, ParameterResolver, ValueConverter, DB.Element, list[DB.FamilyInstance], list[AggregationMapping]) -> None
+    """Add the writes of all aggregations of one space group"""
+    # every source parameter is read once per instance, even if several
+    # aggregations use it
+    values_by_source = {}
+    specs_by_source = {}
+    for aggregation in aggregations:
+        if aggregation.source in values_by_source:
+            continue
+        values = []
+        for instance in instances:
+            parameter = resolver.get(instance, aggregation.source)
+            if parameter is None:
+                continue
+            if aggregation.source not in specs_by_source:
+                specs_by_source[aggregation.source] = get_spec_type_id(
+                    parameter) if get_storage_type(
+                        parameter) == STORAGE_DOUBLE else None
+            value = read_number(parameter, converter.number_format)
+            if value is not None:
+                values.append(value)
+        values_by_source[aggregation.source] = values
+
+    for aggregation in aggregations:
+        space_parameter = resolver.get(space, aggregation.target,
+                                       include_type=False)
+        if space_parameter is None:
+            continue
+        is_count = aggregation.function == AGGREGATE_COUNT
+        if is_count:
+            # count the instances, with or without source value
+            result = len(instances)
+        else:
+            result = aggregate(values_by_source[aggregation.source],
+                               aggregation.function)
+        if result is None:
+            continue
+        value = to_target_value(converter, result,
+                                specs_by_source.get(aggregation.source),
+                                space_parameter, is_count)
+        if value is not None:
+            plan.add(space, space_parameter, value, space=space)
+
+
+def group_aggregations_by_keys(aggregations_by_key):
+    # type: (dict[object, list[AggregationMapping]]) -> list[tuple[tuple, list[AggregationMapping]]]
+    """
+    (keys, aggregations) with every mapping once, aggregated over the
+    instances of all keys that list it. Raises KeyError if a space parameter
+    is the target of different mappings.
+    """
+    mappings_by_target = {}
+    keys_by_mapping = OrderedDict()
+    for key in sorted(aggregations_by_key):
+        for aggregation in aggregations_by_key[key]:
+            mapping = (aggregation.source, aggregation.target,
+                       aggregation.function)
+            if mappings_by_target.setdefault(aggregation.target,
+                                             mapping) != mapping:
+                raise KeyError(
+                    "Different aggregations into {} are not supported".format(
+                        aggregation.target))
+            if mapping not in keys_by_mapping:
+                keys_by_mapping[mapping] = (aggregation, [])
+            keys = keys_by_mapping[mapping][1]
+            if key not in keys:
+                keys.append(key)
+
+    aggregations_by_keys = OrderedDict()
+    for aggregation, keys in keys_by_mapping.values():
+        aggregations_by_keys.setdefault(tuple(keys), []).append(aggregation)
+    return list(aggregations_by_keys.items())
+
+
+def iter_space_groups(assignment):
+    # type: (SpaceAssignment) -> list[tuple[DB.Element, list[DB.FamilyInstance]]]
+    """All spaces of the assignment with their instances, empty ones too"""
+    for space in assignment.spaces:
+        yield space, assignment.instances_by_space_id.get(
+            element_key(space), [])
@@ -0,0 +1,146 @@
+"""
+Assignment of MEP instances to the spaces they are located in.
+
+Every instance is visited exactly once. The phase-aware `FamilyInstance.Space`
+property is asked first, geometric containment through the spatial index is
+only used when Revit does not know the space of an instance.
+"""
+from param_transfer.spatial_index import build_space_index, find_containing_space
+
+
+def element_key(element):
+    # type: (DB.Element) -> int
+    """Return the integer id used to key elements in plain dicts"""
+    return element.Id.IntegerValue
+
+
+def get_last_phase(doc):
+    # type: (DB.Document) -> DB.Phase
+    """Return the last phase of the project"""
+    phases = list(doc.Phases)
+    return phases[-1] if phases else None
+
+
+def get_instance_space(instance, phase):
+    # type: (DB.FamilyInstance, DB.Phase) -> DB.Element
+    """Return the space of the instance in the given phase or None"""
+    if phase is None:
+        return None
+    try:
+        return instance.Space[phase]
+    except Exception:
+        # not every family instance exposes a space, e.g. nested or
+        # non-MEP families
+        return None
+
+
+def get_location_point(instance):
+    # type: (DB.FamilyInstance) -> DB.XYZ
+    """Return the location point of the instance or None for curve based ones"""
+    location = instance.Location
+    if location is None:
+        return None
+    return getattr(location, "Point", None)
+
+
+class SpaceAssignment(object):
+    """
+    Result of the assignment stage: a `space_id -> [instances]` map.
+    Spaces are kept in the order they were passed in.
+    """
+
+    def __init__(self, spaces):
+        # type: (list[DB.Element]) -> None
+        self.spaces = list(spaces)
+        self.spaces_by_id = dict(
+            (element_key(space), space) for space in self.spaces)
+        self.instances_by_space_id = {}
+        self.unassigned = []
+        self.matched_by_phase = 0
+        self.matched_by_geometry = 0
+        # filled by partitioned runs, see param_transfer.partition
+        self.level_statistics = []
+
+    def add(self, space_id, instance):
+        # type: (int, DB.FamilyInstance) -> None
+        self.instances_by_space_id.setdefault(space_id, []).append(instance)
+
+    def count(self, space_id):
+        # type: (int) -> int
+        """Number of instances assigned to the space"""
+        return len(self.instances_by_space_id.get(space_id, ()))
+
+    @property
+    def counts(self):
+        # type: () -> dict[int, int]
+        return dict((space_id, len(instances)) for space_id, instances in
+                    self.instances_by_space_id.items())
+
+    @property
+    def assigned_count(self):
+        # type: () -> int
+        return self.matched_by_phase + self.matched_by_geometry
+
+    def items(self):
+        # type: () -> list[tuple[DB.Element, list[DB.FamilyInstance]]]
+        """Return (space, instances) pairs of all spaces with instances"""
+        result = []
+        for space in self.spaces:
+            instances = self.instances_by_space_id.get(element_key(space))
+            if instances:
+                result.append((space, instances))
+        return result
+
+
+def assign_instances_to_spaces(instances,
+                               spaces,
+                               phase=None,
+                               space_index=None,
+                               fn_contains=None,
+                               fn_get_space_index=None,
+                               fn_build_index=build_space_index,
+                               fn_get_point=get_location_point):
+    # type: (list[DB.FamilyInstance], list[DB.Element], DB.Phase, SpaceGridIndex, function, function, function, function) -> SpaceAssignment
+    """
+    Visit each instance once and assign it to one of the given spaces.
+    The spatial index is only built if an instance needs the geometric
+    fallback and no index was passed in.
+    fn_get_space_index(instance) returns the index to query for one
+    instance, e.g. the index of its level. fn_build_index(spaces) builds
+    the index, e.g. through a session cache. fn_get_point(instance)
+    returns the point matched geometrically, see param_transfer.containment.
+    """
+    assignment = SpaceAssignment(spaces)
+
+    for instance in instances:
+        space = get_instance_space(instance, phase)
+        if space is not None:
+            space_id = element_key(space)
+            if space_id in assignment.spaces_by_id:
+                assignment.add(space_id, instance)
+                assignment.matched_by_phase += 1
+            else:
+                # the space is known to Revit but not part of the scope
+                assignment.unassigned.append(instance)
+            continue
+
+        point = fn_get_point(instance)
+        if point is None:
+            assignment.unassigned.append(instance)
+            continue
+
+        if fn_get_space_index is not None:
+            instance_space_index = fn_get_space_index(instance)
+        else:
+            if space_index is None:
+                space_index = fn_build_index(assignment.spaces)
+            instance_space_index = space_index
+        space = find_containing_space(instance_space_index, point,
+                                      fn_contains)
+        if space is None:
+            assignment.unassigned.append(instance)
+            continue
+        assignment.add(element_key(space), instance)
+        assignment.matched_by_geometry += 1
+
+    return assignment
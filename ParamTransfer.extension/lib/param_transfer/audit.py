@@ -0,0 +1,148 @@
+"""
+Streaming audit log of the values changed by a transfer.
+
+Every applied write becomes one CSV or JSON-lines row with the element id
+and UniqueId, the id of the source space, the parameter name and the old and
+new value as shown in Revit. Rows go straight to the file while the plan is
+applied, nothing is collected in memory.
+
+The rows are written to a partial file next to the log, which is only moved
+in place once the writes were committed. A cancelled or failed transfer is
+rolled back and leaves no log behind.
+"""
+import io
+import json
+import os
+import re
+import time
+from os import path
+
+from param_transfer.values import get_display_value
+
+FORMAT_CSV = "csv"
+FORMAT_JSONL = "jsonl"
+
+AUDIT_COLUMNS = [
+    "element_id", "unique_id", "space_id", "parameter", "old_value",
+    "new_value"
+]
+
+AUDIT_DIRECTORY = "audit"
+PARTIAL_SUFFIX = ".partial"
+
+
+def get_audit_format(file_path):
+    # type: (str) -> str
+    """JSON lines for .jsonl and .json files, CSV otherwise"""
+    extension = path.splitext(file_path)[1].lower()
+    return FORMAT_JSONL if extension in (".jsonl", ".json") else FORMAT_CSV
+
+
+def get_audit_log_path(doc, file_format=FORMAT_CSV):
+    # type: (DB.Document, str) -> str
+    """New log file per run in the ParamTransfer directory of the user config"""
+    import filemgr
+
+    directory = path.join(filemgr.get_user_config_path(), "ParamTransfer",
+                          AUDIT_DIRECTORY)
+    if not path.exists(directory):
+        os.makedirs(directory)
+    document_name = re.sub(r"[^\w\-]+", "_", doc.Title) or "document"
+    return path.join(directory, "audit_{}_{}.{}".format(
+        document_name, time.strftime("%Y%m%d_%H%M%S"), file_format))
+
+
+def _format_csv_field(value):
+    # type: (object) -> str
+    text = u"" if value is None else u"{}".format(value)
+    if any(character in text for character in u",\"\r\n"):
+        text = u'"{}"'.format(text.replace(u'"', u'""'))
+    return text
+
+
+def get_element_id(element):
+    # type: (DB.Element) -> int
+    return element.Id.IntegerValue if element is not None else None
+
+
+class AuditLog(object):
+    """
+    Row writer of one transfer, passed to apply_write_plan_chunked.
+    The file is opened with the first row.
+    """
+
+    def __init__(self, file_path, file_format=None):
+        # type: (str, str) -> None
+        self.file_path = file_path
+        self.file_format = file_format or get_audit_format(file_path)
+        self.row_count = 0
+        self._file = None
+
+    @property
+    def partial_file_path(self):
+        # type: () -> str
+        return self.file_path + PARTIAL_SUFFIX
+
+    def _open(self):
+        self._file = io.open(self.partial_file_path, "w", encoding="utf-8",
+                             newline="")
+        if self.file_format == FORMAT_CSV:
+            self._write_line(u",".join(AUDIT_COLUMNS))
+
+    def _write_line(self, line):
+        # type: (str) -> None
+        self._file.write(line + u"\r\n" if self.file_format == FORMAT_CSV
+                         else line + u"\n")
+
+    def write_row(self, values):
+        # type: (list) -> None
+        """Write one row, values in the order of AUDIT_COLUMNS"""
+        if self._file is None:
+            self._open()
+        if self.file_format == FORMAT_CSV:
+            self._write_line(u",".join(
+                _format_csv_field(value) for value in values))
+        else:
+            self._write_line(u"{}".format(
+                json.dumps(dict(zip(AUDIT_COLUMNS, values)),
+                           sort_keys=True)))
+        self.row_count += 1
+
+    def read_value(self, write):
+        # type: (PlannedWrite) -> str
+        """Current value of the target parameter as shown in Revit"""
+        return get_display_value(write.parameter)
+
+    def record(self, write, old_value):
+        # type: (PlannedWrite, str) -> None
+        """Record an applied write, the new value is read back"""
+        self.write_row([
+            get_element_id(write.element),
+            write.element.UniqueId,
+            get_element_id(write.space),
+            write.parameter.Definition.Name,
+            old_value,
+            self.read_value(write),
+        ])
+
+    def commit(self):
+        # type: () -> str
+        """Close the log and move it in place, return its path"""
+        if self._file is None:
+            self._open()
+        self._file.close()
+        self._file = None
+        if path.exists(self.file_path):
+            os.remove(self.file_path)
+        os.rename(self.partial_file_path, self.file_path)
+        return self.file_path
+
+    def discard(self):
+        # type: () -> None
+        """Close and delete the log of a rolled back transfer"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if path.exists(self.partial_file_path):
+            os.remove(self.partial_file_path)
+        self.row_count = 0
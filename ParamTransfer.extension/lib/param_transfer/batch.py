@@ -0,0 +1,440 @@
+"""
+Headless, JSON driven parameter transfer.
+
+A job file lists the families, the space -> instance parameter pairs and the
+division option, e.g.:
+
+    {
+        "name": "Diffusers",
+        "families": ["Supply Diffuser", "Exhaust Grille"],
+        "mappings": [
+            {"source": "Number", "target": "Room Number"},
+            ["Specified Supply Airflow", "Flow"]
+        ],
+        "divide_by_element_count": true,
+        "distribution": {
+            "mode": "weighted",
+            "weight_parameter": "Flow",
+            "rounding": "largest_remainder",
+            "decimals": 0
+        },
+        "scope": "active_view",
+        "link": null,
+        "link_source": "spaces",
+        "partition_by_level": true,
+        "boundary_containment": true,
+        "containment": {"mode": "point"},
+        "incremental": false,
+        "run_log": false,
+        "audit_log": false,
+        "split_per_selection": false,
+        "dry_run": false
+    }
+
+Whole categories can be listed under "categories". A family or category
+entry can be an object with mappings of its own, entries without use the
+job mappings. Spaces are collected and indexed once and the instances of
+all entries are matched in one pass, e.g.:
+
+    {
+        "name": "HVAC terminals",
+        "families": [
+            "Supply Diffuser",
+            {"name": "Room Sensor",
+             "mappings": [["Number", "Sensor Room Number"]]}
+        ],
+        "categories": ["Mechanical Equipment"],
+        "mappings": [["Number", "Room Number"]]
+    }
+
+A family selected on its own and through its category gets the mappings of
+the family, see param_transfer.selection.
+
+With "direction": "aggregate" instance values are rolled up into their
+spaces instead. Mappings then name the instance parameter as source, the
+space parameter as target and one of sum, min, max, count or mean:
+
+    {
+        "name": "Airflow per space",
+        "families": ["Supply Diffuser"],
+        "direction": "aggregate",
+        "mappings": [
+            {"source": "Flow", "target": "Actual Supply Airflow",
+             "function": "sum"},
+            ["", "Diffuser Count", "count"]
+        ]
+    }
+
+Distribution, incremental and linked sources only apply to transfers.
+
+"boundary_containment" tests points against the precomputed boundary loops
+of the spaces instead of calling IsPointInSpace, it is on by default.
+"containment" matches instances above the upper limit of their space, e.g.
+in the ceiling void: "projected" by the plan position on the level of their
+elevation, "tolerance" up to "vertical_tolerance" feet above or below the
+space, "calculation_point" by the spatial calculation point of the family,
+see param_transfer.containment. Projected containment does not apply to
+linked spaces.
+A "document" scope collects all spaces and instances of the model once and
+matches them level by level, "partition_by_level" defaults to true there.
+With "link", the title of a loaded linked model, the spaces or rooms
+("link_source") of that model are matched in host coordinates instead.
+With "incremental" only instances whose space, source values or mapping
+changed since the last run are written, see param_transfer.fingerprints.
+Boundaries and indexes of the host spaces are kept for the Revit session,
+see param_transfer.space_cache, so repeated jobs on one model only match.
+"run_log" appends the timings and API counters of the run to a JSON-lines
+log, true for the default log in the user config directory or a file path.
+"audit_log" streams every changed value to a CSV file, true for a new file
+per run in the user config directory or a .csv or .jsonl file path, see
+param_transfer.audit.
+
+"distribution" splits the values over the instances of a space, equal or
+weighted by an instance parameter, optionally rounded with the total kept,
+see param_transfer.distribution. It implies divide_by_element_count. The
+instances of all families and categories of a space share the value, with
+"split_per_selection" every family or category gets the whole value split
+over its own instances.
+
+Families and categories with the same aggregation mapping are aggregated
+together, e.g. the airflow of diffusers and grilles is summed into one
+space parameter. A space parameter can only be the target of one mapping.
+
+`run_job` reuses the matching and write engine of the ParamTransfer window
+and returns a machine readable summary. All model access goes through the
+`fn_` arguments, so it can be driven with a stand-in document object, e.g.
+with the boundaries of param_transfer.benchmark or recorded ones as
+fn_extract_boundary.
+"""
+import json
+
+from param_transfer.containment import Containment
+from param_transfer.distribution import Distribution
+from param_transfer.aggregation import AGGREGATE_SUM, AggregationMapping, group_aggregations_by_keys
+from param_transfer.audit import AuditLog, get_audit_log_path
+from param_transfer.boundaries import extract_space_boundary
+from param_transfer.engine import build_aggregation_plan, build_transfer_plan
+from param_transfer.fingerprints import FingerprintStore
+from param_transfer.instrumentation import COUNTER_SET, PhaseTimer, append_run_log
+from param_transfer.linked import SOURCE_ROOMS, SOURCE_SPACES
+from param_transfer.mapping import MappingTable
+from param_transfer.selection import SELECTION_CATEGORY, SELECTION_FAMILY, InstanceSelection, SelectionResolver
+from param_transfer.write_plan import apply_write_plan_chunked
+
+SCOPE_ACTIVE_VIEW = "active_view"
+SCOPE_DOCUMENT = "document"
+
+DIRECTION_TRANSFER = "transfer"
+DIRECTION_AGGREGATE = "aggregate"
+
+
+def _default_fn_collect_spaces(doc, view_id):
+    from param_transfer.collection import collect_spaces
+    return collect_spaces(doc, view_id)
+
+
+def _default_fn_collect_instances(doc, selections, view_id):
+    from param_transfer.collection import collect_selected_instances
+    return collect_selected_instances(doc, selections, view_id)
+
+
+def _default_fn_collect_linked_spaces(doc, link_name, source):
+    from param_transfer.linked import collect_linked_spaces, find_link_instance
+    link_instance = find_link_instance(doc, link_name)
+    if link_instance is None:
+        raise KeyError("Linked model {} is not loaded".format(link_name))
+    return collect_linked_spaces(link_instance, source)
+
+
+def _default_fn_load_fingerprints(doc):
+    return FingerprintStore.for_document(doc)
+
+
+def _default_fn_get_space_geometry(doc):
+    from param_transfer.space_cache import get_space_geometry
+    return get_space_geometry(doc)
+
+
+def parse_mappings(mappings):
+    # type: (list) -> MappingTable
+    """Accept both {"source": .., "target": ..} and [source, target] entries"""
+    table = MappingTable()
+    for mapping in mappings:
+        if isinstance(mapping, dict):
+            table.add(mapping.get("source"), mapping.get("target"))
+        else:
+            source, target = mapping
+            table.add(source, target)
+    return table
+
+
+def parse_aggregations(mappings):
+    # type: (list) -> list[AggregationMapping]
+    """Accept {"source", "target", "function"} and [source, target, function]"""
+    aggregations = []
+    for mapping in mappings:
+        if isinstance(mapping, dict):
+            source = mapping.get("source")
+            target = mapping.get("target")
+            function = mapping.get("function", AGGREGATE_SUM)
+        else:
+            source, target = mapping[0], mapping[1]
+            function = mapping[2] if len(mapping) > 2 else AGGREGATE_SUM
+        aggregations.append(
+            AggregationMapping(source or None, target, function))
+    return aggregations
+
+
+def parse_selections(job):
+    # type: (dict) -> list[tuple[InstanceSelection, list]]
+    """(selection, mappings) of all families and categories of the job"""
+    selections = []
+    for kind, job_key in ((SELECTION_FAMILY, "families"),
+                          (SELECTION_CATEGORY, "categories")):
+        for entry in job.get(job_key) or []:
+            if isinstance(entry, dict):
+                name = entry.get("name")
+                mappings = entry.get("mappings") or job.get("mappings")
+            else:
+                name = entry
+                mappings = job.get("mappings")
+            if not name:
+                raise KeyError("Job {} entry without name".format(job_key))
+            if not mappings:
+                raise KeyError(
+                    "Job {} {} without mappings is not supported".format(
+                        kind, name))
+            selections.append((InstanceSelection(kind, name), mappings))
+    return selections
+
+
+def load_job(job_file_path):
+    # type: (str) -> dict
+    """Load and validate a job file"""
+    with open(job_file_path, "r") as f:
+        job = json.load(f)
+    validate_job(job)
+    return job
+
+
+def validate_job(job):
+    # type: (dict) -> None
+    if not job.get("families") and not job.get("categories"):
+        raise KeyError("Job without families or categories is not supported")
+    selections = parse_selections(job)
+    scope = job.get("scope", SCOPE_ACTIVE_VIEW)
+    if scope not in (SCOPE_ACTIVE_VIEW, SCOPE_DOCUMENT):
+        raise KeyError("Job scope {} is not supported".format(scope))
+    link_source = job.get("link_source", SOURCE_SPACES)
+    if link_source not in (SOURCE_SPACES, SOURCE_ROOMS):
+        raise KeyError("Job link source {} is not supported".format(link_source))
+    if job.get("distribution"):
+        Distribution.from_dict(job["distribution"])
+    if job.get("containment"):
+        containment = Containment.from_dict(job["containment"])
+        if containment.is_projected and job.get("link"):
+            raise KeyError("Projected containment in linked spaces is not supported")
+    direction = job.get("direction", DIRECTION_TRANSFER)
+    if direction not in (DIRECTION_TRANSFER, DIRECTION_AGGREGATE):
+        raise KeyError("Job direction {} is not supported".format(direction))
+    if direction == DIRECTION_AGGREGATE:
+        if job.get("link"):
+            raise KeyError("Aggregation into linked spaces is not supported")
+        group_aggregations_by_keys(
+            dict((index, parse_aggregations(mappings))
+                 for index, (_, mappings) in enumerate(selections)))
+
+
+def run_job(doc,
+            job,
+            fn_collect_spaces=_default_fn_collect_spaces,
+            fn_collect_instances=_default_fn_collect_instances,
+            fn_apply=apply_write_plan_chunked,
+            fn_load_fingerprints=_default_fn_load_fingerprints,
+            fn_collect_linked_spaces=_default_fn_collect_linked_spaces,
+            fn_get_space_geometry=_default_fn_get_space_geometry,
+            fn_extract_boundary=extract_space_boundary):
+    # type: (DB.Document, dict, function, function, function, function, function, function, function) -> dict
+    """Run a transfer job on the document and return its summary"""
+    validate_job(job)
+    timer = PhaseTimer()
+
+    view_id = None
+    scope = job.get("scope", SCOPE_ACTIVE_VIEW)
+    if scope == SCOPE_ACTIVE_VIEW:
+        view_id = doc.ActiveView.Id
+    partition_by_level = bool(
+        job.get("partition_by_level", scope == SCOPE_DOCUMENT))
+
+    direction = job.get("direction", DIRECTION_TRANSFER)
+    aggregate = direction == DIRECTION_AGGREGATE
+    # mappings of every family or category, keyed by selection index
+    selections = []
+    pairs_by_key = {}
+    aggregations_by_key = {}
+    mappings = {}
+    for index, (selection, selection_mappings) in enumerate(
+            parse_selections(job)):
+        if aggregate:
+            aggregations_by_key[index] = parse_aggregations(
+                selection_mappings)
+            mappings[selection.label] = [[
+                aggregation.source, aggregation.target, aggregation.function
+            ] for aggregation in aggregations_by_key[index]]
+        else:
+            selection.mapping_table = parse_mappings(selection_mappings)
+            pairs_by_key[index] = selection.mapping_table.pairs()
+            mappings[selection.label] = [
+                list(pair) for pair in pairs_by_key[index]
+            ]
+        selections.append(selection)
+    divide = bool(job.get("divide_by_element_count", False))
+    distribution = None
+    if job.get("distribution"):
+        distribution = Distribution.from_dict(job["distribution"])
+    dry_run = bool(job.get("dry_run", False))
+    fingerprints = None
+    if job.get("incremental", False) and not aggregate:
+        fingerprints = fn_load_fingerprints(doc)
+
+    linked_source = None
+    with timer.phase("Collection"):
+        if job.get("link"):
+            # linked models are not filtered by host views
+            linked_source = fn_collect_linked_spaces(
+                doc, job["link"], job.get("link_source", SOURCE_SPACES))
+            spaces = linked_source.spaces
+        else:
+            spaces = fn_collect_spaces(doc, view_id)
+        # all families and categories in one collector pass
+        instances = fn_collect_instances(doc, selections, view_id)
+        if len(selections) > 1:
+            selection_resolver = SelectionResolver(doc, selections)
+            selection_resolver.add_instances(instances)
+            fn_get_mapping_key = selection_resolver.get_index
+            instances_by_selection = dict(
+                (selection.label,
+                 len(selection_resolver.get_instances(instances, index)))
+                for index, selection in enumerate(selections))
+        else:
+            fn_get_mapping_key = lambda instance: 0
+            instances_by_selection = {selections[0].label: len(instances)}
+
+    use_boundary_containment = bool(job.get("boundary_containment", True))
+    containment = Containment.from_dict(job.get("containment") or {})
+    space_geometry = None
+    if linked_source is None:
+        space_geometry = fn_get_space_geometry(doc)
+    if aggregate:
+        plan, assignment = build_aggregation_plan(
+            doc, spaces, instances, [],
+            timer=timer,
+            partition_by_level=partition_by_level,
+            use_boundary_containment=use_boundary_containment,
+            fn_extract_boundary=fn_extract_boundary,
+            space_geometry=space_geometry,
+            fn_get_mapping_key=fn_get_mapping_key,
+            aggregations_by_key=aggregations_by_key,
+            containment=containment)
+    else:
+        plan, assignment = build_transfer_plan(
+            doc, spaces, instances, [],
+            divide_by_element_count_enabled=divide,
+            timer=timer,
+            fingerprints=fingerprints,
+            partition_by_level=partition_by_level,
+            linked_source=linked_source,
+            use_boundary_containment=use_boundary_containment,
+            fn_extract_boundary=fn_extract_boundary,
+            distribution=distribution,
+            space_geometry=space_geometry,
+            fn_get_mapping_key=fn_get_mapping_key,
+            pairs_by_key=pairs_by_key,
+            containment=containment,
+            split_per_key=bool(job.get("split_per_selection", False)))
+
+    summary = {
+        "job": job.get("name", ""),
+        "document": getattr(doc, "Title", ""),
+        "families": [
+            selection.name for selection in selections
+            if not selection.is_category
+        ],
+        "categories": [
+            selection.name for selection in selections
+            if selection.is_category
+        ],
+        "direction": direction,
+        "mappings": mappings,
+        "scope": scope,
+        "link": job.get("link") or "",
+        "containment": containment.mode,
+        "dry_run": dry_run,
+        "incremental": fingerprints is not None,
+        "spaces": len(spaces),
+        "instances": len(instances),
+        "instances_by_selection": instances_by_selection,
+        "matched_by_phase": assignment.matched_by_phase,
+        "matched_by_geometry": assignment.matched_by_geometry,
+        "unassigned": len(assignment.unassigned),
+        "instances_unchanged": fingerprints.unchanged_count if fingerprints is not None else 0,
+        "levels": [
+            statistics.as_dict()
+            for statistics in assignment.level_statistics
+        ],
+        "writes_planned": len(plan),
+        "writes_skipped": plan.skipped_count,
+        "writes_applied": 0,
+        "writes_failed": 0,
+        "elements_borrowed": 0,
+        "audit_log": "",
+    }
+
+    if not dry_run:
+        apply_options = {}
+        audit_log_path = job.get("audit_log", False)
+        if audit_log_path:
+            apply_options["audit_log"] = AuditLog(
+                audit_log_path if not isinstance(audit_log_path, bool)
+                else get_audit_log_path(doc))
+        with timer.phase("Writing"):
+            write_summary = fn_apply(
+                doc, plan,
+                "Param transfer {}".format(job.get("name", "batch")).strip(),
+                **apply_options)
+        if audit_log_path:
+            summary["audit_log"] = apply_options["audit_log"].file_path
+        summary["writes_applied"] = write_summary.applied_count
+        summary["writes_failed"] = write_summary.failed_count
+        summary["elements_borrowed"] = write_summary.borrowed_count
+        timer.count(COUNTER_SET,
+                    write_summary.applied_count + write_summary.failed_count)
+        if fingerprints is not None:
+            fingerprints.commit(
+                getattr(write_summary, "failed_unique_ids", None))
+            fingerprints.save()
+
+    summary["timings"] = dict(timer.durations)
+    summary["counters"] = dict(timer.counters)
+
+    run_log = job.get("run_log", False)
+    if run_log:
+        append_run_log(
+            timer.as_record(source="batch",
+                            job=summary["job"],
+                            document=summary["document"],
+                            instances=summary["instances"],
+                            writes_applied=summary["writes_applied"]),
+            run_log if not isinstance(run_log, bool) else None)
+    return summary
+
+
+def run_job_file(doc, job_file_path, summary_file_path=None, **kwargs):
+    # type: (DB.Document, str, str, dict) -> dict
+    """Run the job file and write the summary next to it as JSON"""
+    summary = run_job(doc, load_job(job_file_path), **kwargs)
+    if summary_file_path is None:
+        summary_file_path = job_file_path.rsplit(".", 1)[0] + ".summary.json"
+    with open(summary_file_path, "w") as f:
+        json.dump(summary, f, indent=4)
+    return summary
@@ -0,0 +1,557 @@
+"""
+Offline benchmark of the parameter transfer engine.
+
+Generates synthetic levels, spaces and instance points and drives the
+matching, value computation, diff and write stages of `build_transfer_plan`
+through light stand-ins of the Revit API objects. Runs on any Python without
+Revit, e.g.:
+
+    PYTHONPATH=lib python -m param_transfer.benchmark --scales 1000 10000 100000
+
+Spaces are laid out on a grid per level, with gaps between them like
+corridors. A share of them are irregular: L-shapes and star shaped polygons
+with up to twelve edges. Instance points are spread over the whole floor
+and up to above the space height, so some of them stay unassigned unless
+they are matched projected or with a vertical tolerance, see
+param_transfer.containment.
+
+Throughput is reported in instances per second, peak memory is the peak of
+the Python allocations during the engine stages (tracemalloc) in a second,
+untimed run.
+"""
+import argparse
+import gc
+import math
+import random
+import time
+
+from param_transfer.boundaries import classify_point_in_loops, OUTSIDE
+from param_transfer.containment import CONTAINMENT_MODES, CONTAINMENT_POINT, Containment
+from param_transfer.distribution import Distribution
+from param_transfer.engine import build_transfer_plan
+from param_transfer.instrumentation import PhaseTimer
+from param_transfer.values import write_native
+
+DEFAULT_SCALES = (1000, 10000, 100000)
+
+SPACE_CELL_SIZE = 20.0  # feet
+SPACE_GAP = 1.0
+SPACE_HEIGHT = 10.0
+LEVEL_HEIGHT = 12.0
+
+# (space parameter, instance parameter) pairs of every benchmark run
+BENCHMARK_PARAMETER_PAIRS = [
+    ("Number", "Space Number"),
+    ("Name", "Space Name"),
+    ("Supply Airflow", "Flow"),
+]
+
+BENCHMARK_COLUMNS = [
+    "Instances", "Spaces", "Assigned", "Writes", "Matching s",
+    "Values s", "Diff s", "Writing s", "Total s", "Instances/s",
+    "Peak MB"
+]
+
+ENGINE_PHASES = ("Space matching", "Value computation", "Diff")
+
+
+class StandInId(object):
+
+    def __init__(self, value):
+        # type: (int) -> None
+        self.IntegerValue = value
+
+
+class StandInXYZ(object):
+
+    def __init__(self, x, y, z=0.0):
+        # type: (float, float, float) -> None
+        self.X = x
+        self.Y = y
+        self.Z = z
+
+
+class StandInBoundingBox(object):
+
+    def __init__(self, min_point, max_point):
+        # type: (StandInXYZ, StandInXYZ) -> None
+        self.Min = min_point
+        self.Max = max_point
+
+
+class StandInDefinition(object):
+    """Definition of a non-shared parameter without spec type"""
+
+    BuiltInParameter = "INVALID"
+
+    def __init__(self, name):
+        # type: (str) -> None
+        self.Name = name
+
+
+class StandInParameter(object):
+
+    IsShared = False
+    IsReadOnly = False
+
+    def __init__(self, definition, storage_type, value):
+        # type: (StandInDefinition, str, object) -> None
+        self.Definition = definition
+        self.StorageType = storage_type
+        self.value = value
+
+    def AsString(self):
+        return self.value
+
+    def AsDouble(self):
+        return self.value
+
+    def AsInteger(self):
+        return self.value
+
+    def AsValueString(self):
+        return u"{}".format(self.value)
+
+    def Set(self, value):
+        self.value = value
+        return True
+
+    def SetValueString(self, text):
+        self.value = float(text)
+        return True
+
+
+class StandInLocation(object):
+
+    def __init__(self, point):
+        # type: (StandInXYZ) -> None
+        self.Point = point
+
+
+class StandInLevel(object):
+    """Level whose Elevation is measured from base_elevation, e.g. a survey point"""
+
+    def __init__(self, element_id, name, elevation, base_elevation=0.0):
+        # type: (StandInId, str, float, float) -> None
+        self.Id = element_id
+        self.Name = name
+        self.ProjectElevation = elevation
+        self.Elevation = elevation - base_elevation
+
+
+class StandInElement(object):
+    """Parameters are fetched by Definition, like non-shared ones in Revit"""
+
+    def __init__(self, element_id, type_id, level, parameters):
+        # type: (StandInId, StandInId, StandInLevel, list[StandInParameter]) -> None
+        self.Id = element_id
+        self.UniqueId = "standin-{}".format(element_id.IntegerValue)
+        self.Level = level
+        self.LevelId = level.Id
+        self._type_id = type_id
+        self._parameters_by_name = dict(
+            (parameter.Definition.Name, parameter) for parameter in parameters)
+        self._parameters_by_definition = dict(
+            (parameter.Definition, parameter) for parameter in parameters)
+
+    def GetTypeId(self):
+        return self._type_id
+
+    def LookupParameter(self, name):
+        return self._parameters_by_name.get(name)
+
+    def get_Parameter(self, key):
+        return self._parameters_by_definition.get(key)
+
+
+class StandInBoundarySegment(object):
+    """Straight boundary segment, also stands in for its curve"""
+
+    def __init__(self, start, end):
+        # type: (StandInXYZ, StandInXYZ) -> None
+        self._points = [start, end]
+
+    def GetCurve(self):
+        return self
+
+    def Tessellate(self):
+        return self._points
+
+
+class StandInSpace(StandInElement):
+
+    def __init__(self, element_id, type_id, level, parameters, loop):
+        # type: (StandInId, StandInId, StandInLevel, list[StandInParameter], list[tuple[float, float]]) -> None
+        StandInElement.__init__(self, element_id, type_id, level, parameters)
+        self.Number = parameters[0].value
+        self.loop = loop
+        self.min_z = level.ProjectElevation
+        self.max_z = level.ProjectElevation + SPACE_HEIGHT
+        xs = [x for x, _ in loop]
+        ys = [y for _, y in loop]
+        self._bounding_box = StandInBoundingBox(
+            StandInXYZ(min(xs), min(ys), self.min_z),
+            StandInXYZ(max(xs), max(ys), self.max_z))
+        self._loops = [(xs, ys)]
+
+    def get_BoundingBox(self, view):
+        return self._bounding_box
+
+    def GetBoundarySegments(self, options):
+        points = [StandInXYZ(x, y, self.min_z) for x, y in self.loop]
+        return [[
+            StandInBoundarySegment(points[i], points[(i + 1) % len(points)])
+            for i in range(len(points))
+        ]]
+
+    def IsPointInSpace(self, point):
+        if not self.min_z <= point.Z <= self.max_z:
+            return False
+        return classify_point_in_loops(point.X, point.Y, self._loops,
+                                       1e-9) != OUTSIDE
+
+
+class StandInInstance(StandInElement):
+    """Family instance without a phase space, matched by geometry only"""
+
+    def __init__(self, element_id, type_id, level, parameters, point):
+        # type: (StandInId, StandInId, StandInLevel, list[StandInParameter], StandInXYZ) -> None
+        StandInElement.__init__(self, element_id, type_id, level, parameters)
+        self.Location = StandInLocation(point)
+
+
+class StandInUnits(object):
+    """Units with the default decimal and digit grouping symbols"""
+
+    DecimalSymbol = "Dot"
+    DigitGroupingSymbol = "Comma"
+
+
+class StandInDocument(object):
+    """Document without phases, types and display units"""
+
+    Title = "Benchmark"
+    PathName = ""
+    IsWorkshared = False
+    Phases = []
+
+    def GetElement(self, element_id):
+        return None
+
+    def GetUnits(self):
+        return StandInUnits()
+
+
+def make_rectangle(x0, y0, size, rng):
+    # type: (float, float, float, random.Random) -> list[tuple[float, float]]
+    width = size * rng.uniform(0.6, 1.0)
+    depth = size * rng.uniform(0.6, 1.0)
+    return [(x0, y0), (x0 + width, y0), (x0 + width, y0 + depth),
+            (x0, y0 + depth)]
+
+
+def make_l_shape(x0, y0, size, rng):
+    # type: (float, float, float, random.Random) -> list[tuple[float, float]]
+    notch_x = size * rng.uniform(0.3, 0.7)
+    notch_y = size * rng.uniform(0.3, 0.7)
+    return [(x0, y0), (x0 + size, y0), (x0 + size, y0 + notch_y),
+            (x0 + notch_x, y0 + notch_y), (x0 + notch_x, y0 + size),
+            (x0, y0 + size)]
+
+
+def make_star_polygon(x0, y0, size, rng):
+    # type: (float, float, float, random.Random) -> list[tuple[float, float]]
+    """Polygon with 5 to 12 vertices around the center of the cell"""
+    center_x, center_y = x0 + size / 2.0, y0 + size / 2.0
+    vertex_count = rng.randint(5, 12)
+    loop = []
+    for i in range(vertex_count):
+        angle = 2.0 * math.pi * (i + rng.uniform(0.0, 0.8)) / vertex_count
+        radius = size / 2.0 * rng.uniform(0.5, 1.0)
+        loop.append((center_x + radius * math.cos(angle),
+                     center_y + radius * math.sin(angle)))
+    return loop
+
+
+def generate_model(instance_count, level_count=3, instances_per_space=10,
+                   irregular_ratio=0.3, seed=0):
+    # type: (int, int, int, float, int) -> tuple[StandInDocument, list[StandInSpace], list[StandInInstance]]
+    """Synthetic levels with spaces on a grid and random instance points"""
+    rng = random.Random(seed)
+    next_id = [0]
+
+    def new_id():
+        next_id[0] += 1
+        return StandInId(next_id[0])
+
+    space_type_id = new_id()
+    instance_type_id = new_id()
+    space_definitions = [
+        StandInDefinition(source) for source, _ in BENCHMARK_PARAMETER_PAIRS
+    ]
+    instance_definitions = [
+        StandInDefinition(target) for _, target in BENCHMARK_PARAMETER_PAIRS
+    ]
+
+    space_count = max(1, instance_count // max(1, instances_per_space))
+    spaces_per_level = max(1, space_count // level_count)
+    columns = int(math.ceil(math.sqrt(spaces_per_level)))
+    rows = int(math.ceil(spaces_per_level / float(columns)))
+    footprint_x = columns * SPACE_CELL_SIZE
+    footprint_y = rows * SPACE_CELL_SIZE
+
+    levels = [
+        StandInLevel(new_id(), "Level {}".format(i + 1), i * LEVEL_HEIGHT)
+        for i in range(level_count)
+    ]
+
+    spaces = []
+    for level in levels:
+        for i in range(spaces_per_level):
+            x0 = (i % columns) * SPACE_CELL_SIZE + SPACE_GAP / 2.0
+            y0 = (i // columns) * SPACE_CELL_SIZE + SPACE_GAP / 2.0
+            size = SPACE_CELL_SIZE - SPACE_GAP
+            if rng.random() >= irregular_ratio:
+                loop = make_rectangle(x0, y0, size, rng)
+            elif rng.random() < 0.5:
+                loop = make_l_shape(x0, y0, size, rng)
+            else:
+                loop = make_star_polygon(x0, y0, size, rng)
+            number = u"{}.{:04d}".format(level.Name[-1], i + 1)
+            parameters = [
+                StandInParameter(space_definitions[0], "String", number),
+                StandInParameter(space_definitions[1], "String",
+                                 u"Office {}".format(number)),
+                StandInParameter(space_definitions[2], "Double",
+                                 rng.uniform(10.0, 500.0)),
+            ]
+            spaces.append(
+                StandInSpace(new_id(), space_type_id, level, parameters,
+                             loop))
+
+    instances = []
+    for i in range(instance_count):
+        level = levels[i % level_count]
+        point = StandInXYZ(
+            rng.uniform(0.0, footprint_x), rng.uniform(0.0, footprint_y),
+            level.ProjectElevation + rng.uniform(0.0, LEVEL_HEIGHT))
+        parameters = [
+            StandInParameter(instance_definitions[0], "String", u""),
+            StandInParameter(instance_definitions[1], "String", u""),
+            StandInParameter(instance_definitions[2], "Double", 0.0),
+        ]
+        instances.append(
+            StandInInstance(new_id(), instance_type_id, level, parameters,
+                            point))
+    return StandInDocument(), spaces, instances
+
+
+def extract_benchmark_boundary(space):
+    # type: (StandInSpace) -> SpaceBoundary
+    from param_transfer.boundaries import extract_space_boundary
+    return extract_space_boundary(space, options=object())
+
+
+class BenchmarkResult(object):
+    """Counts, phase timings and peak memory of one benchmark scale"""
+
+    def __init__(self, instance_count, space_count):
+        # type: (int, int) -> None
+        self.instance_count = instance_count
+        self.space_count = space_count
+        self.assigned_count = 0
+        self.write_count = 0
+        self.durations = {}
+        self.peak_memory = None
+
+    @property
+    def total(self):
+        # type: () -> float
+        return sum(self.durations.values())
+
+    @property
+    def throughput(self):
+        # type: () -> float
+        """Instances per second through all stages"""
+        return self.instance_count / self.total if self.total > 0 else 0.0
+
+    def as_row(self):
+        # type: () -> list
+        return [
+            self.instance_count, self.space_count, self.assigned_count,
+            self.write_count
+        ] + [
+            "{:.3f}".format(self.durations.get(phase, 0.0))
+            for phase in ENGINE_PHASES + ("Writing", )
+        ] + [
+            "{:.3f}".format(self.total),
+            "{:.0f}".format(self.throughput),
+            "{:.1f}".format(self.peak_memory / 1048576.0)
+            if self.peak_memory is not None else "n/a",
+        ]
+
+    def as_dict(self):
+        # type: () -> dict
+        return {
+            "instances": self.instance_count,
+            "spaces": self.space_count,
+            "assigned": self.assigned_count,
+            "writes": self.write_count,
+            "phases": dict((name, round(duration, 6))
+                           for name, duration in self.durations.items()),
+            "total": round(self.total, 6),
+            "instances_per_second": round(self.throughput, 1),
+            "peak_memory": self.peak_memory,
+        }
+
+
+def run_engine(doc, spaces, instances, timer, partition_by_level=True,
+               use_boundary_containment=True, distribution=None,
+               containment=None):
+    # type: (StandInDocument, list[StandInSpace], list[StandInInstance], PhaseTimer, bool, bool, Distribution, Containment) -> tuple[WritePlan, SpaceAssignment]
+    """All stages of a transfer, written without transaction"""
+    plan, assignment = build_transfer_plan(
+        doc, spaces, instances, BENCHMARK_PARAMETER_PAIRS,
+        timer=timer,
+        partition_by_level=partition_by_level,
+        use_boundary_containment=use_boundary_containment,
+        distribution=distribution,
+        fn_extract_boundary=extract_benchmark_boundary,
+        containment=containment)
+    with timer.phase("Writing"):
+        for write in plan:
+            write_native(write.parameter, write.value)
+    return plan, assignment
+
+
+def measure_peak_memory(instance_count, engine_options, model_options):
+    # type: (int, dict, dict) -> int
+    """Peak bytes allocated by the engine stages, None without tracemalloc"""
+    try:
+        import tracemalloc
+    except ImportError:
+        return None
+    doc, spaces, instances = generate_model(instance_count, **model_options)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run_engine(doc, spaces, instances, PhaseTimer(), **engine_options)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_benchmark(instance_count,
+                  level_count=3,
+                  instances_per_space=10,
+                  irregular_ratio=0.3,
+                  seed=0,
+                  partition_by_level=True,
+                  use_boundary_containment=True,
+                  distribution=None,
+                  measure_memory=True,
+                  containment=None):
+    # type: (int, int, int, float, int, bool, bool, Distribution, bool, Containment) -> BenchmarkResult
+    """Benchmark one scale, the model generation is not timed"""
+    model_options = dict(level_count=level_count,
+                         instances_per_space=instances_per_space,
+                         irregular_ratio=irregular_ratio,
+                         seed=seed)
+    engine_options = dict(partition_by_level=partition_by_level,
+                          use_boundary_containment=use_boundary_containment,
+                          distribution=distribution,
+                          containment=containment)
+
+    doc, spaces, instances = generate_model(instance_count, **model_options)
+    result = BenchmarkResult(len(instances), len(spaces))
+    gc.collect()
+    timer = PhaseTimer()
+    plan, assignment = run_engine(doc, spaces, instances, timer,
+                                  **engine_options)
+    for name, duration in timer.durations:
+        result.durations[name] = result.durations.get(name, 0.0) + duration
+    result.assigned_count = assignment.assigned_count
+    result.write_count = len(plan)
+
+    if measure_memory:
+        result.peak_memory = measure_peak_memory(instance_count,
+                                                 engine_options,
+                                                 model_options)
+    return result
+
+
+def format_table(rows, columns):
+    # type: (list[list], list[str]) -> str
+    """Plain text table with right aligned columns"""
+    widths = [
+        max(len(str(value)) for value in [column] + [row[i] for row in rows])
+        for i, column in enumerate(columns)
+    ]
+    lines = [
+        "  ".join(str(value).rjust(width)
+                  for value, width in zip(row, widths))
+        for row in [columns] + rows
+    ]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Offline benchmark of the ParamTransfer engine")
+    parser.add_argument("--scales", type=int, nargs="+",
+                        default=list(DEFAULT_SCALES),
+                        help="numbers of instances")
+    parser.add_argument("--levels", type=int, default=3)
+    parser.add_argument("--instances-per-space", type=int, default=10)
+    parser.add_argument("--irregular", type=float, default=0.3,
+                        help="share of irregular spaces, 0 to 1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-partition", action="store_true",
+                        help="one index over all levels")
+    parser.add_argument("--no-boundaries", action="store_true",
+                        help="IsPointInSpace instead of boundary loops")
+    parser.add_argument("--containment", choices=CONTAINMENT_MODES,
+                        default=CONTAINMENT_POINT)
+    parser.add_argument("--vertical-tolerance", type=float, default=0.0,
+                        help="feet, with --containment tolerance")
+    parser.add_argument("--divide", action="store_true",
+                        help="split values equally over the instances")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the peak memory run")
+    parser.add_argument("--json", help="append the results to a JSON-lines file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for scale in args.scales:
+        started = time.time()
+        result = run_benchmark(
+            scale,
+            level_count=args.levels,
+            instances_per_space=args.instances_per_space,
+            irregular_ratio=args.irregular,
+            seed=args.seed,
+            partition_by_level=not args.no_partition,
+            use_boundary_containment=not args.no_boundaries,
+            distribution=Distribution() if args.divide else None,
+            measure_memory=not args.no_memory,
+            containment=Containment(args.containment,
+                                    args.vertical_tolerance))
+        results.append(result)
+        print("{} instances done in {:.1f} s".format(scale,
+                                                     time.time() - started))
+
+    print(format_table([result.as_row() for result in results],
+                       BENCHMARK_COLUMNS))
+
+    if args.json:
+        from param_transfer.instrumentation import append_run_log
+        for result in results:
+            append_run_log(dict(result.as_dict(), source="benchmark"),
+                           args.json)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Offline containment test against precomputed space boundaries.
+
+The boundary loops of a space are read once with `GetBoundarySegments`, arcs
+and other curves are tessellated, and the loops are kept as plain float
+lists together with the height band of the space. Containment is then a
+bounding box check and an even-odd ray cast in pure Python, without a Revit
+API call per point.
+
+Points closer to an edge or to the bottom or top of the height band than the
+tolerance are ambiguous; only those are passed on to the fallback test,
+`IsPointInSpace` by default.
+
+The height band can be widened by a vertical tolerance or ignored, so points
+in the ceiling void still match their space, see param_transfer.containment.
+Ambiguous points outside of the band are then moved to the middle of the band
+for the fallback test.
+
+Boundaries can be written to and read from JSON, so the engine can be run
+against recorded boundary data without Revit.
+"""
+import json
+
+from param_transfer.assignment import element_key
+from param_transfer.spatial_index import is_point_in_space
+
+DEFAULT_TOLERANCE = 0.01  # feet
+
+INSIDE = 1
+OUTSIDE = 0
+AMBIGUOUS = -1
+
+
+def _distance_squared_to_segment(x, y, x1, y1, x2, y2):
+    # type: (float, float, float, float, float, float) -> float
+    dx, dy = x2 - x1, y2 - y1
+    length_squared = dx * dx + dy * dy
+    if length_squared == 0.0:
+        t = 0.0
+    else:
+        t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) /
+                         length_squared))
+    px, py = x1 + t * dx - x, y1 + t * dy - y
+    return px * px + py * py
+
+
+def classify_point_in_loops(x, y, loops, tolerance=DEFAULT_TOLERANCE):
+    # type: (float, float, list[tuple[list[float], list[float]]], float) -> int
+    """
+    Even-odd ray cast over all loops, outer boundaries and holes alike.
+    Returns INSIDE, OUTSIDE or AMBIGUOUS if the point lies on an edge.
+    """
+    tolerance_squared = tolerance * tolerance
+    inside = False
+    for xs, ys in loops:
+        count = len(xs)
+        j = count - 1
+        for i in range(count):
+            xi, yi, xj, yj = xs[i], ys[i], xs[j], ys[j]
+            if _distance_squared_to_segment(x, y, xi, yi, xj,
+                                            yj) <= tolerance_squared:
+                return AMBIGUOUS
+            if (yi > y) != (yj > y):
+                if x < xi + (y - yi) * (xj - xi) / (yj - yi):
+                    inside = not inside
+            j = i
+    return INSIDE if inside else OUTSIDE
+
+
+class SpaceBoundary(object):
+    """Boundary loops and height band of one space as plain floats"""
+
+    def __init__(self, key, loops, min_z=None, max_z=None):
+        # type: (object, list[tuple[list[float], list[float]]], float, float) -> None
+        """
+        loops: list of (xs, ys) closed polygons, the last point is not
+        repeated. min_z/max_z: height band, None for unbounded
+        """
+        self.key = key
+        self.loops = loops
+        self.min_z = min_z
+        self.max_z = max_z
+        all_xs = [x for xs, _ in loops for x in xs]
+        all_ys = [y for _, ys in loops for y in ys]
+        if all_xs:
+            self.box = (min(all_xs), min(all_ys), max(all_xs), max(all_ys))
+        else:
+            self.box = None
+
+    def classify(self, x, y, z=None, tolerance=DEFAULT_TOLERANCE,
+                 vertical_tolerance=0.0):
+        # type: (float, float, float, float, float) -> int
+        """
+        INSIDE, OUTSIDE or AMBIGUOUS. The height is not tested without z,
+        vertical_tolerance widens the height band on both sides.
+        """
+        if self.box is None:
+            return AMBIGUOUS
+        min_x, min_y, max_x, max_y = self.box
+        if (x < min_x - tolerance or x > max_x + tolerance
+                or y < min_y - tolerance or y > max_y + tolerance):
+            return OUTSIDE
+
+        ambiguous_height = False
+        if z is not None:
+            if vertical_tolerance > 0.0:
+                # the fallback can not decide at the edges of a widened band
+                tolerance_z = vertical_tolerance
+                if (self.min_z is not None and z < self.min_z - tolerance_z
+                        or self.max_z is not None
+                        and z > self.max_z + tolerance_z):
+                    return OUTSIDE
+            else:
+                if self.min_z is not None:
+                    if z < self.min_z - tolerance:
+                        return OUTSIDE
+                    ambiguous_height = z <= self.min_z + tolerance
+                if self.max_z is not None:
+                    if z > self.max_z + tolerance:
+                        return OUTSIDE
+                    ambiguous_height = ambiguous_height or \
+                        z >= self.max_z - tolerance
+
+        result = classify_point_in_loops(x, y, self.loops, tolerance)
+        if result == INSIDE and ambiguous_height:
+            return AMBIGUOUS
+        return result
+
+    def get_band_height(self, z):
+        # type: (float) -> float
+        """z if it lies inside of the height band, the middle of the band otherwise"""
+        if self.min_z is None or self.max_z is None:
+            return z
+        if self.min_z < z < self.max_z:
+            return z
+        return (self.min_z + self.max_z) / 2.0
+
+    def to_dict(self):
+        # type: () -> dict
+        return {
+            "key": self.key,
+            "loops": [[list(xs), list(ys)] for xs, ys in self.loops],
+            "min_z": self.min_z,
+            "max_z": self.max_z,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # type: (dict) -> SpaceBoundary
+        return cls(data["key"],
+                   [(list(xs), list(ys)) for xs, ys in data["loops"]],
+                   data.get("min_z"), data.get("max_z"))
+
+
+def get_loop_coordinates(segments):
+    # type: (list[DB.BoundarySegment]) -> tuple[list[float], list[float]]
+    """Tessellate the curves of a boundary loop into x and y lists"""
+    xs, ys = [], []
+    for segment in segments:
+        points = list(segment.GetCurve().Tessellate())
+        # the end point is the start point of the next segment
+        for point in points[:-1]:
+            xs.append(point.X)
+            ys.append(point.Y)
+    return xs, ys
+
+
+def extract_space_boundary(space, options=None):
+    # type: (DB.SpatialElement, DB.SpatialElementBoundaryOptions) -> SpaceBoundary
+    """Read the boundary loops and height band of a space or room once"""
+    if options is None:
+        from pyrevit import DB
+        options = DB.SpatialElementBoundaryOptions()
+
+    loops = []
+    for segments in space.GetBoundarySegments(options) or []:
+        xs, ys = get_loop_coordinates(segments)
+        if len(xs) >= 3:
+            loops.append((xs, ys))
+
+    # the bounding box is in model coordinates like the location points
+    min_z = max_z = None
+    bounding_box = space.get_BoundingBox(None)
+    if bounding_box is not None:
+        min_z, max_z = bounding_box.Min.Z, bounding_box.Max.Z
+    return SpaceBoundary(element_key(space), loops, min_z, max_z)
+
+
+def save_boundaries(boundaries, file_path):
+    # type: (list[SpaceBoundary], str) -> None
+    with open(file_path, "w") as f:
+        json.dump([boundary.to_dict() for boundary in boundaries], f)
+
+
+def load_boundaries(file_path):
+    # type: (str) -> list[SpaceBoundary]
+    with open(file_path, "r") as f:
+        return [SpaceBoundary.from_dict(data) for data in json.load(f)]
+
+
+class BoundaryContainment(object):
+    """
+    Containment test with the signature of `fn_contains(space, point)`.
+
+    The boundary of a space is extracted the first time the space is
+    queried. Ambiguous points and spaces without usable boundaries are
+    passed to fn_fallback. A dict of boundaries by space key is used as is
+    and filled, e.g. the one of a session cache.
+
+    vertical_tolerance widens the height band of every space, with
+    ignore_height only the plan position is tested.
+    """
+
+    def __init__(self,
+                 boundaries=None,
+                 fn_fallback=is_point_in_space,
+                 fn_extract=extract_space_boundary,
+                 tolerance=DEFAULT_TOLERANCE,
+                 vertical_tolerance=0.0,
+                 ignore_height=False):
+        # type: (list[SpaceBoundary], function, function, float, float, bool) -> None
+        if isinstance(boundaries, dict):
+            self.boundaries = boundaries
+        else:
+            self.boundaries = dict(
+                (boundary.key, boundary) for boundary in boundaries or [])
+        self.fn_fallback = fn_fallback
+        self.fn_extract = fn_extract
+        self.tolerance = tolerance
+        self.vertical_tolerance = vertical_tolerance
+        self.ignore_height = ignore_height
+        self.fallback_count = 0
+
+    def get_boundary(self, space):
+        # type: (DB.SpatialElement) -> SpaceBoundary
+        key = element_key(space)
+        if key not in self.boundaries:
+            self.boundaries[key] = self.fn_extract(space)
+        return self.boundaries[key]
+
+    def get_fallback_point(self, boundary, point):
+        # type: (SpaceBoundary, DB.XYZ) -> DB.XYZ
+        """The point, moved into the height band if the band was not tested as is"""
+        if not self.ignore_height and self.vertical_tolerance <= 0.0:
+            return point
+        z = boundary.get_band_height(point.Z)
+        if z == point.Z:
+            return point
+        # XYZ or a stand-in of it
+        return type(point)(point.X, point.Y, z)
+
+    def __call__(self, space, point):
+        # type: (DB.SpatialElement, DB.XYZ) -> bool
+        boundary = self.get_boundary(space)
+        result = boundary.classify(point.X, point.Y,
+                                   None if self.ignore_height else point.Z,
+                                   self.tolerance, self.vertical_tolerance)
+        if result == AMBIGUOUS:
+            self.fallback_count += 1
+            return self.fn_fallback(space,
+                                    self.get_fallback_point(boundary, point))
+        return result == INSIDE
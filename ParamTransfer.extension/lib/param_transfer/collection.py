@@ -0,0 +1,92 @@
+"""
+Collection of spaces and MEP family instances for the parameter transfer.
+"""
+from pyrevit import DB
+from System.Collections.Generic import List
+
+
+def _get_collector(doc, view_id=None):
+    # type: (DB.Document, DB.ElementId) -> DB.FilteredElementCollector
+    if view_id is None:
+        return DB.FilteredElementCollector(doc)
+    return DB.FilteredElementCollector(doc, view_id)
+
+
+def collect_spaces(doc, view_id=None):
+    # type: (DB.Document, DB.ElementId) -> list[DB.Element]
+    """Collect all MEP spaces, visible in the view if a view id is given"""
+    spatial_elements = _get_collector(doc, view_id).OfClass(
+        DB.SpatialElement).ToElements()
+    # separate Spaces from Rooms
+    return [
+        spatial_element for spatial_element in spatial_elements
+        if spatial_element.SpatialElementType == DB.SpatialElementType.Space
+    ]
+
+
+def collect_rooms(doc, view_id=None):
+    # type: (DB.Document, DB.ElementId) -> list[DB.Element]
+    """Collect all rooms, visible in the view if a view id is given"""
+    spatial_elements = _get_collector(doc, view_id).OfClass(
+        DB.SpatialElement).ToElements()
+    return [
+        spatial_element for spatial_element in spatial_elements
+        if spatial_element.SpatialElementType == DB.SpatialElementType.Room
+    ]
+
+
+def get_families_by_name(doc, family_name):
+    # type: (DB.Document, str) -> list[DB.Family]
+    """Return all loaded families with the given name"""
+    return [
+        family
+        for family in DB.FilteredElementCollector(doc).OfClass(DB.Family)
+        if family.Name == family_name
+    ]
+
+
+def get_family_symbol_ids(doc, family_name):
+    # type: (DB.Document, str) -> list[DB.ElementId]
+    """Return the ids of all types of all families with the given name"""
+    symbol_ids = []
+    for family in get_families_by_name(doc, family_name):
+        symbol_ids += list(family.GetFamilySymbolIds())
+    return symbol_ids
+
+
+def get_category_id(doc, category_name):
+    # type: (DB.Document, str) -> DB.ElementId
+    """Id of the model category with the given name or None"""
+    for category in doc.Settings.Categories:
+        if category.Name == category_name:
+            return category.Id
+    return None
+
+
+def collect_selected_instances(doc, selections, view_id=None):
+    # type: (DB.Document, list[InstanceSelection], DB.ElementId) -> list[DB.FamilyInstance]
+    """
+    Collect the instances of all selected families and categories in a
+    single collector pass, every instance once.
+    """
+    filters = []
+    for selection in selections:
+        if selection.is_category:
+            if selection.category_id is not None:
+                category_id = DB.ElementId(selection.category_id)
+            else:
+                category_id = get_category_id(doc, selection.name)
+            if category_id is not None:
+                filters.append(DB.ElementCategoryFilter(category_id))
+        else:
+            filters += [
+                DB.FamilyInstanceFilter(doc, symbol_id)
+                for symbol_id in get_family_symbol_ids(doc, selection.name)
+            ]
+    if not filters:
+        return []
+    element_filter = filters[0] if len(filters) == 1 else DB.LogicalOrFilter(
+        List[DB.ElementFilter](filters))
+    return list(
+        _get_collector(doc, view_id).OfClass(DB.FamilyInstance).WherePasses(
+            element_filter).ToElements())
@@ -0,0 +1,85 @@
+"""
+Elevation-aware containment of MEP instances in spaces.
+
+`IsPointInSpace` only accepts points between the bottom and the upper limit
+of a space, so equipment in the ceiling void, e.g. VAV boxes or ceiling
+mounted diffusers, is left unassigned. Besides the exact point test a
+Containment can
+
+- project the point onto the plan and match it against the spaces of the
+  level whose elevation band contains the point,
+- accept points up to a vertical tolerance above or below the space,
+- use the spatial calculation point of the family instead of its location
+  point.
+
+The projected and tolerance modes are evaluated against the precomputed
+boundary loops and height bands of the spaces, see param_transfer.boundaries,
+so they add no Revit API call per candidate space. The calculation point is
+read once per instance.
+"""
+from param_transfer.assignment import get_location_point
+
+CONTAINMENT_POINT = "point"
+CONTAINMENT_PROJECTED = "projected"
+CONTAINMENT_TOLERANCE = "tolerance"
+CONTAINMENT_CALCULATION_POINT = "calculation_point"
+CONTAINMENT_MODES = (CONTAINMENT_POINT, CONTAINMENT_PROJECTED,
+                     CONTAINMENT_TOLERANCE, CONTAINMENT_CALCULATION_POINT)
+
+
+def get_calculation_point(instance):
+    # type: (DB.FamilyInstance) -> DB.XYZ
+    """Spatial calculation point of the instance, its location point if it has none"""
+    if getattr(instance, "HasSpatialElementCalculationPoint", False):
+        return instance.GetSpatialElementCalculationPoint()
+    return get_location_point(instance)
+
+
+class Containment(object):
+    """Which point of an instance is matched and how its height is tested"""
+
+    def __init__(self, mode=CONTAINMENT_POINT, vertical_tolerance=0.0):
+        # type: (str, float) -> None
+        """vertical_tolerance: feet a point may lie above or below a space"""
+        if mode not in CONTAINMENT_MODES:
+            raise KeyError("Containment mode {} is not supported".format(mode))
+        vertical_tolerance = float(vertical_tolerance or 0.0)
+        if vertical_tolerance < 0.0:
+            raise KeyError("Negative vertical tolerance {}".format(
+                vertical_tolerance))
+        self.mode = mode
+        self.vertical_tolerance = vertical_tolerance if \
+            mode == CONTAINMENT_TOLERANCE else 0.0
+
+    @property
+    def is_projected(self):
+        # type: () -> bool
+        """Plan containment, matched on the level of the point elevation"""
+        return self.mode == CONTAINMENT_PROJECTED
+
+    @property
+    def requires_boundaries(self):
+        # type: () -> bool
+        """IsPointInSpace alone can not test the height band differently"""
+        return self.is_projected or self.vertical_tolerance > 0.0
+
+    def get_point(self, instance):
+        # type: (DB.FamilyInstance) -> DB.XYZ
+        """Point of the instance matched against the spaces"""
+        if self.mode == CONTAINMENT_CALCULATION_POINT:
+            return get_calculation_point(instance)
+        return get_location_point(instance)
+
+    def as_tokens(self):
+        # type: () -> list[str]
+        """Settings as text, e.g. for the preview settings of the window"""
+        return [
+            u"containment={}".format(self.mode),
+            u"vertical_tolerance={}".format(self.vertical_tolerance),
+        ]
+
+    @classmethod
+    def from_dict(cls, data):
+        # type: (dict) -> Containment
+        return cls(data.get("mode", CONTAINMENT_POINT),
+                   data.get("vertical_tolerance", 0.0))
@@ -0,0 +1,176 @@
+"""
+Discovery of the parameter names offered in the ParamTransfer window.
+
+All instances of one family type share the same parameter definitions, so
+the names are read from one representative instance per type plus the type
+itself instead of from every instance. Results are cached for the session
+per document, view and family or category as plain lists of names, see
+param_transfer.session. The doc-changed hook of the extension drops the
+entries of a document when elements are added or deleted and when families,
+element types or parameter elements are modified, e.g. by reloading a
+family or changing a parameter binding. Closing or synchronizing the
+document drops them too.
+"""
+from param_transfer.parameters import get_type_id
+from param_transfer.session import get_document_key, get_session_store
+
+DISCOVERY_STORE = "discovery"
+
+
+class DiscoveredParameters(object):
+    """Parameter names of a family, in discovery order"""
+
+    def __init__(self):
+        self.instance_names = []
+        self.type_names = []
+        self._seen_instance_names = set()
+        self._seen_type_names = set()
+        self.type_count = 0
+
+    def add_instance_name(self, name):
+        # type: (str) -> None
+        if name not in self._seen_instance_names:
+            self._seen_instance_names.add(name)
+            self.instance_names.append(name)
+
+    def add_type_name(self, name):
+        # type: (str) -> None
+        if name not in self._seen_type_names:
+            self._seen_type_names.add(name)
+            self.type_names.append(name)
+
+    def to_dict(self):
+        # type: () -> dict
+        return {
+            "instance_names": list(self.instance_names),
+            "type_names": list(self.type_names),
+            "type_count": self.type_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # type: (dict) -> DiscoveredParameters
+        discovered = cls()
+        for name in data["instance_names"]:
+            discovered.add_instance_name(name)
+        for name in data["type_names"]:
+            discovered.add_type_name(name)
+        discovered.type_count = data["type_count"]
+        return discovered
+
+
+def get_parameter_names(element):
+    # type: (DB.Element) -> list[str]
+    return [parameter.Definition.Name for parameter in element.Parameters]
+
+
+def get_representative_instances(instances):
+    # type: (list[DB.FamilyInstance]) -> dict[int, DB.FamilyInstance]
+    """Return the first instance of every family type"""
+    representatives = {}
+    for instance in instances:
+        type_id = get_type_id(instance)
+        if type_id not in representatives:
+            representatives[type_id] = instance
+    return representatives
+
+
+def discover_parameters(doc, instances):
+    # type: (DB.Document, list[DB.FamilyInstance]) -> DiscoveredParameters
+    """Discover instance and type parameter names of the given instances"""
+    discovered = DiscoveredParameters()
+    representatives = get_representative_instances(instances)
+    discovered.type_count = len(representatives)
+    for instance in representatives.values():
+        for name in get_parameter_names(instance):
+            discovered.add_instance_name(name)
+        element_type = doc.GetElement(instance.GetTypeId())
+        if element_type is not None:
+            for name in get_parameter_names(element_type):
+                discovered.add_type_name(name)
+    return discovered
+
+
+def get_discovery_cache():
+    # type: () -> dict
+    """(document key, view id, family name) -> DiscoveredParameters.to_dict"""
+    return get_session_store(DISCOVERY_STORE)
+
+
+def get_discovery_cache_key(doc, family_name, view_id=None):
+    # type: (DB.Document, str, DB.ElementId) -> tuple
+    return (get_document_key(doc),
+            view_id.IntegerValue if view_id is not None else None,
+            family_name)
+
+
+def discover_family_parameters(doc, family_name, instances, view_id=None,
+                               use_cache=True):
+    # type: (DB.Document, str, list[DB.FamilyInstance], DB.ElementId, bool) -> DiscoveredParameters
+    """
+    Discover parameter names of a family, cached per document, view and
+    family. view_id is the view the instances were collected in, None for
+    the whole document.
+    """
+    cache = get_discovery_cache()
+    cache_key = get_discovery_cache_key(doc, family_name, view_id)
+    if use_cache and cache_key in cache:
+        return DiscoveredParameters.from_dict(cache[cache_key])
+    discovered = discover_parameters(doc, instances)
+    cache[cache_key] = discovered.to_dict()
+    return discovered
+
+
+def clear_discovery_cache(document_key=None):
+    # type: (str) -> None
+    """Drop the cache of one document, of all documents without key"""
+    cache = get_discovery_cache()
+    for cache_key in list(cache):
+        if document_key is None or cache_key[0] == document_key:
+            del cache[cache_key]
+
+
+def has_modified_definitions(args):
+    # type: (DB.Events.DocumentChangedEventArgs) -> bool
+    """Check if families, element types or parameter elements were modified"""
+    from pyrevit import DB
+
+    definitions_filter = DB.LogicalOrFilter(
+        DB.ElementIsElementTypeFilter(),
+        DB.LogicalOrFilter(
+            DB.ElementClassFilter(DB.Family),
+            DB.LogicalOrFilter(
+                DB.ElementClassFilter(DB.ParameterElement),
+                DB.ElementClassFilter(DB.SharedParameterElement))))
+    return args.GetModifiedElementIds(definitions_filter).Count > 0
+
+
+def on_document_changed(args,
+                        fn_has_modified_definitions=has_modified_definitions):
+    # type: (DB.Events.DocumentChangedEventArgs, function) -> None
+    """
+    Called by the doc-changed hook: new or deleted instances and types, and
+    modified families, types or parameter elements change the names
+    """
+    document_key = get_document_key(args.GetDocument())
+    if not any(cache_key[0] == document_key
+               for cache_key in get_discovery_cache()):
+        return
+    if (args.GetAddedElementIds().Count or args.GetDeletedElementIds().Count
+            or fn_has_modified_definitions(args)):
+        clear_discovery_cache(document_key)
+
+
+def sort_parameter_names(names):
+    # type: (list[str]) -> list[str]
+    """Unique names in case insensitive order, as offered in the mapping rows"""
+    return sorted(set(names), key=lambda name: (name.lower(), name))
+
+
+def name_matches_filter(name, filter_text):
+    # type: (str, str) -> bool
+    """Case insensitive match of all words of the filter text"""
+    if not filter_text:
+        return True
+    name = name.lower()
+    return all(word in name for word in filter_text.lower().split())
@@ -0,0 +1,189 @@
+"""
+Distribution of a space value over the instances in the space.
+
+The shares of all `space -> instances` groups are computed in one pass
+before any value is split, either equal or weighted by an instance
+parameter, e.g. the nominal airflow of diffusers. With largest-remainder
+rounding the parts are rounded to the given decimals so that they still add
+up to the rounded space total.
+"""
+import math
+
+from param_transfer.assignment import element_key
+from param_transfer.division import DEFAULT_NUMBER_FORMAT, format_number, parse_number
+
+DISTRIBUTION_EQUAL = "equal"
+DISTRIBUTION_WEIGHTED = "weighted"
+DISTRIBUTION_MODES = (DISTRIBUTION_EQUAL, DISTRIBUTION_WEIGHTED)
+
+ROUNDING_NONE = "none"
+ROUNDING_LARGEST_REMAINDER = "largest_remainder"
+ROUNDING_MODES = (ROUNDING_NONE, ROUNDING_LARGEST_REMAINDER)
+
+
+class Distribution(object):
+    """How a space value is split over the instances of the space"""
+
+    def __init__(self,
+                 mode=DISTRIBUTION_EQUAL,
+                 weight_parameter_name=None,
+                 rounding=ROUNDING_NONE,
+                 decimals=0):
+        # type: (str, str, str, int) -> None
+        if mode not in DISTRIBUTION_MODES:
+            raise KeyError("Distribution mode {} is not supported".format(mode))
+        if rounding not in ROUNDING_MODES:
+            raise KeyError("Rounding mode {} is not supported".format(rounding))
+        if mode == DISTRIBUTION_WEIGHTED and not weight_parameter_name:
+            raise KeyError("Weighted distribution without weight parameter")
+        self.mode = mode
+        self.weight_parameter_name = weight_parameter_name
+        self.rounding = rounding
+        self.decimals = int(decimals)
+
+    @property
+    def is_weighted(self):
+        # type: () -> bool
+        return self.mode == DISTRIBUTION_WEIGHTED
+
+    @property
+    def keeps_total(self):
+        # type: () -> bool
+        return self.rounding == ROUNDING_LARGEST_REMAINDER
+
+    def as_tokens(self):
+        # type: () -> list[str]
+        """Settings as text, e.g. for the mapping fingerprint"""
+        return [
+            u"distribution={}".format(self.mode),
+            u"weight={}".format(self.weight_parameter_name or u""),
+            u"rounding={}:{}".format(self.rounding, self.decimals),
+        ]
+
+    @classmethod
+    def from_dict(cls, data):
+        # type: (dict) -> Distribution
+        return cls(data.get("mode", DISTRIBUTION_EQUAL),
+                   data.get("weight_parameter"),
+                   data.get("rounding", ROUNDING_NONE),
+                   data.get("decimals", 0))
+
+
+def get_shares(weights):
+    # type: (list[float]) -> list[float]
+    """
+    Normalize weights to shares adding up to 1. Missing or negative weights
+    count as 0, groups without any positive weight are split equally.
+    """
+    weights = [weight if weight is not None and weight > 0 else 0.0
+               for weight in weights]
+    total = sum(weights)
+    if total <= 0:
+        return [1.0 / len(weights)] * len(weights) if weights else []
+    return [weight / total for weight in weights]
+
+
+class GroupShares(object):
+    """Share and weight of every instance in its group"""
+
+    def __init__(self):
+        self.shares_by_instance = {}
+        self.weights_by_instance = {}
+
+    def get(self, instances):
+        # type: (list[DB.Element]) -> list[float]
+        return [self.shares_by_instance[element_key(instance)]
+                for instance in instances]
+
+    def get_weights_token(self, instances):
+        # type: (list[DB.Element]) -> str
+        """Text of the weights of a group, e.g. for fingerprints"""
+        return u",".join(
+            repr(self.weights_by_instance.get(element_key(instance)))
+            for instance in instances)
+
+
+def compute_group_shares(groups, distribution, fn_get_weight=None):
+    # type: (list[tuple[DB.Element, list[DB.Element]]], Distribution, function) -> GroupShares
+    """
+    One pass over all (space, instances) groups. fn_get_weight(instance)
+    returns the weight of an instance for weighted distributions.
+    """
+    group_shares = GroupShares()
+    for space, instances in groups:
+        if distribution.is_weighted:
+            weights = [fn_get_weight(instance) for instance in instances]
+        else:
+            weights = [1.0] * len(instances)
+        for instance, weight, share in zip(instances, weights,
+                                           get_shares(weights)):
+            group_shares.weights_by_instance[element_key(instance)] = weight
+            group_shares.shares_by_instance[element_key(instance)] = share
+    return group_shares
+
+
+def largest_remainder_split(total, shares, decimals=0):
+    # type: (float, list[float], int) -> list[float]
+    """
+    Split total by the shares into parts rounded to decimals whose sum is
+    the rounded total. The rounding units left after flooring go to the
+    parts with the largest remainders.
+    """
+    unit = 10.0 ** -decimals
+    total_units = int(round(total / unit))
+    raw_parts = [total_units * share for share in shares]
+    parts = [int(math.floor(raw_part)) for raw_part in raw_parts]
+    remaining_units = total_units - sum(parts)
+    by_remainder = sorted(range(len(parts)),
+                          key=lambda i: raw_parts[i] - parts[i],
+                          reverse=True)
+    for i in by_remainder[:remaining_units]:
+        parts[i] += 1
+    return [round(part * unit, max(decimals, 0)) for part in parts]
+
+
+def split_number(value, shares, distribution):
+    # type: (float, list[float], Distribution) -> list[float]
+    if distribution.keeps_total:
+        return largest_remainder_split(value, shares, distribution.decimals)
+    return [value * share for share in shares]
+
+
+def split_value(value, shares, distribution, fn_to_display=None,
+                fn_to_internal=None, number_format=DEFAULT_NUMBER_FORMAT):
+    # type: (object, list[float], Distribution, function, function, NumberFormat) -> list
+    """
+    Split a native transfer value into one part per share.
+
+    Doubles are split in internal units, rounding happens in display units
+    through fn_to_display/fn_to_internal. Integers can only be split into
+    whole parts, always with largest-remainder rounding, so the parts add
+    up to the value. Text values keep their unit suffix and
+    element ids are not split. Numbers in text values are read with the
+    separators of number_format, see param_transfer.division.
+    """
+    if isinstance(value, float):
+        if not distribution.keeps_total or fn_to_display is None:
+            return split_number(value, shares, distribution)
+        parts = split_number(fn_to_display(value), shares, distribution)
+        return [fn_to_internal(part) for part in parts]
+
+    if isinstance(value, int) and not isinstance(value, bool):
+        return [int(round(part))
+                for part in largest_remainder_split(value, shares, 0)]
+
+    if isinstance(value, str):
+        parsed = parse_number(value, number_format)
+        if parsed is None:
+            return [value] * len(shares)
+        min_decimals = parsed.decimals
+        if distribution.keeps_total:
+            min_decimals = distribution.decimals
+        # keep subclasses like values.FormattedValue
+        return [
+            type(value)(parsed.prefix + format_number(
+                part, parsed.decimal_separator, min_decimals) + parsed.suffix)
+            for part in split_number(parsed.value, shares, distribution)
+        ]
+
+    return [value] * len(shares)
@@ -0,0 +1,107 @@
+# coding: UTF-8
+"""
+Localized numbers in text values, e.g. "12,5 m²" or "1.234,5 m³/h".
+
+The decimal and digit grouping symbols are not guessed from the text, they
+come from the units of the document (`Units.DecimalSymbol` and
+`Units.DigitGroupingSymbol`), so "1,234 CFM" is 1234 in a document with
+en-US digit grouping and 1.234 in one with a decimal comma. The pattern of
+every number format is compiled once. The unit suffix of a value is kept,
+so a split or aggregated value is written back in the same notation.
+"""
+import re
+from collections import namedtuple
+
+NumberFormat = namedtuple("NumberFormat",
+                          ["decimal_separator", "grouping_separators"])
+
+# Revit defaults, used when no document is at hand
+DEFAULT_NUMBER_FORMAT = NumberFormat(".", ",")
+
+# DB.DecimalSymbol and DB.DigitGroupingSymbol member names
+_DECIMAL_SYMBOLS = {"Dot": ".", "Comma": ","}
+_DIGIT_GROUPING_SYMBOLS = {
+    "Dot": ".",
+    "Comma": ",",
+    # every kind of space and apostrophe Revit or the OS may display
+    "Space": u" \u00a0\u202f",
+    "Apostrophe": u"'\u2019",
+    "Tick": u"'\u2019`",
+}
+
+DEFAULT_PRECISION = 4
+
+ParsedNumber = namedtuple(
+    "ParsedNumber",
+    ["value", "prefix", "suffix", "decimal_separator", "decimals"])
+
+__number_patterns = {}
+
+
+def get_number_format(doc):
+    # type: (DB.Document) -> NumberFormat
+    """Decimal and digit grouping symbols of the units of the document"""
+    units = doc.GetUnits()
+    return NumberFormat(
+        _DECIMAL_SYMBOLS.get(str(units.DecimalSymbol), "."),
+        _DIGIT_GROUPING_SYMBOLS.get(str(units.DigitGroupingSymbol), ","))
+
+
+def _get_number_pattern(number_format):
+    # type: (NumberFormat) -> re.Pattern
+    if number_format not in __number_patterns:
+        grouping_characters = u"".join(
+            re.escape(character)
+            for character in number_format.grouping_separators
+            if character != number_format.decimal_separator)
+        # groups of three digits after the first one, the decimals need at
+        # least one digit, so "12. OG" is the number 12
+        integer_pattern = u"[0-9]+"
+        if grouping_characters:
+            integer_pattern = u"[0-9]{{1,3}}(?:[{}][0-9]{{3}})+(?![0-9])|[0-9]+".format(
+                grouping_characters)
+        __number_patterns[number_format] = re.compile(
+            u"([-+\u2212]?)({})(?:{}([0-9]+))?".format(
+                integer_pattern,
+                re.escape(number_format.decimal_separator)),
+            re.UNICODE)
+    return __number_patterns[number_format]
+
+
+def parse_number(text, number_format=DEFAULT_NUMBER_FORMAT):
+    # type: (str, NumberFormat) -> ParsedNumber
+    """Parse the first number of a value string, None if there is none"""
+    if not text:
+        return None
+    match = _get_number_pattern(number_format).search(text)
+    if match is None:
+        return None
+    sign, integer_part, decimal_part = match.groups()
+    integer_part = u"".join(
+        character for character in integer_part if character.isdigit())
+
+    value = float(integer_part + "." + (decimal_part or "0"))
+    if sign in (u"-", u"\u2212"):
+        value = -value
+    return ParsedNumber(value=value,
+                        prefix=text[:match.start()],
+                        suffix=text[match.end():],
+                        decimal_separator=number_format.decimal_separator,
+                        decimals=len(decimal_part or ""))
+
+
+def format_number(value, decimal_separator=".", min_decimals=0,
+                  precision=DEFAULT_PRECISION):
+    # type: (float, str, int, int) -> str
+    """Format a float with at least min_decimals and at most precision decimals"""
+    precision = max(precision, min_decimals)
+    text = "{:.{precision}f}".format(value, precision=precision)
+    if "." in text:
+        integer_part, decimal_part = text.split(".")
+        decimal_part = decimal_part.rstrip("0")
+        if len(decimal_part) < min_decimals:
+            decimal_part += "0" * (min_decimals - len(decimal_part))
+        text = integer_part
+        if decimal_part:
+            text += decimal_separator + decimal_part
+    return text
@@ -0,0 +1,418 @@
+"""
+Matching and write engine of the parameter transfer and of the reverse
+aggregation of instance values into spaces.
+
+Shared by the ParamTransfer window and the headless batch runner.
+"""
+from param_transfer.aggregation import group_aggregations_by_keys, iter_space_groups, plan_space_aggregates
+from param_transfer.assignment import assign_instances_to_spaces, element_key, get_last_phase
+from param_transfer.boundaries import BoundaryContainment, extract_space_boundary
+from param_transfer.containment import Containment
+from param_transfer.distribution import Distribution, compute_group_shares, get_shares, split_value
+from param_transfer.division import DEFAULT_NUMBER_FORMAT, parse_number
+from param_transfer.fingerprints import get_mapping_hash, get_source_values_hash, make_fingerprint
+from param_transfer.instrumentation import COUNTER_ELEMENTS_VISITED, COUNTER_GET_BOUNDARY_SEGMENTS, COUNTER_IS_POINT_IN_SPACE, COUNTER_LOOKUP_PARAMETER, PhaseTimer
+from param_transfer.linked import is_point_in_spatial_element
+from param_transfer.partition import LevelPartition
+from param_transfer.selection import split_by_key
+from param_transfer.spatial_index import build_space_index, is_point_in_space
+from param_transfer.parameters import ParameterResolver
+from param_transfer.values import ValueConverter, get_parameter_kind, get_spec_type_id, read_native
+from param_transfer.write_plan import WritePlan, diff_write_plan
+
+
+def get_weight(resolver, instance, weight_parameter_name,
+               number_format=DEFAULT_NUMBER_FORMAT):
+    # type: (ParameterResolver, DB.FamilyInstance, str, NumberFormat) -> float
+    """Numeric value of the weight parameter of an instance or its type"""
+    parameter = resolver.get(instance, weight_parameter_name)
+    if parameter is None:
+        return None
+    value = read_native(parameter)
+    if isinstance(value, (float, int)):
+        return float(value)
+    if isinstance(value, str):
+        parsed = parse_number(value, number_format)
+        return parsed.value if parsed is not None else None
+    return None
+
+
+def plan_space_writes(plan, resolver, converter, space, instances,
+                      parameter_pairs, distribution=None,
+                      group_instances=None, group_shares=None,
+                      source_resolver=None):
+    # type: (WritePlan, ParameterResolver, ValueConverter, DB.Element, list[DB.FamilyInstance], list[tuple[str, str]], Distribution, list[DB.FamilyInstance], GroupShares, ParameterResolver) -> None
+    """
+    Add the writes of all parameter pairs from the space to its instances.
+
+    With a distribution the space value is split over group_instances, all
+    instances of the space, of which only the given instances are planned.
+    group_shares holds the precomputed shares, equal shares otherwise.
+    source_resolver resolves the space parameters if the space is not part
+    of the host document.
+    """
+    source_resolver = source_resolver or resolver
+    group_instances = group_instances or instances
+    distribute = distribution is not None and len(group_instances) > 1
+    if distribute:
+        if group_shares is not None:
+            shares = group_shares.get(group_instances)
+        else:
+            shares = get_shares([1.0] * len(group_instances))
+        planned_keys = set(element_key(instance) for instance in instances)
+        instances = [
+            (index, instance)
+            for index, instance in enumerate(group_instances)
+            if element_key(instance) in planned_keys
+        ]
+    else:
+        instances = list(enumerate(instances))
+
+    for space_parameter_name, instance_parameter_name in parameter_pairs:
+        if space_parameter_name is None or instance_parameter_name is None:
+            continue
+        space_parameter = source_resolver.get(space, space_parameter_name)
+        if space_parameter is None:
+            continue
+
+        # the converted value only depends on the storage and spec type of
+        # the target, so it is computed and split once per kind of target
+        # parameter
+        parts_by_target_kind = {}
+        for index, instance in instances:
+            instance_parameter = resolver.get(instance,
+                                              instance_parameter_name,
+                                              include_type=False)
+            if instance_parameter is None:
+                continue
+            target_kind = get_parameter_kind(instance_parameter)
+            if target_kind not in parts_by_target_kind:
+                value = converter.convert(space_parameter, instance_parameter)
+                if value is None:
+                    parts = None
+                elif distribute:
+                    spec_type_id = get_spec_type_id(instance_parameter)
+                    parts = split_value(
+                        value, shares, distribution,
+                        lambda v: converter.to_display(v, spec_type_id),
+                        lambda v: converter.to_internal(v, spec_type_id),
+                        converter.number_format)
+                else:
+                    parts = value
+                parts_by_target_kind[target_kind] = parts
+            parts = parts_by_target_kind[target_kind]
+            if parts is None:
+                continue
+            value = parts[index] if distribute else parts
+            plan.add(instance, instance_parameter, value, space=space)
+
+
+def get_mapping_groups(assignment, fn_get_mapping_key=None):
+    # type: (SpaceAssignment, function) -> list[tuple[DB.Element, object, list[DB.FamilyInstance]]]
+    """(space, mapping key, instances) of all spaces with instances"""
+    groups = []
+    for space, space_instances in assignment.items():
+        if fn_get_mapping_key is None:
+            groups.append((space, None, space_instances))
+            continue
+        for key, key_instances in split_by_key(space_instances,
+                                               fn_get_mapping_key):
+            groups.append((space, key, key_instances))
+    return groups
+
+
+def match_instances(doc,
+                    spaces,
+                    instances,
+                    timer,
+                    phase=None,
+                    partition_by_level=False,
+                    linked_source=None,
+                    use_boundary_containment=True,
+                    fn_extract_boundary=extract_space_boundary,
+                    space_geometry=None,
+                    containment=None):
+    # type: (DB.Document, list[DB.Element], list[DB.FamilyInstance], PhaseTimer, DB.Phase, bool, LinkedSpaceSource, bool, function, SpaceGeometry, Containment) -> SpaceAssignment
+    """
+    Assign every instance to its space, shared by the transfer and the
+    aggregation. See build_transfer_plan for the options.
+
+    A SpaceGeometry of the session cache, see param_transfer.space_cache,
+    provides the boundaries and indexes of earlier runs and keeps the new
+    ones. It only applies to host spaces.
+    """
+    containment = containment or Containment()
+    if containment.is_projected and linked_source is not None:
+        # the levels of a linked model are not the levels of the instances
+        raise KeyError("Projected containment in spaces of a linked model is not supported")
+    # visit every MEP instance once, the phase is resolved once per run
+    if phase is None:
+        phase = get_last_phase(doc)
+    timer.count(COUNTER_ELEMENTS_VISITED, len(spaces) + len(instances))
+
+    # exact test of the candidates of the spatial index, only the
+    # Revit API calls are counted
+    fn_contains = timer.counting(
+        COUNTER_IS_POINT_IN_SPACE, is_point_in_space
+        if linked_source is None else is_point_in_spatial_element)
+    boundaries = None
+    fn_build_index = build_space_index
+    fn_extract = timer.counting(COUNTER_GET_BOUNDARY_SEGMENTS,
+                                fn_extract_boundary)
+    if linked_source is not None:
+        # only the exact test maps host points into the link, the boundaries
+        # of the link instance are moved into host coordinates once
+        fn_contains = linked_source.get_fn_contains(fn_contains)
+        boundaries = linked_source.boundaries
+        fn_extract = linked_source.get_fn_extract_boundary(fn_extract)
+    elif space_geometry is not None:
+        boundaries = space_geometry.boundaries
+        fn_build_index = space_geometry.get_index
+    # the widened or ignored height band is only known to the boundaries
+    if use_boundary_containment or containment.requires_boundaries:
+        fn_contains = BoundaryContainment(
+            boundaries,
+            fn_fallback=fn_contains,
+            fn_extract=fn_extract,
+            vertical_tolerance=containment.vertical_tolerance,
+            ignore_height=containment.is_projected)
+
+    if linked_source is not None:
+        assignment = assign_instances_to_spaces(
+            instances, spaces,
+            space_index=linked_source.build_index(),
+            fn_contains=fn_contains,
+            fn_get_point=containment.get_point)
+    elif partition_by_level or containment.is_projected:
+        # projected points only search the spaces of their elevation band
+        partition = LevelPartition(
+            spaces,
+            fn_build_index=fn_build_index,
+            fn_get_point=containment.get_point,
+            match_by_elevation=containment.is_projected)
+        partition.add_instances(instances)
+        assignment = assign_instances_to_spaces(
+            instances, spaces, phase=phase,
+            fn_contains=fn_contains,
+            fn_get_space_index=partition.get_space_index,
+            fn_get_point=containment.get_point)
+        if partition_by_level:
+            assignment.level_statistics = partition.update_statistics(
+                assignment)
+    else:
+        assignment = assign_instances_to_spaces(instances,
+                                                spaces,
+                                                phase=phase,
+                                                fn_contains=fn_contains,
+                                                fn_build_index=fn_build_index,
+                                                fn_get_point=containment.get_point)
+    return assignment
+
+
+def build_transfer_plan(doc,
+                        spaces,
+                        instances,
+                        parameter_pairs,
+                        divide_by_element_count_enabled=False,
+                        timer=None,
+                        phase=None,
+                        fingerprints=None,
+                        partition_by_level=False,
+                        linked_source=None,
+                        use_boundary_containment=True,
+                        distribution=None,
+                        fn_extract_boundary=extract_space_boundary,
+                        space_geometry=None,
+                        fn_get_mapping_key=None,
+                        pairs_by_key=None,
+                        containment=None,
+                        split_per_key=False):
+    # type: (DB.Document, list[DB.Element], list[DB.FamilyInstance], list[tuple[str, str]], bool, PhaseTimer, DB.Phase, FingerprintStore, bool, LinkedSpaceSource, bool, Distribution, function, SpaceGeometry, function, dict, Containment, bool) -> tuple[WritePlan, SpaceAssignment]
+    """
+    Match the instances to the spaces and build the diffed write plan.
+    Nothing is written to the model.
+
+    With a FingerprintStore only instances whose space, source values or
+    mapping changed since the last committed run are planned.
+
+    With partition_by_level, meant for whole-document runs, the geometric
+    fallback only searches the spaces on the level of each instance and
+    per-level counts are stored in assignment.level_statistics.
+
+    With a LinkedSpaceSource the spaces come from a linked model. Revit does
+    not report linked spaces per phase, so every instance is matched
+    geometrically against the index of the link in host coordinates, and
+    partition_by_level does not apply.
+
+    With use_boundary_containment the geometric fallback tests points
+    against the boundary loops of the spaces, see param_transfer.boundaries,
+    and only calls IsPointInSpace for points on an edge. fn_extract_boundary
+    reads the boundary of one space, e.g. from stand-in objects.
+    space_geometry keeps boundaries and indexes for the next run, see
+    param_transfer.space_cache.
+
+    A Containment matches instances in the ceiling void or above the upper
+    limit of their space, by the plan position on the level of their
+    elevation, with a vertical tolerance or by the spatial calculation point
+    of the family, see param_transfer.containment. The exact location point
+    test is the default.
+
+    Instances of several families or categories are matched in one pass.
+    fn_get_mapping_key(instance) returns the key of its family or category,
+    pairs_by_key the parameter pairs of every key, parameter_pairs are used
+    for unknown keys, see param_transfer.selection. Values are distributed
+    over all instances of a space, with split_per_key within the instances
+    of one key in a space.
+
+    A Distribution splits the space values over the instances of each space,
+    divide_by_element_count_enabled is the same as an equal Distribution.
+    """
+    if distribution is None and divide_by_element_count_enabled:
+        distribution = Distribution()
+    timer = timer or PhaseTimer()
+    resolver = ParameterResolver(doc)
+    source_resolver = resolver
+    if linked_source is not None:
+        spaces = linked_source.spaces
+        source_resolver = ParameterResolver(linked_source.doc)
+    converter = ValueConverter(doc)
+    plan = WritePlan()
+
+    with timer.phase("Space matching"):
+        assignment = match_instances(doc, spaces, instances, timer, phase,
+                                     partition_by_level, linked_source,
+                                     use_boundary_containment,
+                                     fn_extract_boundary, space_geometry,
+                                     containment)
+
+    with timer.phase("Value computation"):
+        groups = get_mapping_groups(assignment, fn_get_mapping_key)
+
+        def get_split_instances(space, key_instances):
+            if split_per_key:
+                return key_instances
+            return assignment.instances_by_space_id[element_key(space)]
+
+        group_shares = None
+        if distribution is not None:
+            # shares of all groups in one pass, before any value is split
+            split_groups = [(space, group_instances)
+                            for space, _, group_instances in groups]
+            if not split_per_key:
+                split_groups = list(assignment.items())
+            group_shares = compute_group_shares(
+                split_groups, distribution,
+                lambda instance: get_weight(
+                    resolver, instance, distribution.weight_parameter_name,
+                    converter.number_format))
+        mapping_hashes = {}
+        for space, key, group_instances in groups:
+            pairs = parameter_pairs
+            if pairs_by_key is not None:
+                pairs = pairs_by_key.get(key, parameter_pairs)
+            if not pairs:
+                continue
+            split_instances = get_split_instances(space, group_instances)
+            planned_instances = group_instances
+            if fingerprints is not None:
+                if key not in mapping_hashes:
+                    mapping_hashes[key] = get_mapping_hash(
+                        pairs, distribution is not None,
+                        distribution.as_tokens()
+                        if distribution is not None else None)
+                fingerprint = make_fingerprint(
+                    space,
+                    get_source_values_hash(
+                        source_resolver, space, pairs,
+                        len(split_instances),
+                        group_shares.get_weights_token(split_instances)
+                        if group_shares is not None else u""),
+                    mapping_hashes[key])
+                planned_instances = fingerprints.filter_changed(
+                    group_instances, fingerprint)
+                if not planned_instances:
+                    continue
+            plan_space_writes(plan, resolver, converter, space,
+                              planned_instances,
+                              pairs,
+                              distribution,
+                              group_instances=split_instances,
+                              group_shares=group_shares,
+                              source_resolver=source_resolver)
+        lookup_count = resolver.lookup_count
+        if source_resolver is not resolver:
+            lookup_count += source_resolver.lookup_count
+        timer.count(COUNTER_LOOKUP_PARAMETER, lookup_count)
+
+    with timer.phase("Diff"):
+        # drop writes which would not change the current value before
+        # the transaction is opened
+        plan = diff_write_plan(plan, converter)
+
+    return plan, assignment
+
+
+def build_aggregation_plan(doc,
+                           spaces,
+                           instances,
+                           aggregations,
+                           timer=None,
+                           phase=None,
+                           partition_by_level=False,
+                           use_boundary_containment=True,
+                           fn_extract_boundary=extract_space_boundary,
+                           space_geometry=None,
+                           fn_get_mapping_key=None,
+                           aggregations_by_key=None,
+                           containment=None):
+    # type: (DB.Document, list[DB.Element], list[DB.FamilyInstance], list[AggregationMapping], PhaseTimer, DB.Phase, bool, bool, function, SpaceGeometry, function, dict, Containment) -> tuple[WritePlan, SpaceAssignment]
+    """
+    Match the instances to the spaces and plan the aggregated values of
+    every space, spaces without instances included. Nothing is written.
+    Spaces of linked models can not be written and are not supported.
+
+    With fn_get_mapping_key and aggregations_by_key the aggregations of
+    every key only see the instances of that key, see build_transfer_plan.
+    Keys that share a mapping are aggregated together, a space parameter
+    targeted by different mappings raises KeyError, see
+    param_transfer.aggregation.group_aggregations_by_keys.
+    """
+    # raises KeyError before anything is matched
+    aggregation_groups = group_aggregations_by_keys(
+        aggregations_by_key if aggregations_by_key is not None else
+        {None: aggregations})
+    timer = timer or PhaseTimer()
+    resolver = ParameterResolver(doc)
+    converter = ValueConverter(doc)
+    plan = WritePlan()
+
+    with timer.phase("Space matching"):
+        assignment = match_instances(doc, spaces, instances, timer, phase,
+                                     partition_by_level,
+                                     use_boundary_containment=use_boundary_containment,
+                                     fn_extract_boundary=fn_extract_boundary,
+                                     space_geometry=space_geometry,
+                                     containment=containment)
+
+    with timer.phase("Aggregation"):
+        for space, space_instances in iter_space_groups(assignment):
+            if aggregations_by_key is None:
+                plan_space_aggregates(plan, resolver, converter, space,
+                                      space_instances, aggregations)
+                continue
+            instances_by_key = dict(
+                split_by_key(space_instances, fn_get_mapping_key))
+            # every mapping is aggregated once over the instances of all of
+            # its keys, counts of keys without instances are 0
+            for keys, key_aggregations in aggregation_groups:
+                plan_space_aggregates(
+                    plan, resolver, converter, space, [
+                        instance for key in keys
+                        for instance in instances_by_key.get(key, [])
+                    ], key_aggregations)
+        timer.count(COUNTER_LOOKUP_PARAMETER, resolver.lookup_count)
+
+    with timer.phase("Diff"):
+        plan = diff_write_plan(plan, converter)
+
+    return plan, assignment
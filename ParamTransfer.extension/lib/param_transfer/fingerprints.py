@@ -0,0 +1,150 @@
+"""
+Per-instance fingerprints for incremental transfers.
+
+After a transfer every target instance gets a fingerprint made of
+- the UniqueId of the space it was matched to
+- a hash of the source values of that space
+- a hash of the mapping
+
+The fingerprints are kept in a sidecar JSON file per document, keyed by the
+UniqueId of the instance. A rerun only computes and writes the instances
+whose fingerprint changed, values edited by hand on an instance are not
+detected.
+"""
+import hashlib
+import json
+import os
+from os import path
+
+from param_transfer.values import read_native
+
+FINGERPRINT_DIRECTORY = "ParamTransfer"
+
+
+def _hash(tokens):
+    # type: (list[str]) -> str
+    return hashlib.md5(
+        u"\x1f".join(tokens).encode("utf-8")).hexdigest()[:16]
+
+
+def _get_value_token(value):
+    # type: (object) -> str
+    """Stable text of a native value, doubles keep their full precision"""
+    if value is None:
+        return u""
+    if hasattr(value, "IntegerValue"):
+        return u"id:{}".format(value.IntegerValue)
+    if isinstance(value, float):
+        return repr(value)
+    return u"{}".format(value)
+
+
+def get_mapping_hash(parameter_pairs, divide_by_element_count_enabled=False,
+                     extra_tokens=None):
+    # type: (list[tuple[str, str]], bool, list[str]) -> str
+    tokens = [u"divide={}".format(bool(divide_by_element_count_enabled))]
+    tokens += extra_tokens or []
+    for source, target in parameter_pairs:
+        tokens.append(u"{}->{}".format(source, target))
+    return _hash(tokens)
+
+
+def get_source_values_hash(resolver, space, parameter_pairs, element_count,
+                           weights_token=u""):
+    # type: (ParameterResolver, DB.Element, list[tuple[str, str]], int, str) -> str
+    """
+    Hash of all source values of a space. The element count and the
+    distribution weights of the group are part of the hash because split
+    values change with them.
+    """
+    tokens = [u"count={}".format(element_count), weights_token]
+    for source, _ in parameter_pairs:
+        parameter = resolver.get(space, source) if source else None
+        tokens.append(_get_value_token(
+            read_native(parameter) if parameter is not None else None))
+    return _hash(tokens)
+
+
+def make_fingerprint(space, source_values_hash, mapping_hash):
+    # type: (DB.Element, str, str) -> str
+    return u"{}|{}|{}".format(space.UniqueId, source_values_hash, mapping_hash)
+
+
+def get_fingerprint_file_path(doc):
+    # type: (DB.Document) -> str
+    """Sidecar file of the document in the user config directory"""
+    import filemgr
+
+    directory = path.join(filemgr.get_user_config_path(),
+                          FINGERPRINT_DIRECTORY)
+    if not path.exists(directory):
+        os.makedirs(directory)
+    document_key = doc.PathName or doc.Title
+    return path.join(directory, "fingerprints_{}.json".format(
+        _hash([document_key])))
+
+
+class FingerprintStore(object):
+    """
+    Fingerprints of the last transfer, keyed by instance UniqueId.
+    New fingerprints are pending until the writes were committed.
+    """
+
+    def __init__(self, file_path=None, fingerprints=None):
+        # type: (str, dict[str, str]) -> None
+        self.file_path = file_path
+        self.fingerprints = fingerprints or {}
+        self.pending = {}
+        self.unchanged_count = 0
+
+    @classmethod
+    def load(cls, file_path):
+        # type: (str) -> FingerprintStore
+        """Load the store, a missing or broken file gives an empty store"""
+        fingerprints = {}
+        if path.exists(file_path):
+            try:
+                with open(file_path, "r") as file:
+                    fingerprints = json.load(file)
+            except ValueError:
+                fingerprints = {}
+            if not isinstance(fingerprints, dict):
+                fingerprints = {}
+        return cls(file_path, fingerprints)
+
+    @classmethod
+    def for_document(cls, doc):
+        # type: (DB.Document) -> FingerprintStore
+        return cls.load(get_fingerprint_file_path(doc))
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def filter_changed(self, instances, fingerprint):
+        # type: (list[DB.Element], str) -> list[DB.Element]
+        """Return the instances whose stored fingerprint differs"""
+        changed = []
+        for instance in instances:
+            unique_id = instance.UniqueId
+            if self.fingerprints.get(unique_id) == fingerprint:
+                self.unchanged_count += 1
+                continue
+            self.pending[unique_id] = fingerprint
+            changed.append(instance)
+        return changed
+
+    def commit(self, failed_unique_ids=None):
+        # type: (set[str]) -> None
+        """Accept the pending fingerprints after the writes were applied"""
+        failed_unique_ids = failed_unique_ids or set()
+        for unique_id, fingerprint in self.pending.items():
+            if unique_id not in failed_unique_ids:
+                self.fingerprints[unique_id] = fingerprint
+        self.pending = {}
+
+    def save(self):
+        # type: () -> None
+        if self.file_path is None:
+            return
+        with open(self.file_path, "w") as file:
+            json.dump(self.fingerprints, file)
@@ -0,0 +1,108 @@
+"""
+Timing and API call counters of the parameter transfer phases.
+
+Runs can be appended to a local JSON-lines log, one record per run, to
+compare models and track trends over time.
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from os import path
+
+COUNTER_ELEMENTS_VISITED = "Elements visited"
+COUNTER_IS_POINT_IN_SPACE = "IsPointInSpace calls"
+COUNTER_LOOKUP_PARAMETER = "LookupParameter calls"
+COUNTER_GET_BOUNDARY_SEGMENTS = "GetBoundarySegments calls"
+COUNTER_SET = "Set calls"
+
+RUN_LOG_FILE_NAME = "runs.jsonl"
+
+
+class PhaseTimer(object):
+    """
+    Collects the wall time spent in each named phase, in call order, and
+    named counters, e.g. of Revit API calls.
+    """
+
+    def __init__(self):
+        self.durations = []
+        self.counters = {}
+        self._counter_names = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.durations.append((name, time.time() - start))
+
+    @property
+    def total(self):
+        # type: () -> float
+        return sum(duration for _, duration in self.durations)
+
+    def count(self, name, amount=1):
+        # type: (str, int) -> None
+        if name not in self.counters:
+            self.counters[name] = 0
+            self._counter_names.append(name)
+        self.counters[name] += amount
+
+    def counting(self, name, fn):
+        # type: (str, function) -> function
+        """Wrap fn so every call is counted under name"""
+
+        def counted(*args, **kwargs):
+            self.count(name)
+            return fn(*args, **kwargs)
+
+        return counted
+
+    def as_table(self):
+        # type: () -> list[list[str]]
+        """Return [phase, seconds] rows for printing"""
+        rows = [[name, "{:.3f}".format(duration)]
+                for name, duration in self.durations]
+        rows.append(["Total", "{:.3f}".format(self.total)])
+        return rows
+
+    def counters_as_table(self):
+        # type: () -> list[list]
+        """Return [counter, value] rows for printing, in first use order"""
+        return [[name, self.counters[name]] for name in self._counter_names]
+
+    def as_record(self, **fields):
+        # type: (dict) -> dict
+        """JSON serializable record of the run, extra fields are added"""
+        record = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "phases": [[name, round(duration, 6)]
+                       for name, duration in self.durations],
+            "total": round(self.total, 6),
+            "counters": dict(self.counters),
+        }
+        record.update(fields)
+        return record
+
+
+def get_run_log_path():
+    # type: () -> str
+    """Run log in the ParamTransfer directory of the user config"""
+    import filemgr
+
+    directory = path.join(filemgr.get_user_config_path(), "ParamTransfer")
+    if not path.exists(directory):
+        os.makedirs(directory)
+    return path.join(directory, RUN_LOG_FILE_NAME)
+
+
+def append_run_log(record, log_file_path=None):
+    # type: (dict, str) -> str
+    """Append one record as a JSON line and return the log file path"""
+    if log_file_path is None:
+        log_file_path = get_run_log_path()
+    with open(log_file_path, "a") as f:
+        f.write(json.dumps(record, sort_keys=True) + "\n")
+    return log_file_path
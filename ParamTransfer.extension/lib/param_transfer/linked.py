@@ -0,0 +1,181 @@
+"""
+Spaces and rooms of a linked model as source of the parameter transfer.
+
+The total transform of the link instance is applied once to the bounding
+boxes of the linked spaces, so the spatial index is built in host
+coordinates and queried with the host location points of the instances,
+exactly like for host spaces. The boundary loops of the linked spaces are
+moved into host coordinates once per link instance as well, only the exact
+containment test of ambiguous points maps the point back into link
+coordinates.
+"""
+from param_transfer.boundaries import SpaceBoundary
+from param_transfer.spatial_index import SpaceGridIndex
+
+SOURCE_SPACES = "spaces"
+SOURCE_ROOMS = "rooms"
+
+
+def get_link_name(link_instance):
+    # type: (DB.RevitLinkInstance) -> str
+    """Title of the linked document, the instance name if it is unloaded"""
+    link_doc = link_instance.GetLinkDocument()
+    if link_doc is not None:
+        return link_doc.Title
+    return link_instance.Name
+
+
+def get_loaded_link_instances(doc):
+    # type: (DB.Document) -> list[DB.RevitLinkInstance]
+    """All link instances of the document whose model is loaded"""
+    from pyrevit import DB
+
+    return [
+        link_instance for link_instance in DB.FilteredElementCollector(
+            doc).OfClass(DB.RevitLinkInstance)
+        if link_instance.GetLinkDocument() is not None
+    ]
+
+
+def find_link_instance(doc, link_name):
+    # type: (DB.Document, str) -> DB.RevitLinkInstance
+    """First loaded link instance of the model with the given title or None"""
+    for link_instance in get_loaded_link_instances(doc):
+        if get_link_name(link_instance) in (link_name,
+                                            link_name.rsplit(".", 1)[0]):
+            return link_instance
+    return None
+
+
+def transform_point(transform, x, y, z):
+    # type: (DB.Transform, float, float, float) -> tuple[float, float, float]
+    """Apply a transform to plain coordinates"""
+    origin = transform.Origin
+    basis_x, basis_y, basis_z = transform.BasisX, transform.BasisY, \
+        transform.BasisZ
+    return (origin.X + x * basis_x.X + y * basis_y.X + z * basis_z.X,
+            origin.Y + x * basis_x.Y + y * basis_y.Y + z * basis_z.Y,
+            origin.Z + x * basis_x.Z + y * basis_y.Z + z * basis_z.Z)
+
+
+def transform_plan_box(transform, bounding_box):
+    # type: (DB.Transform, DB.BoundingBoxXYZ) -> tuple[float, float, float, float]
+    """Plan box in host coordinates enclosing the transformed box corners"""
+    xs, ys = [], []
+    for x in (bounding_box.Min.X, bounding_box.Max.X):
+        for y in (bounding_box.Min.Y, bounding_box.Max.Y):
+            for z in (bounding_box.Min.Z, bounding_box.Max.Z):
+                host_x, host_y, _ = transform_point(transform, x, y, z)
+                xs.append(host_x)
+                ys.append(host_y)
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def transform_boundary(transform, boundary):
+    # type: (DB.Transform, SpaceBoundary) -> SpaceBoundary
+    """
+    Boundary in host coordinates. Link transforms keep the Z axis vertical,
+    so the height band only moves by the elevation of the transform.
+    """
+    loops = []
+    for xs, ys in boundary.loops:
+        host_xs, host_ys = [], []
+        for x, y in zip(xs, ys):
+            host_x, host_y, _ = transform_point(transform, x, y, 0.0)
+            host_xs.append(host_x)
+            host_ys.append(host_y)
+        loops.append((host_xs, host_ys))
+    min_z = max_z = None
+    if boundary.min_z is not None:
+        min_z = transform_point(transform, 0.0, 0.0, boundary.min_z)[2]
+    if boundary.max_z is not None:
+        max_z = transform_point(transform, 0.0, 0.0, boundary.max_z)[2]
+    return SpaceBoundary(boundary.key, loops, min_z, max_z)
+
+
+def is_point_in_spatial_element(element, point):
+    # type: (DB.SpatialElement, DB.XYZ) -> bool
+    """Exact containment test for spaces and rooms"""
+    if hasattr(element, "IsPointInSpace"):
+        return element.IsPointInSpace(point)
+    return element.IsPointInRoom(point)
+
+
+class LinkedSpaceSource(object):
+    """Spaces or rooms of one link instance, matched in host coordinates"""
+
+    def __init__(self, link_instance, spaces, transform=None):
+        # type: (DB.RevitLinkInstance, list[DB.SpatialElement], DB.Transform) -> None
+        self.link_instance = link_instance
+        self.doc = link_instance.GetLinkDocument()
+        self.spaces = list(spaces)
+        self.transform = transform or link_instance.GetTotalTransform()
+        self._inverse = None
+        # space id -> SpaceBoundary in host coordinates, see get_fn_extract_boundary
+        self.boundaries = {}
+
+    @property
+    def name(self):
+        # type: () -> str
+        return get_link_name(self.link_instance)
+
+    @property
+    def inverse(self):
+        # type: () -> DB.Transform
+        if self._inverse is None:
+            self._inverse = self.transform.Inverse
+        return self._inverse
+
+    def build_index(self, cell_size=None):
+        # type: (float) -> SpaceGridIndex
+        """Grid index of the linked spaces in host coordinates"""
+        boxes = []
+        for space in self.spaces:
+            bounding_box = space.get_BoundingBox(None)
+            if bounding_box is not None:
+                boxes.append(
+                    (space, transform_plan_box(self.transform, bounding_box)))
+        return SpaceGridIndex(boxes, cell_size=cell_size)
+
+    def contains(self, space, host_point):
+        # type: (DB.SpatialElement, DB.XYZ) -> bool
+        """Exact test of a host point, used as fn_contains of the assignment"""
+        return is_point_in_spatial_element(space,
+                                           self.inverse.OfPoint(host_point))
+
+    def get_fn_extract_boundary(self, fn_extract):
+        # type: (function) -> function
+        """
+        fn_extract of a BoundaryContainment in host coordinates, the boundary
+        read in link coordinates is transformed once
+        """
+
+        def extract(space):
+            return transform_boundary(self.transform, fn_extract(space))
+
+        return extract
+
+    def get_fn_contains(self, fn_contains_in_link):
+        # type: (function) -> function
+        """
+        fn_contains of the assignment for a test in link coordinates, e.g. a
+        BoundaryContainment of the linked spaces
+        """
+
+        def contains(space, host_point):
+            return fn_contains_in_link(space, self.inverse.OfPoint(host_point))
+
+        return contains
+
+
+def collect_linked_spaces(link_instance, source=SOURCE_SPACES):
+    # type: (DB.RevitLinkInstance, str) -> LinkedSpaceSource
+    """Collect all spaces or rooms of the linked model"""
+    from param_transfer.collection import collect_rooms, collect_spaces
+
+    link_doc = link_instance.GetLinkDocument()
+    if source == SOURCE_ROOMS:
+        spaces = collect_rooms(link_doc)
+    else:
+        spaces = collect_spaces(link_doc)
+    return LinkedSpaceSource(link_instance, spaces)
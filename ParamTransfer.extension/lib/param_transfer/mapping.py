@@ -0,0 +1,78 @@
+"""
+Space -> MEP instance parameter mappings of any length.
+
+The same rows drive the reverse aggregation, the MEP parameter of every row
+is then aggregated into its space parameter.
+"""
+from param_transfer.aggregation import AGGREGATE_COUNT, AGGREGATE_SUM, AggregationMapping
+
+
+class ParameterMapping(object):
+    """One row of the mapping table: copy `source` of the space to `target`"""
+
+    def __init__(self, source=None, target=None, function=AGGREGATE_SUM):
+        # type: (str, str, str) -> None
+        self.source = source
+        self.target = target
+        self.function = function
+
+    @property
+    def is_complete(self):
+        # type: () -> bool
+        return bool(self.source) and bool(self.target)
+
+    @property
+    def is_complete_aggregation(self):
+        # type: () -> bool
+        """A count needs the space parameter only"""
+        return bool(self.source) and (bool(self.target)
+                                      or self.function == AGGREGATE_COUNT)
+
+    def as_pair(self):
+        # type: () -> tuple[str, str]
+        return (self.source, self.target)
+
+    def __repr__(self):
+        return "<ParameterMapping {} -> {}>".format(self.source, self.target)
+
+
+class MappingTable(object):
+    """Ordered list of parameter mappings, all applied in one matching pass"""
+
+    def __init__(self, pairs=None):
+        # type: (list[tuple[str, str]]) -> None
+        self.mappings = [
+            ParameterMapping(source, target) for source, target in pairs or []
+        ]
+
+    def add(self, source=None, target=None):
+        # type: (str, str) -> ParameterMapping
+        mapping = ParameterMapping(source, target)
+        self.mappings.append(mapping)
+        return mapping
+
+    def remove(self, mapping):
+        # type: (ParameterMapping) -> None
+        self.mappings.remove(mapping)
+
+    def __len__(self):
+        return len(self.mappings)
+
+    def __iter__(self):
+        return iter(self.mappings)
+
+    def pairs(self):
+        # type: () -> list[tuple[str, str]]
+        """Return the (source, target) pairs of all complete rows"""
+        return [
+            mapping.as_pair() for mapping in self.mappings
+            if mapping.is_complete
+        ]
+
+    def aggregations(self):
+        # type: () -> list[AggregationMapping]
+        """Aggregate the MEP parameter of all complete rows into the space"""
+        return [
+            AggregationMapping(mapping.target, mapping.source, mapping.function)
+            for mapping in self.mappings if mapping.is_complete_aggregation
+        ]
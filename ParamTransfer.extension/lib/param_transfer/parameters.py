@@ -0,0 +1,119 @@
+"""
+Parameter handle cache for the parameter transfer.
+
+`LookupParameter` is a string search over every parameter of an element.
+The resolver runs it only once per parameter name and element type, keeps
+the resulting shared parameter GUID, BuiltInParameter or Definition and
+fetches all further values through `get_Parameter`.
+"""
+
+
+def get_parameter_key(parameter):
+    # type: (DB.Parameter) -> object
+    """
+    Return the most stable key to fetch the parameter with `get_Parameter`:
+    the GUID of shared parameters, the BuiltInParameter of built-in ones and
+    the Definition otherwise.
+    """
+    if parameter.IsShared:
+        return parameter.GUID
+    definition = parameter.Definition
+    built_in_parameter = getattr(definition, "BuiltInParameter", None)
+    if built_in_parameter is not None and str(built_in_parameter) != "INVALID":
+        return built_in_parameter
+    return definition
+
+
+def get_type_id(element):
+    # type: (DB.Element) -> int
+    """Return the integer id of the element type, -1 if there is none"""
+    try:
+        return element.GetTypeId().IntegerValue
+    except Exception:
+        return -1
+
+
+class ParameterHandle(object):
+    """Resolved parameter of one name on one element type"""
+
+    def __init__(self, name, key, on_type=False):
+        # type: (str, object, bool) -> None
+        self.name = name
+        self.key = key
+        self.on_type = on_type
+
+    def __repr__(self):
+        return "<ParameterHandle {name}{type}>".format(
+            name=self.name, type=" (type)" if self.on_type else "")
+
+
+class ParameterResolver(object):
+    """
+    Resolve parameter names to handles once per run.
+
+    Handles are cached per (name, element type), because non-shared family
+    parameters have a different Definition in every family. Type parameters
+    are cached per element type, so they are only read once.
+    """
+
+    def __init__(self, doc=None):
+        # type: (DB.Document) -> None
+        self.doc = doc
+        self._handles = {}
+        self._type_parameters = {}
+        self.lookup_count = 0
+
+    def _get_type_element(self, element):
+        # type: (DB.Element) -> DB.ElementType
+        if self.doc is None:
+            return None
+        return self.doc.GetElement(element.GetTypeId())
+
+    def _resolve(self, element, name, include_type):
+        # type: (DB.Element, str, bool) -> ParameterHandle
+        self.lookup_count += 1
+        parameter = element.LookupParameter(name)
+        if parameter is not None:
+            return ParameterHandle(name, get_parameter_key(parameter))
+
+        if include_type:
+            element_type = self._get_type_element(element)
+            if element_type is not None:
+                self.lookup_count += 1
+                parameter = element_type.LookupParameter(name)
+                if parameter is not None:
+                    return ParameterHandle(name,
+                                           get_parameter_key(parameter),
+                                           on_type=True)
+        return None
+
+    def get_handle(self, element, name, include_type=True):
+        # type: (DB.Element, str, bool) -> ParameterHandle
+        """Return the handle of the parameter name for the element's type"""
+        cache_key = (name, get_type_id(element), include_type)
+        if cache_key not in self._handles:
+            self._handles[cache_key] = self._resolve(element, name,
+                                                     include_type)
+        return self._handles[cache_key]
+
+    def get(self, element, name, include_type=True):
+        # type: (DB.Element, str, bool) -> DB.Parameter
+        """
+        Return the parameter with the given name of the element or None.
+        Type parameters are only considered if include_type is True.
+        """
+        if name is None:
+            return None
+        handle = self.get_handle(element, name, include_type)
+        if handle is None:
+            return None
+        if not handle.on_type:
+            return element.get_Parameter(handle.key)
+
+        type_key = (name, get_type_id(element))
+        if type_key not in self._type_parameters:
+            element_type = self._get_type_element(element)
+            self._type_parameters[type_key] = (
+                element_type.get_Parameter(handle.key)
+                if element_type is not None else None)
+        return self._type_parameters[type_key]
@@ -0,0 +1,166 @@
+"""
+Partitioning of a whole-document transfer by level.
+
+Spaces and instances of all levels are collected once. Instances are put on
+the level of their LevelId, or into the elevation band of their location
+point if that level has no spaces. Matched by elevation, every instance goes
+into the elevation band of its point, e.g. a VAV box hosted on the level
+above but hanging in the ceiling void of the space below. The geometric fallback of the assignment
+then only queries the spatial index of that one level, and the result is
+reported per level.
+
+The bands use the ProjectElevation of the levels, in internal coordinates
+like the location points. Elevation depends on the elevation base of the
+level type, e.g. the survey point.
+"""
+import bisect
+
+from param_transfer.assignment import element_key, get_location_point
+from param_transfer.spatial_index import build_space_index
+
+NO_LEVEL = -1
+
+
+def get_level_id(element):
+    # type: (DB.Element) -> int
+    """Integer id of the level of the element, NO_LEVEL if it has none"""
+    level_id = getattr(element, "LevelId", None)
+    if level_id is None:
+        return NO_LEVEL
+    return level_id.IntegerValue
+
+
+class LevelStatistics(object):
+    """Counts of one level of a partitioned transfer"""
+
+    def __init__(self, level_id, name="", elevation=None):
+        # type: (int, str, float) -> None
+        self.level_id = level_id
+        self.name = name
+        self.elevation = elevation
+        self.space_count = 0
+        self.instance_count = 0
+        self.assigned_count = 0
+        self.unassigned_count = 0
+
+    def as_row(self):
+        # type: () -> list
+        return [self.name, self.space_count, self.instance_count,
+                self.assigned_count, self.unassigned_count]
+
+    def as_dict(self):
+        # type: () -> dict
+        return {
+            "level": self.name,
+            "spaces": self.space_count,
+            "instances": self.instance_count,
+            "assigned": self.assigned_count,
+            "unassigned": self.unassigned_count,
+        }
+
+
+LEVEL_STATISTICS_COLUMNS = [
+    "Level", "Spaces", "Instances", "Assigned", "Unassigned"
+]
+
+
+class LevelPartition(object):
+    """Spaces and instances grouped by level, with one index per level"""
+
+    def __init__(self, spaces, cell_size=None,
+                 fn_build_index=build_space_index,
+                 fn_get_point=get_location_point,
+                 match_by_elevation=False):
+        # type: (list[DB.Element], float, function, function, bool) -> None
+        self.cell_size = cell_size
+        self.fn_build_index = fn_build_index
+        self.fn_get_point = fn_get_point
+        self.match_by_elevation = match_by_elevation
+        self.spaces_by_level = {}
+        self.instance_level_ids = {}
+        self.statistics = {}
+        for space in spaces:
+            level_id = get_level_id(space)
+            self.spaces_by_level.setdefault(level_id, []).append(space)
+            if level_id not in self.statistics:
+                level = getattr(space, "Level", None)
+                self.statistics[level_id] = LevelStatistics(
+                    level_id,
+                    level.Name if level is not None else "<no level>",
+                    level.ProjectElevation if level is not None else None)
+            self.statistics[level_id].space_count += 1
+
+        # sorted (elevation, level id) of all levels with spaces
+        bands = sorted((statistics.elevation, level_id)
+                       for level_id, statistics in self.statistics.items()
+                       if statistics.elevation is not None)
+        self._band_elevations = [elevation for elevation, _ in bands]
+        self._band_level_ids = [level_id for _, level_id in bands]
+        self._indexes = {}
+
+    def get_band_level_id(self, elevation):
+        # type: (float) -> int
+        """Level of the elevation band containing the elevation"""
+        if not self._band_elevations:
+            return NO_LEVEL
+        position = bisect.bisect_right(self._band_elevations, elevation) - 1
+        # below the lowest level belongs to the lowest level
+        return self._band_level_ids[max(position, 0)]
+
+    def get_instance_level_id(self, instance):
+        # type: (DB.FamilyInstance) -> int
+        level_id = get_level_id(instance)
+        if level_id in self.spaces_by_level and not self.match_by_elevation:
+            return level_id
+        point = self.fn_get_point(instance)
+        if point is None:
+            return level_id
+        return self.get_band_level_id(point.Z)
+
+    def add_instances(self, instances):
+        # type: (list[DB.FamilyInstance]) -> None
+        """Resolve and count the level of every instance once"""
+        for instance in instances:
+            level_id = self.get_instance_level_id(instance)
+            self.instance_level_ids[element_key(instance)] = level_id
+            if level_id not in self.statistics:
+                self.statistics[level_id] = LevelStatistics(
+                    level_id, "<no spaces>")
+            self.statistics[level_id].instance_count += 1
+
+    def get_space_index(self, instance):
+        # type: (DB.FamilyInstance) -> SpaceGridIndex
+        """Spatial index of the level of the instance, built on first use"""
+        level_id = self.instance_level_ids.get(element_key(instance))
+        if level_id is None:
+            level_id = self.get_instance_level_id(instance)
+        if level_id not in self._indexes:
+            self._indexes[level_id] = self.fn_build_index(
+                self.spaces_by_level.get(level_id, []), self.cell_size)
+        return self._indexes[level_id]
+
+    def update_statistics(self, assignment):
+        # type: (SpaceAssignment) -> list[LevelStatistics]
+        """Count the assigned and unassigned instances of every level"""
+        for statistics in self.statistics.values():
+            statistics.assigned_count = 0
+            statistics.unassigned_count = 0
+        for space_id, instances in assignment.instances_by_space_id.items():
+            level_id = get_level_id(assignment.spaces_by_id[space_id])
+            self.statistics[level_id].assigned_count += len(instances)
+        for instance in assignment.unassigned:
+            level_id = self.instance_level_ids.get(element_key(instance),
+                                                   NO_LEVEL)
+            if level_id not in self.statistics:
+                self.statistics[level_id] = LevelStatistics(
+                    level_id, "<no spaces>")
+            self.statistics[level_id].unassigned_count += 1
+        return self.get_statistics()
+
+    def get_statistics(self):
+        # type: () -> list[LevelStatistics]
+        """Statistics ordered by elevation, levels without spaces last"""
+        return sorted(self.statistics.values(),
+                      key=lambda statistics:
+                      (statistics.elevation is None, statistics.elevation,
+                       statistics.name))
@@ -0,0 +1,145 @@
+"""
+Dry-run preview of a write plan.
+
+Prints the planned writes as a paginated table together with counts per
+space and per parameter, without opening a transaction. The label of every
+space is built once, its name is read through a ParameterResolver.
+"""
+from param_transfer.instrumentation import COUNTER_LOOKUP_PARAMETER
+from param_transfer.parameters import ParameterResolver
+from param_transfer.values import format_native, get_display_value
+
+PAGE_SIZE = 200
+MAX_PAGES = 10
+
+
+def get_space_label(space, resolver):
+    # type: (DB.Element, ParameterResolver) -> str
+    """Return 'Number Name' of a space, or its id if it has no number"""
+    if space is None:
+        return "-"
+    number = getattr(space, "Number", None)
+    name_parameter = resolver.get(space, "Name", include_type=False)
+    name = name_parameter.AsString() if name_parameter is not None else None
+    label = " ".join(part for part in (number, name) if part)
+    return label or str(space.Id.IntegerValue)
+
+
+def get_space_labels(writes, resolver=None):
+    # type: (list[PlannedWrite], ParameterResolver) -> dict[int, str]
+    """Label of every space of the writes, keyed by space id"""
+    resolver = resolver or ParameterResolver()
+    labels = {}
+    for write in writes:
+        if write.space is None:
+            continue
+        space_id = write.space.Id.IntegerValue
+        if space_id not in labels:
+            labels[space_id] = get_space_label(write.space, resolver)
+    return labels
+
+
+def get_write_space_label(write, labels):
+    # type: (PlannedWrite, dict[int, str]) -> str
+    if write.space is None:
+        return "-"
+    return labels[write.space.Id.IntegerValue]
+
+
+def get_parameter_name(parameter):
+    # type: (DB.Parameter) -> str
+    return parameter.Definition.Name
+
+
+def count_by(writes, fn_key):
+    # type: (list[PlannedWrite], function) -> list[tuple[str, int]]
+    """Count writes per key, sorted by descending count"""
+    counts = {}
+    for write in writes:
+        key = fn_key(write)
+        counts[key] = counts.get(key, 0) + 1
+    return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+
+def count_by_space(writes, labels=None):
+    # type: (list[PlannedWrite], dict[int, str]) -> list[tuple[str, int]]
+    if labels is None:
+        labels = get_space_labels(writes)
+    return count_by(writes,
+                    lambda write: get_write_space_label(write, labels))
+
+
+def count_by_parameter(writes):
+    # type: (list[PlannedWrite]) -> list[tuple[str, int]]
+    return count_by(writes, lambda write: get_parameter_name(write.parameter))
+
+
+def paginate(rows, page_size=PAGE_SIZE):
+    # type: (list, int) -> list[list]
+    """Split rows in pages of page_size rows"""
+    return [rows[i:i + page_size] for i in range(0, len(rows), page_size)]
+
+
+def print_timer(output, timer):
+    # type: (pyrevit.output.PyRevitOutputWindow, PhaseTimer) -> None
+    """Print the phase timings and API counters of a run"""
+    output.print_table(timer.as_table(),
+                       columns=["Phase", "Seconds"],
+                       title="Time per phase")
+    if timer.counters:
+        output.print_table(timer.counters_as_table(),
+                           columns=["Counter", "Value"],
+                           title="API calls")
+
+
+def print_preview(output,
+                  plan,
+                  timer=None,
+                  page_size=PAGE_SIZE,
+                  max_pages=MAX_PAGES):
+    # type: (pyrevit.output.PyRevitOutputWindow, WritePlan, PhaseTimer, int, int) -> None
+    """Print the planned writes, counts and phase timings to the output"""
+    writes = plan.writes
+
+    output.print_md("## Param transfer preview")
+    output.print_md(
+        "**{planned}** writes planned, **{skipped}** skipped as unchanged, "
+        "**{elements}** elements affected".format(
+            planned=len(writes),
+            skipped=plan.skipped_count,
+            elements=len(plan.element_ids)))
+
+    resolver = ParameterResolver()
+    labels = get_space_labels(writes, resolver)
+    if timer is not None:
+        timer.count(COUNTER_LOOKUP_PARAMETER, resolver.lookup_count)
+        print_timer(output, timer)
+
+    if not writes:
+        return
+
+    output.print_table([[label, count] for label, count in count_by_space(writes, labels)],
+                       columns=["Space", "Writes"],
+                       title="Writes per space")
+    output.print_table(
+        [[name, count] for name, count in count_by_parameter(writes)],
+        columns=["Parameter", "Writes"],
+        title="Writes per parameter")
+
+    pages = paginate(writes, page_size)
+    for page_number, page in enumerate(pages[:max_pages]):
+        rows = [[
+            output.linkify(write.element.Id),
+            get_write_space_label(write, labels),
+            get_parameter_name(write.parameter),
+            get_display_value(write.parameter),
+            format_native(write.value),
+        ] for write in page]
+        output.print_table(
+            rows,
+            columns=["Element", "Space", "Parameter", "Current", "New"],
+            title="Planned writes (page {page} of {count})".format(
+                page=page_number + 1, count=len(pages)))
+    if len(pages) > max_pages:
+        output.print_md("*{count} more pages not shown*".format(
+            count=len(pages) - max_pages))
@@ -0,0 +1,131 @@
+"""
+Several families or whole categories in one transfer.
+
+Every selected family or category has its own mapping table. The instances
+of all selections are collected in one pass and matched against the spaces
+once, the mappings are then applied per selection. An instance of a family
+that is selected on its own and through its category gets the mappings of
+the family.
+"""
+from param_transfer.assignment import element_key
+from param_transfer.mapping import MappingTable
+from param_transfer.parameters import get_type_id
+
+SELECTION_FAMILY = "family"
+SELECTION_CATEGORY = "category"
+
+
+class InstanceSelection(object):
+    """One selected family or category and its mapping table"""
+
+    def __init__(self, kind, name, category_id=None, mapping_table=None):
+        # type: (str, str, int, MappingTable) -> None
+        if kind not in (SELECTION_FAMILY, SELECTION_CATEGORY):
+            raise KeyError("Selection of {} is not supported".format(kind))
+        self.kind = kind
+        self.name = name
+        # integer id of a selected category, resolved by name if None
+        self.category_id = category_id
+        self.mapping_table = mapping_table or MappingTable()
+
+    @property
+    def is_category(self):
+        # type: () -> bool
+        return self.kind == SELECTION_CATEGORY
+
+    @property
+    def label(self):
+        # type: () -> str
+        return u"{}: {}".format(
+            "Category" if self.is_category else "Family", self.name)
+
+    def __repr__(self):
+        return "<InstanceSelection {}>".format(self.label)
+
+
+def get_type_info(doc, instance):
+    # type: (DB.Document, DB.FamilyInstance) -> tuple[str, int, str]
+    """(family name, category id, category name) of the type of an instance"""
+    element_type = doc.GetElement(instance.GetTypeId())
+    family_name = getattr(element_type, "FamilyName", None)
+    category = instance.Category
+    if category is None:
+        return family_name, None, None
+    return family_name, category.Id.IntegerValue, category.Name
+
+
+class SelectionResolver(object):
+    """
+    Index of the selection of every instance. The family and category are
+    read once per element type.
+    """
+
+    def __init__(self, doc, selections):
+        # type: (DB.Document, list[InstanceSelection]) -> None
+        self.doc = doc
+        self.selections = list(selections)
+        self._index_by_type_id = {}
+        self.index_by_instance = {}
+
+    def _resolve_type(self, instance):
+        # type: (DB.FamilyInstance) -> int
+        family_name, category_id, category_name = get_type_info(
+            self.doc, instance)
+        category_index = None
+        for index, selection in enumerate(self.selections):
+            if selection.is_category:
+                if category_index is None and (
+                        selection.category_id == category_id
+                        if selection.category_id is not None else
+                        selection.name == category_name):
+                    category_index = index
+            elif selection.name == family_name:
+                # families take precedence over their category
+                return index
+        return category_index
+
+    def add_instances(self, instances):
+        # type: (list[DB.FamilyInstance]) -> None
+        for instance in instances:
+            type_id = get_type_id(instance)
+            if type_id not in self._index_by_type_id:
+                self._index_by_type_id[type_id] = self._resolve_type(instance)
+            self.index_by_instance[element_key(
+                instance)] = self._index_by_type_id[type_id]
+
+    def get_index(self, instance):
+        # type: (DB.FamilyInstance) -> int
+        """Index of the selection of the instance, None if none matches"""
+        return self.index_by_instance.get(element_key(instance))
+
+    def get_instances(self, instances, index):
+        # type: (list[DB.FamilyInstance], int) -> list[DB.FamilyInstance]
+        """The instances of one selection"""
+        return [
+            instance for instance in instances
+            if self.get_index(instance) == index
+        ]
+
+    def get_pairs_by_index(self):
+        # type: () -> dict[int, list[tuple[str, str]]]
+        return dict((index, selection.mapping_table.pairs())
+                    for index, selection in enumerate(self.selections))
+
+    def get_aggregations_by_index(self):
+        # type: () -> dict[int, list[AggregationMapping]]
+        return dict((index, selection.mapping_table.aggregations())
+                    for index, selection in enumerate(self.selections))
+
+
+def split_by_key(instances, fn_get_key):
+    # type: (list[DB.FamilyInstance], function) -> list[tuple[object, list[DB.FamilyInstance]]]
+    """Group the instances by key, in order of the first instance of a key"""
+    keys = []
+    instances_by_key = {}
+    for instance in instances:
+        key = fn_get_key(instance)
+        if key not in instances_by_key:
+            keys.append(key)
+            instances_by_key[key] = []
+        instances_by_key[key].append(instance)
+    return [(key, instances_by_key[key]) for key in keys]
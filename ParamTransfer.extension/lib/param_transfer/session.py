@@ -0,0 +1,39 @@
+"""
+Caches that last for the whole Revit session.
+
+pyRevit runs every command and every event hook in an engine of its own, so
+module level dicts are gone with the run. The session stores are kept in
+the AppDomain of Revit instead, through the pyRevit environment variables,
+and are shared by the ParamTransfer window, batch jobs and the event hooks
+of the extension that invalidate them, see the hooks folder. Without
+pyRevit, e.g. in the offline tests, the stores are kept in this module.
+
+The stores outlive the engine of a command and its documents, so they only
+hold plain dicts, lists, tuples, strings and numbers, e.g. element ids
+instead of elements, and never instances of classes of the extension.
+"""
+SESSION_STORE_PREFIX = "PARAMTRANSFER_"
+
+__local_stores = {}
+
+
+def get_session_store(name):
+    # type: (str) -> dict
+    """The dict stored for the session under this name, created on first use"""
+    try:
+        from pyrevit.coreutils import envvars
+    except ImportError:
+        return __local_stores.setdefault(name, {})
+
+    env_var_name = SESSION_STORE_PREFIX + name.upper()
+    store = envvars.get_pyrevit_env_var(env_var_name)
+    if store is None:
+        store = {}
+        envvars.set_pyrevit_env_var(env_var_name, store)
+    return store
+
+
+def get_document_key(doc):
+    # type: (DB.Document) -> str
+    """Key of a document in the session stores"""
+    return doc.PathName or doc.Title
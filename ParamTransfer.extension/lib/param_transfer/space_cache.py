@@ -0,0 +1,207 @@
+"""
+Session cache of the space geometry used by the matching.
+
+The boundary loops and spatial indexes of the spaces are kept per document
+and phase for the whole Revit session, so repeated runs, e.g. for several
+families in the same view, skip straight to the matching. The cache lives in
+a session store, see param_transfer.session, the least recently used indexes
+are dropped once a document and phase has more than MAX_CACHED_INDEXES.
+
+The store outlives the engine of the command and the document, so it only
+holds plain dicts, lists, tuples and numbers keyed by element id: the
+boundaries as SpaceBoundary.to_dict and the boxes and grid cells of the
+indexes. Every run wraps them in a SpaceGeometry of its own, which maps the
+ids back to the space elements of that run.
+
+The doc-changed hook of the extension drops the boundaries and indexes of
+modified or deleted spaces only. A modified level moves the height bands of
+its spaces and drops everything cached for the document, the doc-closing
+and doc-synced hooks drop it as well. Parameter writes to spaces, e.g. by
+the aggregation, count as modifications too.
+"""
+from param_transfer.assignment import element_key, get_last_phase
+from param_transfer.boundaries import SpaceBoundary
+from param_transfer.session import get_document_key, get_session_store
+from param_transfer.spatial_index import SpaceGridIndex, build_space_index
+
+SPACE_GEOMETRY_STORE = "space_geometry"
+
+# one index per level and per set of view spaces, e.g. of several views
+MAX_CACHED_INDEXES = 64
+
+
+def get_space_geometry_cache():
+    # type: () -> dict
+    """(document key, phase key) -> plain geometry data of the session"""
+    return get_session_store(SPACE_GEOMETRY_STORE)
+
+
+def get_phase_key(phase):
+    # type: (DB.Phase) -> int
+    return phase.Id.IntegerValue if phase is not None else None
+
+
+def create_geometry_data():
+    # type: () -> dict
+    """
+    Plain geometry data of one document and phase:
+    boundaries: space id -> SpaceBoundary.to_dict
+    indexes: (sorted space ids, cell size) -> SpaceGridIndex.as_data
+    index_keys: keys of the indexes, least recently used first
+    """
+    return {"boundaries": {}, "indexes": {}, "index_keys": []}
+
+
+class BoundaryCache(dict):
+    """
+    Space id -> SpaceBoundary of one run, passed to BoundaryContainment.
+    Boundaries are read from and added to the plain data of the session.
+    """
+
+    def __init__(self, data):
+        # type: (dict) -> None
+        super(BoundaryCache, self).__init__()
+        self.data = data
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self.data
+
+    def __missing__(self, key):
+        boundary = SpaceBoundary.from_dict(self.data[key])
+        dict.__setitem__(self, key, boundary)
+        return boundary
+
+    def __setitem__(self, key, boundary):
+        dict.__setitem__(self, key, boundary)
+        self.data[key] = boundary.to_dict()
+
+
+class SpaceGeometry(object):
+    """
+    Boundaries and spatial indexes of the spaces of one document and phase,
+    used by one run on top of the plain data of the session
+    """
+
+    def __init__(self, data=None):
+        # type: (dict) -> None
+        self.data = data if data is not None else create_geometry_data()
+        # space id -> SpaceBoundary, filled by BoundaryContainment
+        self.boundaries = BoundaryCache(self.data["boundaries"])
+        # indexes of this run by key, keyed by the space elements of the run
+        self._indexes = {}
+
+    def get_index(self, spaces, cell_size=None):
+        # type: (list[DB.Element], float) -> SpaceGridIndex
+        """Index of exactly these spaces, used as fn_build_index"""
+        spaces_by_id = dict((element_key(space), space) for space in spaces)
+        key = (tuple(sorted(spaces_by_id)), cell_size)
+        indexes, index_keys = self.data["indexes"], self.data["index_keys"]
+        if key in indexes:
+            index_keys.remove(key)
+        else:
+            index = build_space_index(spaces, cell_size)
+            while len(index_keys) >= MAX_CACHED_INDEXES:
+                del indexes[index_keys.pop(0)]
+            indexes[key] = index.as_data(element_key)
+            self._indexes[key] = index
+        index_keys.append(key)
+
+        if key not in self._indexes:
+            # the elements of an earlier run may belong to a closed engine
+            self._indexes[key] = SpaceGridIndex.from_data(
+                indexes[key], spaces_by_id.__getitem__)
+        return self._indexes[key]
+
+    def invalidate(self, space_ids):
+        # type: (set[int]) -> None
+        """Drop the boundaries of the spaces and every index containing one"""
+        invalidate_geometry_data(self.data, space_ids)
+        for space_id in space_ids:
+            dict.pop(self.boundaries, space_id, None)
+        for key in [key for key in self._indexes
+                    if not space_ids.isdisjoint(key[0])]:
+            del self._indexes[key]
+
+    def __len__(self):
+        return len(self.data["boundaries"])
+
+
+def invalidate_geometry_data(data, space_ids):
+    # type: (dict, set[int]) -> None
+    """Drop the plain boundaries of the spaces and every index containing one"""
+    for space_id in space_ids:
+        data["boundaries"].pop(space_id, None)
+    for key in [key for key in data["index_keys"]
+                if not space_ids.isdisjoint(key[0])]:
+        data["index_keys"].remove(key)
+        del data["indexes"][key]
+
+
+def get_space_geometry(doc, phase=None):
+    # type: (DB.Document, DB.Phase) -> SpaceGeometry
+    """
+    Geometry of the document and phase for one run, the last phase by
+    default, backed by the plain data of the session
+    """
+    if phase is None:
+        phase = get_last_phase(doc)
+    cache = get_space_geometry_cache()
+    cache_key = (get_document_key(doc), get_phase_key(phase))
+    if cache_key not in cache:
+        cache[cache_key] = create_geometry_data()
+    return SpaceGeometry(cache[cache_key])
+
+
+def get_document_space_geometries(document_key):
+    # type: (str) -> list[dict]
+    """Plain geometry data of all phases of a document"""
+    return [
+        data
+        for (cached_document_key, _), data in get_space_geometry_cache().items()
+        if cached_document_key == document_key
+    ]
+
+
+def invalidate_spaces(document_key, space_ids):
+    # type: (str, set[int]) -> None
+    """Drop the cached geometry of some spaces of a document, all phases"""
+    for data in get_document_space_geometries(document_key):
+        invalidate_geometry_data(data, space_ids)
+
+
+def clear_space_geometry_cache(document_key=None):
+    # type: (str) -> None
+    """Drop the cache of one document, of all documents without key"""
+    cache = get_space_geometry_cache()
+    for cache_key in list(cache):
+        if document_key is None or cache_key[0] == document_key:
+            del cache[cache_key]
+
+
+def get_changed_space_ids(args):
+    # type: (DB.Events.DocumentChangedEventArgs) -> tuple[set[int], bool]
+    """Ids of modified or deleted elements that may be spaces, level changed"""
+    from pyrevit import DB
+
+    space_ids = set(
+        element_id.IntegerValue for element_id in args.GetModifiedElementIds(
+            DB.ElementCategoryFilter(DB.BuiltInCategory.OST_MEPSpaces)))
+    # deleted elements can not be filtered, unknown ids are ignored
+    space_ids.update(
+        element_id.IntegerValue for element_id in args.GetDeletedElementIds())
+    level_changed = args.GetModifiedElementIds(
+        DB.ElementClassFilter(DB.Level)).Count > 0
+    return space_ids, level_changed
+
+
+def on_document_changed(args):
+    # type: (DB.Events.DocumentChangedEventArgs) -> None
+    """Called by the doc-changed hook of the extension"""
+    document_key = get_document_key(args.GetDocument())
+    if not get_document_space_geometries(document_key):
+        return
+    space_ids, level_changed = get_changed_space_ids(args)
+    if level_changed:
+        clear_space_geometry_cache(document_key)
+    elif space_ids:
+        invalidate_spaces(document_key, space_ids)
@@ -0,0 +1,139 @@
+"""
+2D spatial index used to match MEP instances against spaces.
+
+The index only works with plain coordinate tuples, so it can be built and
+queried without a running Revit session.
+"""
+import math
+
+
+class SpaceGridIndex(object):
+    """
+    Uniform grid over the plan bounding boxes of spaces.
+
+    Every box is registered in all grid cells it overlaps. A point query
+    looks at exactly one cell and returns the keys whose boxes contain the
+    point, so the cost of a query depends on the local space density and not
+    on the total number of spaces.
+    """
+
+    def __init__(self, boxes, cell_size=None, tolerance=1e-6):
+        # type: (list[tuple], float, float) -> None
+        """
+        boxes: iterable of (key, (min_x, min_y, max_x, max_y))
+        cell_size: edge length of a grid cell, defaults to the mean box extent
+        tolerance: distance a point may lie outside of a box and still match
+        """
+        self.tolerance = tolerance
+        self._keys = []
+        self._boxes = []
+        for key, box in boxes:
+            min_x, min_y, max_x, max_y = box
+            self._keys.append(key)
+            self._boxes.append((min(min_x, max_x), min(min_y, max_y),
+                                max(min_x, max_x), max(min_y, max_y)))
+
+        self.cell_size = cell_size or self._default_cell_size()
+        self._cells = {}
+        for idx, box in enumerate(self._boxes):
+            min_i, min_j = self._cell_of(box[0] - tolerance,
+                                         box[1] - tolerance)
+            max_i, max_j = self._cell_of(box[2] + tolerance,
+                                         box[3] + tolerance)
+            for i in range(min_i, max_i + 1):
+                for j in range(min_j, max_j + 1):
+                    self._cells.setdefault((i, j), []).append(idx)
+
+    def _default_cell_size(self):
+        # type: () -> float
+        if not self._boxes:
+            return 1.0
+        extents = [
+            max(box[2] - box[0], box[3] - box[1]) for box in self._boxes
+        ]
+        mean_extent = sum(extents) / float(len(extents))
+        return mean_extent if mean_extent > 0 else 1.0
+
+    def _cell_of(self, x, y):
+        # type: (float, float) -> tuple[int, int]
+        return (int(math.floor(x / self.cell_size)),
+                int(math.floor(y / self.cell_size)))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def as_data(self, fn_get_key_data):
+        # type: (function) -> dict
+        """
+        Boxes and cells as plain data. fn_get_key_data(key) returns the
+        plain data of a key, e.g. the id of a space element.
+        """
+        return {
+            "cell_size": self.cell_size,
+            "tolerance": self.tolerance,
+            "keys": [fn_get_key_data(key) for key in self._keys],
+            "boxes": list(self._boxes),
+            "cells": dict(self._cells),
+        }
+
+    @classmethod
+    def from_data(cls, data, fn_get_key):
+        # type: (dict, function) -> SpaceGridIndex
+        """Index of as_data, fn_get_key(key_data) returns the key again"""
+        index = cls([], data["cell_size"], data["tolerance"])
+        index._keys = [fn_get_key(key_data) for key_data in data["keys"]]
+        index._boxes = data["boxes"]
+        index._cells = data["cells"]
+        return index
+
+    def candidates(self, x, y):
+        # type: (float, float) -> list
+        """Return the keys of all boxes containing the point (x, y)"""
+        tolerance = self.tolerance
+        result = []
+        for idx in self._cells.get(self._cell_of(x, y), ()):
+            min_x, min_y, max_x, max_y = self._boxes[idx]
+            if (min_x - tolerance <= x <= max_x + tolerance
+                    and min_y - tolerance <= y <= max_y + tolerance):
+                result.append(self._keys[idx])
+        return result
+
+
+def get_plan_box(element):
+    # type: (DB.Element) -> tuple[float, float, float, float]
+    """Return the plan bounding box of a Revit element as a plain tuple"""
+    bb = element.get_BoundingBox(None)
+    if bb is None:
+        return None
+    return (bb.Min.X, bb.Min.Y, bb.Max.X, bb.Max.Y)
+
+
+def build_space_index(spaces, cell_size=None):
+    # type: (list[DB.Element], float) -> SpaceGridIndex
+    """Build a grid index keyed by the given spaces from their bounding boxes"""
+    boxes = []
+    for space in spaces:
+        box = get_plan_box(space)
+        if box is not None:
+            boxes.append((space, box))
+    return SpaceGridIndex(boxes, cell_size=cell_size)
+
+
+def is_point_in_space(space, point):
+    # type: (DB.Element, DB.XYZ) -> bool
+    """Default exact containment test"""
+    return space.IsPointInSpace(point)
+
+
+def find_containing_space(index, point, fn_contains=None):
+    # type: (SpaceGridIndex, DB.XYZ, function) -> DB.Element
+    """
+    Return the first candidate space of the index containing the point.
+    fn_contains(space, point) does the exact test, defaults to IsPointInSpace.
+    """
+    if fn_contains is None:
+        fn_contains = is_point_in_space
+    for space in index.candidates(point.X, point.Y):
+        if fn_contains(space, point):
+            return space
+    return None
@@ -0,0 +1,251 @@
+"""
+StorageType-native parameter values.
+
+Values are read with AsDouble/AsInteger/AsElementId/AsString and written
+back natively instead of going through AsValueString and string parsing,
+which is both faster and independent of the display units and locale.
+Doubles are converted between the spec types of source and target
+parameter, e.g. an area copied into a number parameter arrives in the
+display unit of areas.
+"""
+from param_transfer.division import get_number_format, parse_number
+
+STORAGE_DOUBLE = "Double"
+STORAGE_INTEGER = "Integer"
+STORAGE_STRING = "String"
+STORAGE_ELEMENT_ID = "ElementId"
+
+DOUBLE_TOLERANCE = 1e-9
+
+
+class FormattedValue(str):
+    """
+    Display string that is written with SetValueString, used when a text
+    value has to be parsed into a numeric parameter.
+    """
+
+
+def get_storage_type(parameter):
+    # type: (DB.Parameter) -> str
+    return str(parameter.StorageType)
+
+
+def read_native(parameter):
+    # type: (DB.Parameter) -> object
+    """Return the value of the parameter in its storage type"""
+    storage_type = get_storage_type(parameter)
+    if storage_type == STORAGE_DOUBLE:
+        return parameter.AsDouble()
+    if storage_type == STORAGE_INTEGER:
+        return parameter.AsInteger()
+    if storage_type == STORAGE_STRING:
+        return parameter.AsString()
+    if storage_type == STORAGE_ELEMENT_ID:
+        return parameter.AsElementId()
+    return None
+
+
+def write_native(parameter, value):
+    # type: (DB.Parameter, object) -> bool
+    """Write a value produced by ValueConverter.convert"""
+    if isinstance(value, FormattedValue):
+        return parameter.SetValueString(value)
+    return parameter.Set(value)
+
+
+def get_display_value(parameter):
+    # type: (DB.Parameter) -> str
+    """Return the value as shown in the Revit UI"""
+    if get_storage_type(parameter) == STORAGE_STRING:
+        return parameter.AsString()
+    return parameter.AsValueString()
+
+
+def values_equal(current_value, new_value):
+    # type: (object, object) -> bool
+    """Compare a native value with a planned native value"""
+    if isinstance(new_value, float) and isinstance(current_value, float):
+        return abs(current_value - new_value) <= DOUBLE_TOLERANCE * max(
+            1.0, abs(current_value))
+    if hasattr(new_value, "IntegerValue") and hasattr(current_value,
+                                                      "IntegerValue"):
+        return new_value.IntegerValue == current_value.IntegerValue
+    if current_value is None or current_value == "":
+        return new_value is None or new_value == ""
+    return current_value == new_value
+
+
+def get_spec_type_id(parameter):
+    # type: (DB.Parameter) -> DB.ForgeTypeId
+    """Return the spec type of the parameter, None before Revit 2021"""
+    definition = parameter.Definition
+    # GetDataType replaced GetSpecTypeId in Revit 2022
+    for method_name in ("GetDataType", "GetSpecTypeId"):
+        method = getattr(definition, method_name, None)
+        if method is not None:
+            return method()
+    return None
+
+
+def get_parameter_kind(parameter):
+    # type: (DB.Parameter) -> tuple[str, str]
+    """(storage type, spec type id) of a parameter, decides value conversion"""
+    spec_type_id = get_spec_type_id(parameter)
+    return (get_storage_type(parameter),
+            spec_type_id.TypeId if spec_type_id is not None else None)
+
+
+def format_native(value):
+    # type: (object) -> str
+    """Short text of a native value for reports"""
+    if value is None:
+        return ""
+    if hasattr(value, "IntegerValue"):
+        return str(value.IntegerValue)
+    if isinstance(value, float):
+        return "{:g}".format(value)
+    return value if isinstance(value, str) else str(value)
+
+
+class ValueConverter(object):
+    """
+    Convert the value of a source parameter to the native value of a target
+    parameter. Units of the document and the unit of each spec type are
+    looked up once.
+    """
+
+    def __init__(self, doc):
+        # type: (DB.Document) -> None
+        self.doc = doc
+        self._units = None
+        self._number_format = None
+        self._unit_type_ids = {}
+
+    @property
+    def units(self):
+        # type: () -> DB.Units
+        if self._units is None:
+            self._units = self.doc.GetUnits()
+        return self._units
+
+    @property
+    def number_format(self):
+        # type: () -> NumberFormat
+        """Decimal and digit grouping symbols of text values in this document"""
+        if self._number_format is None:
+            self._number_format = get_number_format(self.doc)
+        return self._number_format
+
+    def _get_unit_type_id(self, spec_type_id):
+        # type: (DB.ForgeTypeId) -> DB.ForgeTypeId
+        """Display unit of the spec in this document, None if unitless"""
+        if spec_type_id is None:
+            return None
+        key = spec_type_id.TypeId
+        if key not in self._unit_type_ids:
+            from pyrevit import DB
+
+            unit_type_id = None
+            try:
+                if DB.UnitUtils.IsMeasurableSpec(spec_type_id):
+                    unit_type_id = self.units.GetFormatOptions(
+                        spec_type_id).GetUnitTypeId()
+            except Exception:
+                # empty or non-spec ids, e.g. family types
+                unit_type_id = None
+            self._unit_type_ids[key] = unit_type_id
+        return self._unit_type_ids[key]
+
+    def to_display(self, value, spec_type_id):
+        # type: (float, DB.ForgeTypeId) -> float
+        """Convert an internal double to the display unit of the spec"""
+        unit_type_id = self._get_unit_type_id(spec_type_id)
+        if unit_type_id is None:
+            return value
+        from pyrevit import DB
+        return DB.UnitUtils.ConvertFromInternalUnits(value, unit_type_id)
+
+    def to_internal(self, value, spec_type_id):
+        # type: (float, DB.ForgeTypeId) -> float
+        """Convert a double in the display unit of the spec to internal"""
+        unit_type_id = self._get_unit_type_id(spec_type_id)
+        if unit_type_id is None:
+            return value
+        from pyrevit import DB
+        return DB.UnitUtils.ConvertToInternalUnits(value, unit_type_id)
+
+    def parse_formatted(self, value, target_parameter):
+        # type: (FormattedValue, DB.Parameter) -> object
+        """
+        Native value a FormattedValue would be set to, None if only
+        SetValueString can tell. A unit in the text has to be the one the
+        target displays, the number is then in its display unit.
+        """
+        parsed = parse_number(value, self.number_format)
+        if parsed is None or parsed.prefix.strip():
+            return None
+        if parsed.suffix.strip():
+            current = parse_number(target_parameter.AsValueString(),
+                                   self.number_format)
+            if current is None or current.suffix.strip() != parsed.suffix.strip():
+                return None
+        target_type = get_storage_type(target_parameter)
+        if target_type == STORAGE_DOUBLE:
+            return self.to_internal(parsed.value,
+                                    get_spec_type_id(target_parameter))
+        if target_type == STORAGE_INTEGER:
+            return int(round(parsed.value))
+        return None
+
+    def convert_double(self, value, source_spec, target_spec):
+        # type: (float, DB.ForgeTypeId, DB.ForgeTypeId) -> float
+        """Convert an internal double between two spec types"""
+        if source_spec is None or target_spec is None:
+            return value
+        if source_spec.TypeId == target_spec.TypeId:
+            return value
+        return self.to_internal(self.to_display(value, source_spec),
+                                target_spec)
+
+    def convert(self, source_parameter, target_parameter):
+        # type: (DB.Parameter, DB.Parameter) -> object
+        """
+        Return the value to write into the target parameter, or None if the
+        storage types can not be converted into each other.
+        """
+        source_type = get_storage_type(source_parameter)
+        target_type = get_storage_type(target_parameter)
+
+        if target_type == STORAGE_STRING:
+            if source_type == STORAGE_STRING:
+                return source_parameter.AsString()
+            return source_parameter.AsValueString()
+
+        if target_type == STORAGE_ELEMENT_ID:
+            if source_type == STORAGE_ELEMENT_ID:
+                return source_parameter.AsElementId()
+            return None
+
+        if source_type == STORAGE_STRING:
+            text = source_parameter.AsString()
+            return FormattedValue(text) if text else None
+
+        if source_type == STORAGE_DOUBLE:
+            value = source_parameter.AsDouble()
+            source_spec = get_spec_type_id(source_parameter)
+        elif source_type == STORAGE_INTEGER:
+            value = float(source_parameter.AsInteger())
+            source_spec = None
+        else:
+            return None
+
+        target_spec = get_spec_type_id(target_parameter)
+        if target_type == STORAGE_DOUBLE:
+            if source_spec is None:
+                return self.to_internal(value, target_spec)
+            return self.convert_double(value, source_spec, target_spec)
+        if target_type == STORAGE_INTEGER:
+            if source_spec is not None:
+                value = self.to_display(value, source_spec)
+            return int(round(value))
+        return None
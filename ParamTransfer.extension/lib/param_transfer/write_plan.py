@@ -0,0 +1,237 @@
+"""
+Write plan of the parameter transfer.
+
+The transfer is split in three stages:
+- plan: collect (element, parameter, new_value) tuples without touching the model
+- diff: drop all writes whose new value equals the current value
+- apply: set the remaining values in chunks of transactions inside one
+  transaction group
+
+Skipping no-op writes keeps the transactions small, avoids regeneration and
+does not borrow elements in workshared models needlessly. The chunks keep
+the undo memory bounded and allow progress reporting and cancellation, the
+group ends up as a single undo step.
+An optional AuditLog records every applied write, see param_transfer.audit.
+"""
+from collections import namedtuple
+
+from param_transfer.values import FormattedValue, get_display_value, read_native, values_equal, write_native
+
+DEFAULT_CHUNK_SIZE = 2000
+
+PlannedWrite = namedtuple("PlannedWrite",
+                          ["element", "parameter", "value", "space"])
+
+
+def is_noop_write(write, converter=None):
+    # type: (PlannedWrite, ValueConverter) -> bool
+    """
+    Check if the write would not change the current value. Formatted values
+    are compared as parsed native values, display strings differ in units
+    and rounding. Without converter only equal display strings match.
+    """
+    if isinstance(write.value, FormattedValue):
+        if converter is not None:
+            value = converter.parse_formatted(write.value, write.parameter)
+            if value is not None:
+                return values_equal(read_native(write.parameter), value)
+        return get_display_value(write.parameter) == write.value
+    return values_equal(read_native(write.parameter), write.value)
+
+
+class WritePlan(object):
+    """Ordered list of planned writes"""
+
+    def __init__(self, writes=None):
+        # type: (list[PlannedWrite]) -> None
+        self.writes = writes or []
+        self.skipped_count = 0
+
+    def add(self, element, parameter, value, space=None):
+        # type: (DB.Element, DB.Parameter, object, DB.Element) -> None
+        """space is the source element of the value, used for reporting"""
+        if parameter.IsReadOnly:
+            return
+        self.writes.append(PlannedWrite(element, parameter, value, space))
+
+    def __len__(self):
+        return len(self.writes)
+
+    def __iter__(self):
+        return iter(self.writes)
+
+    @property
+    def element_ids(self):
+        # type: () -> set[int]
+        return set(write.element.Id.IntegerValue for write in self.writes)
+
+
+def diff_write_plan(plan, converter=None):
+    # type: (WritePlan, ValueConverter) -> WritePlan
+    """Return a new plan without the writes that would not change anything"""
+    diffed_plan = WritePlan()
+    for write in plan:
+        if is_noop_write(write, converter):
+            diffed_plan.skipped_count += 1
+        else:
+            diffed_plan.writes.append(write)
+    diffed_plan.skipped_count += plan.skipped_count
+    return diffed_plan
+
+
+class WriteSummary(object):
+    """Counts of an applied write plan"""
+
+    def __init__(self):
+        self.applied_count = 0
+        self.skipped_count = 0
+        self.failed_count = 0
+        self.borrowed_count = 0
+        self.failed_unique_ids = set()
+        self.chunk_count = 0
+        self.cancelled = False
+
+    def __str__(self):
+        if self.cancelled:
+            return "Cancelled, all writes were rolled back"
+        return "Writes applied: {applied}, skipped (unchanged): {skipped}, " \
+               "failed: {failed}, elements borrowed: {borrowed}".format(
+                   applied=self.applied_count,
+                   skipped=self.skipped_count,
+                   failed=self.failed_count,
+                   borrowed=self.borrowed_count)
+
+
+def _get_not_owned_element_ids(doc, element_ids):
+    # type: (DB.Document, set[int]) -> set[int]
+    """Return the ids of elements that are not owned by anybody"""
+    if not doc.IsWorkshared:
+        return set()
+    from pyrevit import DB
+
+    not_owned = set()
+    for element_id in element_ids:
+        status = DB.WorksharingUtils.GetCheckoutStatus(doc,
+                                                       DB.ElementId(element_id))
+        if status == DB.CheckoutStatus.NotOwned:
+            not_owned.add(element_id)
+    return not_owned
+
+
+def _count_borrowed(doc, not_owned_ids):
+    # type: (DB.Document, set[int]) -> int
+    """Count elements which were not owned before and are owned now"""
+    if not not_owned_ids:
+        return 0
+    from pyrevit import DB
+
+    borrowed_count = 0
+    for element_id in not_owned_ids:
+        status = DB.WorksharingUtils.GetCheckoutStatus(doc,
+                                                       DB.ElementId(element_id))
+        if status == DB.CheckoutStatus.OwnedByCurrentUser:
+            borrowed_count += 1
+    return borrowed_count
+
+
+def _apply_write(write, summary, audit_log=None):
+    # type: (PlannedWrite, WriteSummary, AuditLog) -> None
+    old_value = audit_log.read_value(write) if audit_log is not None else None
+    if write_native(write.parameter, write.value):
+        summary.applied_count += 1
+        if audit_log is not None:
+            audit_log.record(write, old_value)
+    else:
+        summary.failed_count += 1
+        summary.failed_unique_ids.add(write.element.UniqueId)
+
+
+def _create_transaction_group(doc, name):
+    # type: (DB.Document, str) -> DB.TransactionGroup
+    from pyrevit import DB
+    return DB.TransactionGroup(doc, name)
+
+
+def _create_transaction(doc, name):
+    # type: (DB.Document, str) -> DB.Transaction
+    from pyrevit import DB
+    return DB.Transaction(doc, name)
+
+
+def iter_chunks(writes, chunk_size=DEFAULT_CHUNK_SIZE):
+    # type: (list[PlannedWrite], int) -> list[PlannedWrite]
+    for start in range(0, len(writes), chunk_size):
+        yield writes[start:start + chunk_size]
+
+
+def apply_write_plan_chunked(doc,
+                             plan,
+                             transaction_name="Param transfer CUSTOM",
+                             chunk_size=DEFAULT_CHUNK_SIZE,
+                             progress_bar=None,
+                             audit_log=None,
+                             fn_create_transaction_group=_create_transaction_group,
+                             fn_create_transaction=_create_transaction):
+    # type: (DB.Document, WritePlan, str, int, ProgressBar, AuditLog, function, function) -> WriteSummary
+    """
+    Set all values of the plan, committing a transaction every chunk_size
+    writes inside one transaction group that ends up as a single undo step.
+
+    progress_bar is an optional cancellable pyrevit ProgressBar. On cancel
+    the whole group is rolled back and the summary is marked as cancelled,
+    on errors it is rolled back and the error is raised. The audit log
+    streams the rows of every chunk and is only kept if the group is
+    committed. fn_create_transaction_group(doc, name) and
+    fn_create_transaction(doc, name) create the transactions, e.g. stand-ins.
+    """
+    summary = WriteSummary()
+    summary.skipped_count = plan.skipped_count
+    if not len(plan):
+        if audit_log is not None:
+            audit_log.commit()
+        return summary
+
+    not_owned_ids = _get_not_owned_element_ids(doc, plan.element_ids)
+    writes = plan.writes
+    write_count = len(writes)
+    written_count = 0
+
+    tg = fn_create_transaction_group(doc, transaction_name)
+    tg.Start()
+    try:
+        for chunk in iter_chunks(writes, chunk_size):
+            if progress_bar is not None and progress_bar.cancelled:
+                tg.RollBack()
+                if audit_log is not None:
+                    audit_log.discard()
+                cancelled_summary = WriteSummary()
+                cancelled_summary.skipped_count = plan.skipped_count
+                cancelled_summary.cancelled = True
+                return cancelled_summary
+
+            t = fn_create_transaction(doc, "{} ({})".format(
+                transaction_name, summary.chunk_count + 1))
+            t.Start()
+            try:
+                for write in chunk:
+                    _apply_write(write, summary, audit_log)
+            except Exception:
+                t.RollBack()
+                raise
+            t.Commit()
+            summary.chunk_count += 1
+
+            written_count += len(chunk)
+            if progress_bar is not None:
+                progress_bar.update_progress(written_count, write_count)
+    except Exception:
+        tg.RollBack()
+        if audit_log is not None:
+            audit_log.discard()
+        raise
+    tg.Assimilate()
+    if audit_log is not None:
+        audit_log.commit()
+
+    summary.borrowed_count = _count_borrowed(doc, not_owned_ids)
+    return summary
@@ -0,0 +1,12 @@
+"""
+Offline tests of the param_transfer library. They run on any Python without
+Revit, Revit objects are replaced by the stand-ins of param_transfer.benchmark
+and tests/standins.py:
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "lib"))
@@ -0,0 +1,115 @@
+"""
+Stand-ins of the Revit API objects the tests need beyond the ones of
+param_transfer.benchmark.
+"""
+import math
+
+from param_transfer.benchmark import StandInDefinition, StandInDocument, StandInId, StandInInstance, StandInParameter, StandInSpace, StandInXYZ
+
+
+class StandInUnits(object):
+
+    def __init__(self, decimal_symbol="Dot", digit_grouping_symbol="Comma"):
+        # type: (str, str) -> None
+        self.DecimalSymbol = decimal_symbol
+        self.DigitGroupingSymbol = digit_grouping_symbol
+
+
+class UnitsDocument(StandInDocument):
+    """Document with the given decimal and digit grouping symbols"""
+
+    def __init__(self, decimal_symbol="Dot", digit_grouping_symbol="Comma"):
+        # type: (str, str) -> None
+        self.units = StandInUnits(decimal_symbol, digit_grouping_symbol)
+
+    def GetUnits(self):
+        return self.units
+
+
+class DisplayParameter(StandInParameter):
+    """Numeric parameter shown with a unit, like AsValueString in Revit"""
+
+    def __init__(self, name, storage_type, value, display_text):
+        # type: (str, str, object, str) -> None
+        StandInParameter.__init__(self, StandInDefinition(name),
+                                  storage_type, value)
+        self.display_text = display_text
+
+    def AsValueString(self):
+        return self.display_text
+
+
+class StandInTransform(object):
+    """Rotation about the Z axis and translation, like a link transform"""
+
+    def __init__(self, angle, origin):
+        # type: (float, StandInXYZ) -> None
+        self.angle = angle
+        self.Origin = origin
+        self.BasisX = StandInXYZ(math.cos(angle), math.sin(angle), 0.0)
+        self.BasisY = StandInXYZ(-math.sin(angle), math.cos(angle), 0.0)
+        self.BasisZ = StandInXYZ(0.0, 0.0, 1.0)
+        self.point_count = 0
+
+    @property
+    def Inverse(self):
+        cos, sin = math.cos(-self.angle), math.sin(-self.angle)
+        x, y = -self.Origin.X, -self.Origin.Y
+        return StandInTransform(
+            -self.angle,
+            StandInXYZ(x * cos - y * sin, x * sin + y * cos, -self.Origin.Z))
+
+    def OfPoint(self, point):
+        self.point_count += 1
+        return StandInXYZ(
+            self.Origin.X + point.X * self.BasisX.X + point.Y * self.BasisY.X,
+            self.Origin.Y + point.X * self.BasisX.Y + point.Y * self.BasisY.Y,
+            self.Origin.Z + point.Z)
+
+
+class StandInLinkInstance(object):
+
+    def __init__(self, link_doc=None):
+        # type: (StandInDocument) -> None
+        self.link_doc = link_doc or StandInDocument()
+        self.Name = "Link"
+
+    def GetLinkDocument(self):
+        return self.link_doc
+
+
+def make_square_space(element_id, level, x0, y0, size=10.0, parameters=()):
+    # type: (int, StandInLevel, float, float, float, list[StandInParameter]) -> StandInSpace
+    """Square space on the level, its number is the element id"""
+    return StandInSpace(
+        StandInId(element_id), StandInId(2), level,
+        [StandInParameter(StandInDefinition("Number"), "String",
+                          str(element_id))] + list(parameters),
+        [(x0, y0), (x0 + size, y0), (x0 + size, y0 + size), (x0, y0 + size)])
+
+
+def make_instance(element_id, level, x, y, z, parameters=()):
+    # type: (int, StandInLevel, float, float, float, list[StandInParameter]) -> StandInInstance
+    return StandInInstance(StandInId(element_id), StandInId(3), level,
+                           list(parameters), StandInXYZ(x, y, z))
+
+
+class StandInTransaction(object):
+    """Transaction or transaction group that records its calls in a shared log"""
+
+    def __init__(self, log, doc, name):
+        # type: (list[tuple[str, str]], StandInDocument, str) -> None
+        self.log = log
+        self.name = name
+
+    def Start(self):
+        self.log.append(("Start", self.name))
+
+    def Commit(self):
+        self.log.append(("Commit", self.name))
+
+    def RollBack(self):
+        self.log.append(("RollBack", self.name))
+
+    def Assimilate(self):
+        self.log.append(("Assimilate", self.name))
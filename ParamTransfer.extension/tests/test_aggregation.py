@@ -0,0 +1,86 @@
+import pytest
+
+from param_transfer.aggregation import AGGREGATE_COUNT, AGGREGATE_MAX, AGGREGATE_MEAN, AGGREGATE_MIN, AGGREGATE_SUM, AggregationMapping, aggregate, plan_space_aggregates
+from param_transfer.benchmark import StandInDefinition, StandInId, StandInLevel, StandInParameter
+from param_transfer.parameters import ParameterResolver
+from param_transfer.values import ValueConverter
+from param_transfer.write_plan import WritePlan
+
+from standins import UnitsDocument, make_instance, make_square_space
+
+TARGETS = ("Total", "Minimum", "Maximum", "Mean", "Count")
+
+
+def make_space_group(flows):
+    level = StandInLevel(StandInId(1), "Level 1", 0.0)
+    space = make_square_space(11, level, 0.0, 0.0, parameters=[
+        StandInParameter(StandInDefinition(name), "Double", -1.0)
+        for name in TARGETS
+    ])
+    flow = StandInDefinition("Flow")
+    instances = [
+        make_instance(21 + index, level, 5.0, 5.0, 2.0,
+                      [StandInParameter(flow, "Double", value)]
+                      if value is not None else [])
+        for index, value in enumerate(flows)
+    ]
+    return space, instances
+
+
+def plan_aggregates(space, instances, aggregations):
+    doc = UnitsDocument()
+    plan = WritePlan()
+    plan_space_aggregates(plan, ParameterResolver(doc), ValueConverter(doc),
+                          space, instances, aggregations)
+    return dict((write.parameter.Definition.Name, write.value)
+                for write in plan)
+
+
+@pytest.mark.parametrize("function, expected", [
+    (AGGREGATE_SUM, 60.0),
+    (AGGREGATE_MIN, 10.0),
+    (AGGREGATE_MAX, 30.0),
+    (AGGREGATE_MEAN, 20.0),
+    (AGGREGATE_COUNT, 3),
+])
+def test_aggregate_functions(function, expected):
+    assert aggregate([10.0, 30.0, 20.0], function) == expected
+
+
+def test_all_functions_are_planned_for_a_space():
+    # the last instance has no flow, it is counted but not aggregated
+    space, instances = make_space_group([10.0, 30.0, 20.0, None])
+    assert plan_aggregates(space, instances, [
+        AggregationMapping("Flow", "Total", AGGREGATE_SUM),
+        AggregationMapping("Flow", "Minimum", AGGREGATE_MIN),
+        AggregationMapping("Flow", "Maximum", AGGREGATE_MAX),
+        AggregationMapping("Flow", "Mean", AGGREGATE_MEAN),
+        AggregationMapping(None, "Count", AGGREGATE_COUNT),
+    ]) == {
+        "Total": 60.0,
+        "Minimum": 10.0,
+        "Maximum": 30.0,
+        "Mean": 20.0,
+        "Count": 4.0,
+    }
+
+
+def test_no_values_plan_no_write_but_zero_sum_and_count():
+    space, instances = make_space_group([None, None])
+    for function in (AGGREGATE_MIN, AGGREGATE_MAX, AGGREGATE_MEAN):
+        assert aggregate([], function) is None
+    assert plan_aggregates(space, instances, [
+        AggregationMapping("Flow", "Total", AGGREGATE_SUM),
+        AggregationMapping("Flow", "Minimum", AGGREGATE_MIN),
+        AggregationMapping("Flow", "Maximum", AGGREGATE_MAX),
+        AggregationMapping("Flow", "Mean", AGGREGATE_MEAN),
+        AggregationMapping(None, "Count", AGGREGATE_COUNT),
+    ]) == {
+        "Total": 0.0,
+        "Count": 2.0,
+    }
+    # a space without instances
+    assert plan_aggregates(space, [], [
+        AggregationMapping("Flow", "Mean", AGGREGATE_MEAN),
+        AggregationMapping(None, "Count", AGGREGATE_COUNT),
+    ]) == {"Count": 0.0}
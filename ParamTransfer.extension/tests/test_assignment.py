@@ -0,0 +1,100 @@
+from param_transfer.assignment import assign_instances_to_spaces
+from param_transfer.benchmark import StandInId, StandInLevel, StandInXYZ
+from param_transfer.spatial_index import build_space_index
+
+from standins import make_instance, make_square_space
+
+
+class StandInPhase(object):
+
+    def __init__(self, element_id):
+        # type: (int) -> None
+        self.Id = StandInId(element_id)
+
+
+def make_model():
+    level = StandInLevel(StandInId(1), "Level 1", 0.0)
+    spaces = [make_square_space(11, level, 0.0, 0.0),
+              make_square_space(12, level, 20.0, 0.0)]
+    return level, spaces
+
+
+def make_phase_instance(element_id, level, x, spaces_by_phase):
+    """Instance whose Space[phase] is looked up in spaces_by_phase"""
+    instance = make_instance(element_id, level, x, 5.0, 2.0)
+    instance.Space = spaces_by_phase
+    return instance
+
+
+def assign(instances, spaces, phase):
+    contains_calls = []
+
+    def contains(space, point):
+        contains_calls.append(space.Id.IntegerValue)
+        return space.IsPointInSpace(point)
+
+    assignment = assign_instances_to_spaces(instances, spaces, phase=phase,
+                                            fn_contains=contains)
+    result = dict((instance.Id.IntegerValue, space.Id.IntegerValue)
+                  for space, space_instances in assignment.items()
+                  for instance in space_instances)
+    return assignment, result, contains_calls
+
+
+def test_instances_without_phase_space_are_matched_geometrically():
+    level, spaces = make_model()
+    phase = StandInPhase(5)
+    instances = [
+        make_phase_instance(21, level, 5.0, {phase: None}),
+        # not an MEP family, Space raises
+        make_instance(22, level, 25.0, 5.0, 2.0),
+        make_phase_instance(23, level, 15.0, {phase: None}),
+    ]
+    assignment, result, contains_calls = assign(instances, spaces, phase)
+    assert result == {21: 11, 22: 12}
+    assert assignment.matched_by_phase == 0
+    assert assignment.matched_by_geometry == 2
+    assert [instance.Id.IntegerValue
+            for instance in assignment.unassigned] == [23]
+    assert contains_calls == [11, 12]
+
+
+def test_the_phase_space_takes_precedence():
+    level, spaces = make_model()
+    phase, other_phase = StandInPhase(5), StandInPhase(6)
+    instances = [
+        # located in space 11, but Revit reports space 12 in the phase
+        make_phase_instance(21, level, 5.0, {
+            phase: spaces[1],
+            other_phase: spaces[0]
+        }),
+        # the space of the phase is not part of the scope
+        make_phase_instance(22, level, 5.0,
+                            {phase: make_square_space(13, level, 0.0, 0.0)}),
+    ]
+    assignment, result, contains_calls = assign(instances, spaces, phase)
+    assert result == {21: 12}
+    assert assignment.matched_by_phase == 1
+    assert assignment.matched_by_geometry == 0
+    assert [instance.Id.IntegerValue
+            for instance in assignment.unassigned] == [22]
+    assert contains_calls == []
+
+
+def test_index_is_only_built_for_the_geometric_fallback():
+    level, spaces = make_model()
+    phase = StandInPhase(5)
+    built = []
+
+    def build_index(index_spaces, cell_size=None):
+        built.append(len(index_spaces))
+        return build_space_index(index_spaces, cell_size)
+
+    instances = [make_phase_instance(21, level, 5.0, {phase: spaces[0]})]
+    assign_instances_to_spaces(instances, spaces, phase=phase,
+                               fn_build_index=build_index)
+    assert built == []
+    instances.append(make_instance(22, level, 25.0, 5.0, 2.0))
+    assign_instances_to_spaces(instances, spaces, phase=phase,
+                               fn_build_index=build_index)
+    assert built == [2]
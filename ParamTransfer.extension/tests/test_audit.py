@@ -0,0 +1,100 @@
+import io
+import os
+
+import pytest
+
+from param_transfer.audit import AuditLog
+from param_transfer.benchmark import StandInDefinition, StandInDocument, StandInId, StandInLevel, StandInParameter
+from param_transfer.write_plan import WritePlan, apply_write_plan_chunked
+
+from standins import StandInTransaction, make_instance, make_square_space
+
+
+class FailingParameter(StandInParameter):
+
+    def Set(self, value):
+        raise RuntimeError("Parameter is read-only in this state")
+
+
+class CancellingProgressBar(object):
+    """Cancelled after the first chunk"""
+
+    cancelled = False
+
+    def update_progress(self, value, max_value):
+        self.cancelled = True
+
+
+def make_plan(values, parameter_type=StandInParameter):
+    level = StandInLevel(StandInId(1), "Level 1", 0.0)
+    space = make_square_space(11, level, 0.0, 0.0)
+    name = StandInDefinition("Comments")
+    plan = WritePlan()
+    for index, value in enumerate(values):
+        parameter = parameter_type(name, "String", u"old")
+        instance = make_instance(21 + index, level, 5.0, 5.0, 2.0,
+                                 [parameter])
+        plan.add(instance, parameter, value, space=space)
+    return plan
+
+
+def apply_plan(plan, audit_log, transaction_log, **kwargs):
+    return apply_write_plan_chunked(
+        StandInDocument(), plan, "Test", audit_log=audit_log,
+        fn_create_transaction_group=lambda doc, name: StandInTransaction(
+            transaction_log, doc, name),
+        fn_create_transaction=lambda doc, name: StandInTransaction(
+            transaction_log, doc, name),
+        **kwargs)
+
+
+def read_lines(file_path):
+    with io.open(file_path, "r", encoding="utf-8", newline="") as f:
+        return f.read().split(u"\r\n")
+
+
+def test_csv_fields_are_quoted(tmp_path):
+    file_path = str(tmp_path / "audit.csv")
+    audit_log = AuditLog(file_path)
+    audit_log.write_row([1, u"a,b", u'say "hi"', u"two\nlines", None, u"x"])
+    audit_log.commit()
+    assert read_lines(file_path) == [
+        u"element_id,unique_id,space_id,parameter,old_value,new_value",
+        u'1,"a,b","say ""hi""","two\nlines",,x',
+        u"",
+    ]
+
+
+def test_commit_moves_the_partial_file_in_place(tmp_path):
+    file_path = str(tmp_path / "audit.csv")
+    audit_log = AuditLog(file_path)
+    transaction_log = []
+    summary = apply_plan(make_plan([u"new, value"]), audit_log,
+                         transaction_log)
+    assert summary.applied_count == 1
+    assert transaction_log[-1] == ("Assimilate", "Test")
+    assert not os.path.exists(audit_log.partial_file_path)
+    assert read_lines(file_path)[1] == \
+        u'21,standin-21,11,Comments,old,"new, value"'
+
+
+def test_cancel_discards_the_log(tmp_path):
+    audit_log = AuditLog(str(tmp_path / "audit.csv"))
+    transaction_log = []
+    summary = apply_plan(make_plan([u"a", u"b"]), audit_log, transaction_log,
+                         chunk_size=1, progress_bar=CancellingProgressBar())
+    assert summary.cancelled
+    assert transaction_log[-1] == ("RollBack", "Test")
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_error_discards_the_log(tmp_path):
+    audit_log = AuditLog(str(tmp_path / "audit.jsonl"))
+    transaction_log = []
+    plan = make_plan([u"a"])
+    plan.writes += make_plan([u"b"], FailingParameter).writes
+    with pytest.raises(RuntimeError):
+        apply_plan(plan, audit_log, transaction_log)
+    assert transaction_log[-2:] == [("RollBack", "Test (1)"),
+                                    ("RollBack", "Test")]
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,90 @@
+import json
+
+from param_transfer.batch import run_job_file
+from param_transfer.benchmark import StandInDefinition, StandInDocument, StandInId, StandInInstance, StandInLevel, StandInParameter, StandInSpace, StandInXYZ, extract_benchmark_boundary
+from param_transfer.values import write_native
+from param_transfer.write_plan import WriteSummary
+
+JOB = {
+    "name": "Diffusers",
+    "families": ["Supply Diffuser"],
+    "mappings": [["Name", "Space Name"], ["Supply Airflow", "Flow"]],
+    "divide_by_element_count": True,
+    "scope": "document",
+}
+
+
+def make_model():
+    # one definition per parameter, shared by all elements like in Revit
+    definitions = dict(
+        (name, StandInDefinition(name))
+        for name in ("Number", "Name", "Supply Airflow", "Space Name", "Flow"))
+    level = StandInLevel(StandInId(1), "Level 1", 0.0)
+    spaces = [
+        StandInSpace(StandInId(element_id), StandInId(2), level, [
+            StandInParameter(definitions["Number"], "String", number),
+            StandInParameter(definitions["Name"], "String", name),
+            StandInParameter(definitions["Supply Airflow"], "Double",
+                             airflow),
+        ], loop) for element_id, number, name, airflow, loop in (
+            (11, u"101", u"Office", 300.0, [(0.0, 0.0), (10.0, 0.0),
+                                            (10.0, 10.0), (0.0, 10.0)]),
+            (12, u"102", u"Meeting", 80.0, [(20.0, 0.0), (30.0, 0.0),
+                                            (30.0, 10.0), (20.0, 10.0)]),
+        )
+    ]
+    instances = [
+        StandInInstance(StandInId(element_id), StandInId(3), level, [
+            StandInParameter(definitions["Space Name"], "String", u""),
+            StandInParameter(definitions["Flow"], "Double", 0.0),
+        ], StandInXYZ(x, 5.0, 2.0)) for element_id, x in (
+            (21, 2.0), (22, 8.0), (23, 25.0), (24, 15.0))
+    ]
+    return spaces, instances
+
+
+def apply_writes(doc, plan, transaction_name, **kwargs):
+    summary = WriteSummary()
+    summary.skipped_count = plan.skipped_count
+    for write in plan:
+        write_native(write.parameter, write.value)
+        summary.applied_count += 1
+    return summary
+
+
+def test_job_file_runs_end_to_end_on_a_standin_document(tmp_path):
+    spaces, instances = make_model()
+    job_file_path = str(tmp_path / "diffusers.json")
+    with open(job_file_path, "w") as f:
+        json.dump(JOB, f)
+
+    summary = run_job_file(
+        StandInDocument(), job_file_path,
+        fn_collect_spaces=lambda doc, view_id: spaces,
+        fn_collect_instances=lambda doc, selections, view_id: instances,
+        fn_apply=apply_writes,
+        fn_get_space_geometry=lambda doc: None,
+        fn_extract_boundary=extract_benchmark_boundary)
+
+    values = dict((instance.Id.IntegerValue,
+                   (instance.LookupParameter("Space Name").AsString(),
+                    instance.LookupParameter("Flow").AsDouble()))
+                  for instance in instances)
+    # the airflow is divided over the instances of the space
+    assert values == {
+        21: (u"Office", 150.0),
+        22: (u"Office", 150.0),
+        23: (u"Meeting", 80.0),
+        24: (u"", 0.0),
+    }
+
+    assert summary["job"] == "Diffusers"
+    assert summary["families"] == ["Supply Diffuser"]
+    assert summary["spaces"] == 2
+    assert summary["instances"] == 3 + 1
+    assert summary["unassigned"] == 1
+    assert summary["writes_planned"] == 6
+    assert summary["writes_applied"] == 6
+    assert summary["writes_failed"] == 0
+    with open(str(tmp_path / "diffusers.summary.json"), "r") as f:
+        assert json.load(f)["writes_applied"] == 6
@@ -0,0 +1,86 @@
+import os
+
+from param_transfer.benchmark import StandInElement, StandInId, StandInLevel, StandInXYZ
+from param_transfer.boundaries import AMBIGUOUS, INSIDE, OUTSIDE, BoundaryContainment, load_boundaries
+
+BOUNDARIES_FILE_PATH = os.path.join(os.path.dirname(__file__), "data",
+                                    "boundaries.json")
+
+# an L-shaped space and a rectangular one around a column, 10 feet high
+L_SHAPED_SPACE = 101
+COLUMN_SPACE = 102
+
+
+def make_space(element_id):
+    return StandInElement(StandInId(element_id), StandInId(0),
+                          StandInLevel(StandInId(1), "Level 1", 0.0), [])
+
+
+def make_containment(fallback_result=False, **kwargs):
+    fallback_points = []
+
+    def fallback(space, point):
+        fallback_points.append((space.Id.IntegerValue, point.X, point.Y))
+        return fallback_result
+
+    def extract(space):
+        raise AssertionError("recorded boundaries are not extracted again")
+
+    containment = BoundaryContainment(load_boundaries(BOUNDARIES_FILE_PATH),
+                                      fn_fallback=fallback,
+                                      fn_extract=extract,
+                                      **kwargs)
+    return containment, fallback_points
+
+
+def test_recorded_boundaries_keep_loops_and_height_band():
+    boundaries = dict((boundary.key, boundary)
+                      for boundary in load_boundaries(BOUNDARIES_FILE_PATH))
+    assert sorted(boundaries) == [L_SHAPED_SPACE, COLUMN_SPACE]
+    assert boundaries[L_SHAPED_SPACE].box == (0.0, 0.0, 20.0, 20.0)
+    assert len(boundaries[COLUMN_SPACE].loops) == 2
+    assert (boundaries[COLUMN_SPACE].min_z,
+            boundaries[COLUMN_SPACE].max_z) == (0.0, 10.0)
+
+
+def test_points_inside_are_contained():
+    containment, fallback_points = make_containment()
+    assert containment(make_space(L_SHAPED_SPACE), StandInXYZ(5.0, 15.0, 3.0))
+    assert containment(make_space(L_SHAPED_SPACE), StandInXYZ(15.0, 5.0, 3.0))
+    assert containment(make_space(COLUMN_SPACE), StandInXYZ(35.0, 5.0, 3.0))
+    assert fallback_points == []
+
+
+def test_points_outside_are_not_contained():
+    containment, fallback_points = make_containment()
+    # in the notch of the L, in the column, above the space
+    assert not containment(make_space(L_SHAPED_SPACE),
+                           StandInXYZ(15.0, 15.0, 3.0))
+    assert not containment(make_space(COLUMN_SPACE),
+                           StandInXYZ(40.0, 10.0, 3.0))
+    assert not containment(make_space(L_SHAPED_SPACE),
+                           StandInXYZ(5.0, 5.0, 12.0))
+    assert fallback_points == []
+
+
+def test_points_on_an_edge_are_decided_by_the_fallback():
+    boundary = load_boundaries(BOUNDARIES_FILE_PATH)[0]
+    assert boundary.classify(10.0, 15.0, 3.0) == AMBIGUOUS
+    assert boundary.classify(10.005, 5.0, 3.0) == INSIDE
+    assert boundary.classify(20.005, 5.0, 3.0) == AMBIGUOUS
+    assert boundary.classify(20.5, 5.0, 3.0) == OUTSIDE
+
+    containment, fallback_points = make_containment(fallback_result=True)
+    # on the inner corner edge of the L and on the edge of the column
+    assert containment(make_space(L_SHAPED_SPACE), StandInXYZ(10.0, 15.0, 3.0))
+    assert containment(make_space(COLUMN_SPACE), StandInXYZ(38.0, 10.0, 3.0))
+    assert fallback_points == [(L_SHAPED_SPACE, 10.0, 15.0),
+                               (COLUMN_SPACE, 38.0, 10.0)]
+    assert containment.fallback_count == 2
+
+
+def test_vertical_tolerance_widens_the_height_band():
+    containment, _ = make_containment(vertical_tolerance=3.0)
+    assert containment(make_space(L_SHAPED_SPACE), StandInXYZ(5.0, 5.0, 12.0))
+    assert not containment(make_space(L_SHAPED_SPACE),
+                           StandInXYZ(5.0, 5.0, 14.0))
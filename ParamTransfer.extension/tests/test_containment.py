@@ -0,0 +1,96 @@
+from param_transfer.benchmark import StandInDocument, StandInId, StandInInstance, StandInLevel, StandInXYZ, extract_benchmark_boundary
+from param_transfer.containment import CONTAINMENT_CALCULATION_POINT, CONTAINMENT_POINT, CONTAINMENT_PROJECTED, CONTAINMENT_TOLERANCE, Containment
+from param_transfer.engine import match_instances
+from param_transfer.instrumentation import PhaseTimer
+
+from standins import make_instance, make_square_space
+
+# levels measured from a survey point, the bands use the project elevation
+SURVEY_ELEVATION = 100.0
+
+
+class CalculationPointInstance(StandInInstance):
+    """Instance whose spatial calculation point differs from its location"""
+
+    HasSpatialElementCalculationPoint = True
+
+    def __init__(self, element_id, level, point, calculation_point):
+        # type: (int, StandInLevel, StandInXYZ, StandInXYZ) -> None
+        StandInInstance.__init__(self, StandInId(element_id), StandInId(3),
+                                 level, [], point)
+        self.calculation_point = calculation_point
+
+    def GetSpatialElementCalculationPoint(self):
+        return self.calculation_point
+
+
+def make_model():
+    """A 10 feet high space on each of two levels, 12 feet apart"""
+    levels = [
+        StandInLevel(StandInId(1), "Level 1", 0.0, SURVEY_ELEVATION),
+        StandInLevel(StandInId(2), "Level 2", 12.0, SURVEY_ELEVATION),
+    ]
+    spaces = [make_square_space(11, levels[0], 0.0, 0.0),
+              make_square_space(12, levels[1], 0.0, 0.0)]
+    return levels, spaces
+
+
+def match(spaces, instances, containment):
+    assignment = match_instances(
+        StandInDocument(), spaces, instances, PhaseTimer(),
+        fn_extract_boundary=extract_benchmark_boundary,
+        containment=containment)
+    return dict((instance.Id.IntegerValue, space.Id.IntegerValue)
+                for space, space_instances in assignment.items()
+                for instance in space_instances)
+
+
+def test_projected_containment_matches_the_ceiling_void():
+    levels, spaces = make_model()
+    instances = [
+        # in the ceiling void of level 1, hosted on level 2
+        make_instance(21, levels[1], 5.0, 5.0, 11.0),
+        # below the lowest level, e.g. under the slab
+        make_instance(22, levels[0], 5.0, 5.0, -1.0),
+        # in the space of level 2
+        make_instance(23, levels[1], 5.0, 5.0, 13.0),
+        # beside the spaces
+        make_instance(24, levels[0], 15.0, 5.0, 5.0),
+    ]
+    assert match(spaces, instances, Containment(CONTAINMENT_POINT)) == {
+        23: 12
+    }
+    assert match(spaces, instances, Containment(CONTAINMENT_PROJECTED)) == {
+        21: 11,
+        22: 11,
+        23: 12,
+    }
+
+
+def test_vertical_tolerance_matches_points_near_the_space():
+    levels, spaces = make_model()
+    instances = [make_instance(21, levels[0], 5.0, 5.0, 11.0),
+                 make_instance(22, levels[0], 5.0, 5.0, -1.5)]
+    assert match(spaces, instances,
+                 Containment(CONTAINMENT_TOLERANCE, 1.0)) == {21: 11}
+    assert match(spaces, instances,
+                 Containment(CONTAINMENT_TOLERANCE, 2.0)) == {21: 11, 22: 11}
+
+
+def test_calculation_point_is_matched_instead_of_the_location():
+    levels, spaces = make_model()
+    # located in the ceiling void, calculated in the space of level 2
+    instance = CalculationPointInstance(21, levels[0],
+                                        StandInXYZ(5.0, 5.0, 11.0),
+                                        StandInXYZ(5.0, 5.0, 14.0))
+    plain_instance = make_instance(22, levels[0], 5.0, 5.0, 5.0)
+    instances = [instance, plain_instance]
+    assert match(spaces, instances, Containment(CONTAINMENT_POINT)) == {
+        22: 11
+    }
+    # families without calculation point keep their location point
+    assert match(spaces, instances,
+                 Containment(CONTAINMENT_CALCULATION_POINT)) == {
+                     21: 12,
+                     22: 11
+                 }
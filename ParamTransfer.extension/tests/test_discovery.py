@@ -0,0 +1,99 @@
+from param_transfer import discovery
+from param_transfer.benchmark import StandInDocument, StandInId
+from param_transfer.discovery import DiscoveredParameters, clear_discovery_cache, discover_family_parameters, get_discovery_cache, on_document_changed
+
+
+class OtherDocument(StandInDocument):
+    Title = "Other"
+
+
+class StandInIds(list):
+
+    @property
+    def Count(self):
+        return len(self)
+
+
+class StandInChangedArgs(object):
+
+    def __init__(self, doc, added=(), deleted=()):
+        self.doc = doc
+        self.added = StandInIds(added)
+        self.deleted = StandInIds(deleted)
+
+    def GetDocument(self):
+        return self.doc
+
+    def GetAddedElementIds(self):
+        return self.added
+
+    def GetDeletedElementIds(self):
+        return self.deleted
+
+
+def count_discoveries(monkeypatch):
+    calls = []
+
+    def discover_parameters(doc, instances):
+        calls.append(doc.Title)
+        discovered = DiscoveredParameters()
+        discovered.add_instance_name("Flow")
+        discovered.add_type_name("Size")
+        discovered.type_count = 1
+        return discovered
+
+    monkeypatch.setattr(discovery, "discover_parameters", discover_parameters)
+    return calls
+
+
+def test_discovery_is_cached_per_document_and_view(monkeypatch):
+    calls = count_discoveries(monkeypatch)
+    doc = StandInDocument()
+    discover_family_parameters(doc, "Diffuser", [], StandInId(1))
+    cached = discover_family_parameters(doc, "Diffuser", [], StandInId(1))
+    assert len(calls) == 1
+    assert (cached.instance_names, cached.type_names,
+            cached.type_count) == (["Flow"], ["Size"], 1)
+    discover_family_parameters(doc, "Diffuser", [], StandInId(2))
+    discover_family_parameters(OtherDocument(), "Diffuser", [], StandInId(1))
+    assert len(calls) == 3
+    # the session store only holds plain names
+    assert all(isinstance(data, dict)
+               for data in get_discovery_cache().values())
+    clear_discovery_cache()
+
+
+def test_clearing_a_document_keeps_the_others(monkeypatch):
+    calls = count_discoveries(monkeypatch)
+    doc, other_doc = StandInDocument(), OtherDocument()
+    discover_family_parameters(doc, "Diffuser", [])
+    discover_family_parameters(other_doc, "Diffuser", [])
+    clear_discovery_cache(doc.Title)
+    discover_family_parameters(doc, "Diffuser", [])
+    discover_family_parameters(other_doc, "Diffuser", [])
+    assert calls == ["Benchmark", "Other", "Benchmark"]
+    clear_discovery_cache()
+
+
+def test_modified_definitions_clear_the_document(monkeypatch):
+    calls = count_discoveries(monkeypatch)
+    doc, other_doc = StandInDocument(), OtherDocument()
+    discover_family_parameters(doc, "Diffuser", [])
+    discover_family_parameters(other_doc, "Diffuser", [])
+
+    # e.g. a parameter value of an instance
+    on_document_changed(StandInChangedArgs(doc), lambda args: False)
+    discover_family_parameters(doc, "Diffuser", [])
+    assert calls == ["Benchmark", "Other"]
+
+    # e.g. a reloaded family or a changed parameter binding
+    on_document_changed(StandInChangedArgs(doc), lambda args: True)
+    discover_family_parameters(doc, "Diffuser", [])
+    discover_family_parameters(other_doc, "Diffuser", [])
+    assert calls == ["Benchmark", "Other", "Benchmark"]
+
+    on_document_changed(StandInChangedArgs(doc, added=[StandInId(7)]),
+                        lambda args: False)
+    discover_family_parameters(doc, "Diffuser", [])
+    assert calls == ["Benchmark", "Other", "Benchmark", "Benchmark"]
+    clear_discovery_cache()
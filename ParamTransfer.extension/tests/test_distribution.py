@@ -0,0 +1,33 @@
+from param_transfer.distribution import DISTRIBUTION_WEIGHTED, ROUNDING_LARGEST_REMAINDER, Distribution, get_shares, largest_remainder_split, split_value
+
+
+def test_integer_is_divided_with_equal_distribution():
+    parts = split_value(10, get_shares([1.0, 1.0, 1.0]), Distribution())
+    assert parts == [4, 3, 3]
+    assert all(isinstance(part, int) for part in parts)
+
+
+def test_integer_is_divided_by_weights():
+    distribution = Distribution(DISTRIBUTION_WEIGHTED, "Flow")
+    assert split_value(100, get_shares([1.0, 3.0]), distribution) == [25, 75]
+
+
+def test_integer_parts_keep_the_total_with_rounding():
+    distribution = Distribution(rounding=ROUNDING_LARGEST_REMAINDER)
+    parts = split_value(7, get_shares([1.0] * 4), distribution)
+    assert sum(parts) == 7
+    assert sorted(parts) == [1, 2, 2, 2]
+
+
+def test_double_is_divided_exactly_without_rounding():
+    assert split_value(9.0, get_shares([1.0, 2.0]),
+                       Distribution()) == [3.0, 6.0]
+
+
+def test_largest_remainder_split_keeps_the_rounded_total():
+    parts = largest_remainder_split(100.0, get_shares([1.0] * 3), 1)
+    assert parts == [33.4, 33.3, 33.3]
+
+
+def test_shares_without_positive_weight_are_equal():
+    assert get_shares([None, 0.0]) == [0.5, 0.5]
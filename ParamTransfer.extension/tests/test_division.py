@@ -0,0 +1,91 @@
+# coding: UTF-8
+from param_transfer.benchmark import StandInDocument
+from param_transfer.distribution import Distribution, split_value
+from param_transfer.division import DEFAULT_NUMBER_FORMAT, NumberFormat, format_number, get_number_format, parse_number
+
+EN_US = NumberFormat(".", ",")
+DE_DE = NumberFormat(",", ".")
+FR_FR = NumberFormat(",", u" \u00a0\u202f")
+DE_CH = NumberFormat(".", u"'\u2019")
+
+
+class Units(object):
+
+    def __init__(self, decimal_symbol, digit_grouping_symbol):
+        self.DecimalSymbol = decimal_symbol
+        self.DigitGroupingSymbol = digit_grouping_symbol
+
+
+class Document(object):
+
+    def __init__(self, units):
+        self.units = units
+
+    def GetUnits(self):
+        return self.units
+
+
+def test_number_format_of_the_document_units():
+    assert get_number_format(Document(Units("Comma", "Dot"))) == DE_DE
+    assert get_number_format(Document(Units("Comma", "Space"))) == FR_FR
+    assert get_number_format(Document(Units("Dot", "Apostrophe"))) == DE_CH
+    assert get_number_format(StandInDocument()) == DEFAULT_NUMBER_FORMAT
+
+
+def test_digit_grouping_is_not_read_as_decimal_separator():
+    parsed = parse_number("1,234 CFM", EN_US)
+    assert parsed.value == 1234.0
+    assert parsed.suffix == " CFM"
+    assert parsed.decimals == 0
+
+
+def test_comma_is_decimal_separator_with_comma_decimal_symbol():
+    parsed = parse_number("1,234 CFM", DE_DE)
+    assert parsed.value == 1.234
+    assert parsed.decimals == 3
+
+
+def test_grouped_numbers():
+    assert parse_number("1,234.5 CFM", EN_US).value == 1234.5
+    assert parse_number(u"1.234,5 m³/h", DE_DE).value == 1234.5
+    assert parse_number("1 000,5 m", FR_FR).value == 1000.5
+    assert parse_number(u"1\u00a0000,5 m", FR_FR).value == 1000.5
+    assert parse_number(u"1\u202f000\u202f000 m", FR_FR).value == 1000000.0
+    assert parse_number("1'000.5 m", DE_CH).value == 1000.5
+
+
+def test_space_grouping_keeps_the_unit_suffix():
+    parsed = parse_number("1 000,5 m", FR_FR)
+    assert parsed.prefix == ""
+    assert parsed.suffix == " m"
+    assert parsed.decimals == 1
+
+
+def test_prefix_sign_and_trailing_separator():
+    parsed = parse_number(u"Flow \u22125,25 l/s", DE_DE)
+    assert parsed.value == -5.25
+    assert parsed.prefix == "Flow "
+    parsed = parse_number("12. OG", DE_DE)
+    assert parsed.value == 12.0
+    assert parsed.suffix == ". OG"
+
+
+def test_text_without_number():
+    assert parse_number("Office", EN_US) is None
+    assert parse_number("", EN_US) is None
+    assert parse_number(None, EN_US) is None
+
+
+def test_format_number():
+    assert format_number(617.0, ",") == "617"
+    assert format_number(6.25, ",") == "6,25"
+    assert format_number(2.0, ".", min_decimals=2) == "2.00"
+    assert format_number(1.0 / 3.0, ".") == "0.3333"
+
+
+def test_split_text_value_in_the_document_number_format():
+    shares = [0.5, 0.5]
+    assert split_value("1,234 CFM", shares, Distribution(),
+                       number_format=EN_US) == ["617 CFM", "617 CFM"]
+    assert split_value("1 000,5 m", shares, Distribution(),
+                       number_format=FR_FR) == ["500,25 m", "500,25 m"]
@@ -0,0 +1,81 @@
+import pytest
+
+from param_transfer.aggregation import AGGREGATE_MAX, AGGREGATE_SUM, AggregationMapping
+from param_transfer.benchmark import StandInDefinition, StandInDocument, StandInId, StandInInstance, StandInLevel, StandInParameter, StandInSpace, StandInXYZ, extract_benchmark_boundary
+from param_transfer.distribution import Distribution
+from param_transfer.engine import build_aggregation_plan, build_transfer_plan
+
+DIFFUSERS = 0
+GRILLES = 1
+
+
+def make_model():
+    """One space with two diffusers and two grilles"""
+    definitions = dict((name, StandInDefinition(name))
+                       for name in ("Supply Airflow", "Flow"))
+    level = StandInLevel(StandInId(1), "Level 1", 0.0)
+    space = StandInSpace(StandInId(11), StandInId(2), level, [
+        StandInParameter(StandInDefinition("Number"), "String", u"101"),
+        StandInParameter(definitions["Supply Airflow"], "Double", 300.0),
+    ], [(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0)])
+    instances = [
+        StandInInstance(StandInId(element_id), StandInId(3), level, [
+            StandInParameter(definitions["Flow"], "Double", flow),
+        ], StandInXYZ(x, 5.0, 2.0)) for element_id, flow, x in (
+            (21, 10.0, 2.0), (22, 20.0, 4.0), (23, 30.0, 6.0),
+            (24, 40.0, 8.0))
+    ]
+    return space, instances
+
+
+def get_family(instance):
+    return DIFFUSERS if instance.Id.IntegerValue < 23 else GRILLES
+
+
+def get_values(plan):
+    return dict((write.element.Id.IntegerValue, write.value) for write in plan)
+
+
+def test_families_with_the_same_mapping_are_aggregated_together():
+    space, instances = make_model()
+    sum_flow = [AggregationMapping("Flow", "Supply Airflow", AGGREGATE_SUM)]
+    plan, _ = build_aggregation_plan(
+        StandInDocument(), [space], instances, [],
+        fn_get_mapping_key=get_family,
+        aggregations_by_key={DIFFUSERS: sum_flow, GRILLES: list(sum_flow)},
+        fn_extract_boundary=extract_benchmark_boundary)
+    assert len(plan) == 1
+    assert get_values(plan) == {11: 100.0}
+
+
+def test_different_aggregations_into_one_parameter_are_rejected():
+    space, instances = make_model()
+    with pytest.raises(KeyError):
+        build_aggregation_plan(
+            StandInDocument(), [space], instances, [],
+            fn_get_mapping_key=get_family,
+            aggregations_by_key={
+                DIFFUSERS: [AggregationMapping("Flow", "Supply Airflow")],
+                GRILLES: [AggregationMapping("Flow", "Supply Airflow",
+                                             AGGREGATE_MAX)],
+            },
+            fn_extract_boundary=extract_benchmark_boundary)
+
+
+@pytest.mark.parametrize("split_per_key, expected", [
+    (False, 75.0),
+    (True, 150.0),
+])
+def test_values_are_split_over_all_instances_of_the_space(
+        split_per_key, expected):
+    space, instances = make_model()
+    pairs = [("Supply Airflow", "Flow")]
+    plan, _ = build_transfer_plan(
+        StandInDocument(), [space], instances, [],
+        distribution=Distribution(),
+        fn_get_mapping_key=get_family,
+        pairs_by_key={DIFFUSERS: pairs, GRILLES: pairs},
+        fn_extract_boundary=extract_benchmark_boundary,
+        split_per_key=split_per_key)
+    assert get_values(plan) == dict(
+        (element_id, expected) for element_id in (21, 22, 23, 24))
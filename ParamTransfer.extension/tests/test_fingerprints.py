@@ -0,0 +1,75 @@
+import pytest
+
+from param_transfer.benchmark import StandInDefinition, StandInDocument, StandInLevel, StandInId, StandInParameter, extract_benchmark_boundary
+from param_transfer.engine import build_transfer_plan
+from param_transfer.fingerprints import FingerprintStore
+
+from standins import make_instance, make_square_space
+
+PAIRS = [("Supply Airflow", "Flow")]
+
+
+def make_model():
+    flow = StandInDefinition("Flow")
+    level = StandInLevel(StandInId(1), "Level 1", 0.0)
+    space = make_square_space(11, level, 0.0, 0.0, parameters=[
+        StandInParameter(StandInDefinition("Supply Airflow"), "Double",
+                         300.0)
+    ])
+    instances = [
+        make_instance(element_id, level, x, 5.0, 2.0,
+                      [StandInParameter(flow, "Double", 0.0)])
+        for element_id, x in ((21, 2.0), (22, 8.0))
+    ]
+    return space, instances
+
+
+def plan_changed(space, instances, fingerprints):
+    plan, _ = build_transfer_plan(
+        StandInDocument(), [space], instances, PAIRS,
+        fingerprints=fingerprints,
+        fn_extract_boundary=extract_benchmark_boundary)
+    return sorted(write.element.Id.IntegerValue for write in plan)
+
+
+def test_unchanged_fingerprints_are_skipped():
+    space, instances = make_model()
+    store = FingerprintStore()
+    assert store.filter_changed(instances, u"a") == instances
+    store.commit()
+    assert store.filter_changed(instances, u"a") == []
+    assert store.unchanged_count == 2
+    assert store.filter_changed(instances, u"b") == instances
+
+    # a rerun without changes plans nothing, a changed source value all
+    store = FingerprintStore()
+    assert plan_changed(space, instances, store) == [21, 22]
+    store.commit()
+    assert plan_changed(space, instances, store) == []
+    space.LookupParameter("Supply Airflow").Set(400.0)
+    assert plan_changed(space, instances, store) == [21, 22]
+
+
+def test_failed_writes_are_not_committed(tmp_path):
+    _, instances = make_model()
+    file_path = str(tmp_path / "fingerprints.json")
+    store = FingerprintStore.load(file_path)
+    store.filter_changed(instances, u"a")
+    store.commit(set([instances[1].UniqueId]))
+    store.save()
+
+    reloaded = FingerprintStore.load(file_path)
+    assert reloaded.fingerprints == {instances[0].UniqueId: u"a"}
+    assert reloaded.filter_changed(instances, u"a") == [instances[1]]
+
+
+@pytest.mark.parametrize("content", [None, "{not json", "[1, 2]"])
+def test_missing_or_corrupt_sidecar_gives_a_full_run(tmp_path, content):
+    space, instances = make_model()
+    file_path = str(tmp_path / "fingerprints.json")
+    if content is not None:
+        with open(file_path, "w") as f:
+            f.write(content)
+    store = FingerprintStore.load(file_path)
+    assert len(store) == 0
+    assert plan_changed(space, instances, store) == [21, 22]
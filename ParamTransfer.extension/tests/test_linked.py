@@ -0,0 +1,54 @@
+import math
+
+from param_transfer.benchmark import StandInDefinition, StandInId, StandInLevel, StandInParameter, StandInSpace, StandInXYZ, extract_benchmark_boundary
+from param_transfer.boundaries import BoundaryContainment
+from param_transfer.linked import LinkedSpaceSource
+
+from standins import StandInLinkInstance, StandInTransform
+
+
+def make_space(element_id, loop):
+    return StandInSpace(
+        StandInId(element_id), StandInId(0), StandInLevel(
+            StandInId(1), "Level 1", 0.0),
+        [StandInParameter(StandInDefinition("Number"), "String",
+                          str(element_id))], loop)
+
+
+def make_containment(source, extracted):
+
+    def extract(space):
+        extracted.append(space.Id.IntegerValue)
+        return extract_benchmark_boundary(space)
+
+    def fallback(space, host_point):
+        point = source.inverse.OfPoint(host_point)
+        return space.get_BoundingBox(None).Min.X <= point.X
+
+    return BoundaryContainment(
+        source.boundaries,
+        fn_fallback=fallback,
+        fn_extract=source.get_fn_extract_boundary(extract))
+
+
+def test_linked_boundaries_are_transformed_once_into_host_coordinates():
+    # the link is rotated by 90 degrees and moved by (100, 0, 3)
+    transform = StandInTransform(math.pi / 2, StandInXYZ(100.0, 0.0, 3.0))
+    space = make_space(1, [(0.0, 0.0), (10.0, 0.0), (10.0, 4.0), (0.0, 4.0)])
+    source = LinkedSpaceSource(StandInLinkInstance(), [space], transform)
+    extracted = []
+    contains = make_containment(source, extracted)
+
+    # link (5, 2) is host (98, 5), link (5, 6) is host (94, 5)
+    assert contains(space, StandInXYZ(98.0, 5.0, 4.0))
+    assert not contains(space, StandInXYZ(94.0, 5.0, 4.0))
+    # the height band moved with the link
+    assert not contains(space, StandInXYZ(98.0, 5.0, 1.0))
+    assert contains(space, StandInXYZ(98.0, 5.0, 13.0 - 0.5))
+
+    assert extracted == [1]
+    boundary = source.boundaries[1]
+    assert (boundary.min_z, boundary.max_z) == (3.0, 13.0)
+    # no candidate point was mapped back into the link
+    assert source.inverse.point_count == 0
+    assert contains.fallback_count == 0
@@ -0,0 +1,66 @@
+from param_transfer.benchmark import StandInDefinition, StandInDocument, StandInElement, StandInId, StandInLevel, StandInParameter
+from param_transfer.parameters import ParameterResolver
+
+from standins import make_instance
+
+TYPE_ID = 3
+
+
+class TypeDocument(StandInDocument):
+    """Document with one element type"""
+
+    def __init__(self, element_type):
+        # type: (StandInElement) -> None
+        self.element_type = element_type
+
+    def GetElement(self, element_id):
+        if element_id.IntegerValue == TYPE_ID:
+            return self.element_type
+        return None
+
+
+def make_instances(count):
+    level = StandInLevel(StandInId(1), "Level 1", 0.0)
+    flow = StandInDefinition("Flow")
+    return [
+        make_instance(21 + index, level, 0.0, 0.0, 0.0,
+                      [StandInParameter(flow, "Double", float(index))])
+        for index in range(count)
+    ]
+
+
+def test_instance_parameters_are_looked_up_once_per_type_and_name():
+    instances = make_instances(5)
+    resolver = ParameterResolver(StandInDocument())
+    for _ in range(3):
+        values = [resolver.get(instance, "Flow", include_type=False).AsDouble()
+                  for instance in instances]
+    assert values == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert resolver.lookup_count == 1
+
+
+def test_type_parameters_are_read_once_per_type():
+    element_type = StandInElement(
+        StandInId(TYPE_ID), StandInId(0),
+        StandInLevel(StandInId(1), "Level 1", 0.0),
+        [StandInParameter(StandInDefinition("Size"), "String", u"600x600")])
+    instances = make_instances(4)
+    resolver = ParameterResolver(TypeDocument(element_type))
+    for instance in instances:
+        assert resolver.get(instance, "Size").AsString() == u"600x600"
+    # missed on the instance, found on the type
+    assert resolver.lookup_count == 2
+    # type parameters are not searched without include_type
+    assert resolver.get(instances[0], "Size", include_type=False) is None
+    assert resolver.lookup_count == 3
+
+
+def test_missing_parameters_are_cached_as_misses():
+    instances = make_instances(4)
+    resolver = ParameterResolver(StandInDocument())
+    for _ in range(2):
+        for instance in instances:
+            assert resolver.get(instance, "Missing") is None
+    assert resolver.lookup_count == 1
+    assert resolver.get(instances[0], None) is None
+    assert resolver.lookup_count == 1
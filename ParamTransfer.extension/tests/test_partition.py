@@ -0,0 +1,61 @@
+from param_transfer.assignment import assign_instances_to_spaces
+from param_transfer.benchmark import StandInId, StandInLevel
+from param_transfer.partition import LevelPartition
+
+from standins import make_instance, make_square_space
+
+# levels measured from a survey point 100 feet above the project base point
+SURVEY_ELEVATION = 100.0
+
+
+def make_levels():
+    return [
+        StandInLevel(StandInId(level_id), name, elevation, SURVEY_ELEVATION)
+        for level_id, name, elevation in ((1, "Level 1", 0.0),
+                                          (2, "Level 2", 12.0),
+                                          (3, "Roof", 24.0))
+    ]
+
+
+def test_instances_are_banded_by_project_elevation():
+    level_1, level_2, roof = make_levels()
+    spaces = [make_square_space(11, level_1, 0.0, 0.0),
+              make_square_space(12, level_2, 0.0, 0.0)]
+    partition = LevelPartition(spaces)
+    assert partition.get_band_level_id(5.0) == 1
+    assert partition.get_band_level_id(13.0) == 2
+    # below the lowest and above the highest band
+    assert partition.get_band_level_id(-3.0) == 1
+    assert partition.get_band_level_id(30.0) == 2
+
+    # on a level without spaces, the band of the point is used
+    assert partition.get_instance_level_id(
+        make_instance(21, roof, 5.0, 5.0, 14.0)) == 2
+    assert partition.get_instance_level_id(
+        make_instance(22, level_2, 5.0, 5.0, 5.0)) == 2
+    matched_by_elevation = LevelPartition(spaces, match_by_elevation=True)
+    assert matched_by_elevation.get_instance_level_id(
+        make_instance(22, level_2, 5.0, 5.0, 5.0)) == 1
+
+
+def test_statistics_per_level():
+    level_1, level_2, roof = make_levels()
+    spaces = [make_square_space(11, level_1, 0.0, 0.0),
+              make_square_space(12, level_1, 20.0, 0.0),
+              make_square_space(13, level_2, 0.0, 0.0)]
+    instances = [
+        make_instance(21, level_1, 5.0, 5.0, 2.0),
+        make_instance(22, level_1, 25.0, 5.0, 2.0),
+        make_instance(23, level_1, 15.0, 5.0, 2.0),
+        make_instance(24, level_2, 5.0, 5.0, 14.0),
+        make_instance(25, roof, 5.0, 5.0, 14.0),
+    ]
+    partition = LevelPartition(spaces)
+    partition.add_instances(instances)
+    assignment = assign_instances_to_spaces(
+        instances, spaces, fn_get_space_index=partition.get_space_index)
+    rows = [statistics.as_row()
+            for statistics in partition.update_statistics(assignment)]
+    assert rows == [["Level 1", 2, 3, 2, 1], ["Level 2", 1, 2, 2, 0]]
+    assert [statistics.elevation
+            for statistics in partition.get_statistics()] == [0.0, 12.0]
@@ -0,0 +1,54 @@
+from param_transfer.benchmark import generate_model
+from param_transfer.instrumentation import COUNTER_LOOKUP_PARAMETER, PhaseTimer
+from param_transfer.parameters import ParameterResolver
+from param_transfer.preview import count_by_space, get_space_labels, print_preview
+from param_transfer.write_plan import PlannedWrite, WritePlan
+
+
+class StandInOutput(object):
+    """Output window that keeps the printed tables"""
+
+    def __init__(self):
+        self.tables = []
+
+    def print_md(self, text):
+        pass
+
+    def print_table(self, rows, columns=None, title=None):
+        self.tables.append((title, rows))
+
+    def linkify(self, element_id):
+        return str(element_id.IntegerValue)
+
+
+def make_writes():
+    _, spaces, instances = generate_model(40, level_count=1,
+                                          instances_per_space=10)
+    return [
+        PlannedWrite(instance, instance.LookupParameter("Flow"), 1.0,
+                     spaces[index % 2])
+        for index, instance in enumerate(instances)
+    ], spaces
+
+
+def test_space_labels_are_built_once_per_space():
+    writes, spaces = make_writes()
+    resolver = ParameterResolver()
+    labels = get_space_labels(writes, resolver)
+    assert labels[spaces[0].Id.IntegerValue] == u"1.0001 Office 1.0001"
+    # all spaces share one type, the name is looked up once
+    assert resolver.lookup_count == 1
+    assert sorted(count_by_space(writes, labels)) == [
+        (u"1.0001 Office 1.0001", 20), (u"1.0002 Office 1.0002", 20)
+    ]
+
+
+def test_preview_counts_the_name_lookups():
+    writes, _ = make_writes()
+    timer = PhaseTimer()
+    output = StandInOutput()
+    print_preview(output, WritePlan(writes), timer)
+    assert timer.counters[COUNTER_LOOKUP_PARAMETER] == 1
+    page_title, rows = output.tables[-1]
+    assert page_title == "Planned writes (page 1 of 1)"
+    assert rows[0][1] == u"1.0001 Office 1.0001"
@@ -0,0 +1,85 @@
+from param_transfer import space_cache
+from param_transfer.benchmark import generate_model
+from param_transfer.boundaries import SpaceBoundary
+from param_transfer.space_cache import SpaceGeometry, clear_space_geometry_cache, get_space_geometry, get_space_geometry_cache, invalidate_spaces
+
+PLAIN_TYPES = (dict, list, tuple, str, int, float, type(None))
+
+
+def assert_plain(data):
+    assert isinstance(data, PLAIN_TYPES), type(data)
+    if isinstance(data, dict):
+        for key, value in data.items():
+            assert_plain(key)
+            assert_plain(value)
+    elif isinstance(data, (list, tuple)):
+        for value in data:
+            assert_plain(value)
+
+
+def get_boundary(space):
+    return SpaceBoundary(space.Id.IntegerValue, [([0.0, 1.0, 1.0],
+                                                  [0.0, 0.0, 1.0])], 0.0, 1.0)
+
+
+def test_space_geometry_is_kept_for_the_session():
+    doc, spaces, _ = generate_model(100)
+    geometry = get_space_geometry(doc)
+    geometry.boundaries[spaces[0].Id.IntegerValue] = get_boundary(spaces[0])
+    index = geometry.get_index(spaces[:3])
+
+    # the next run gets the data of the session with its own elements
+    next_geometry = get_space_geometry(doc)
+    assert next_geometry.data is geometry.data
+    assert spaces[0].Id.IntegerValue in next_geometry.boundaries
+    boundary = next_geometry.boundaries[spaces[0].Id.IntegerValue]
+    assert boundary.box == (0.0, 0.0, 1.0, 1.0)
+    next_index = next_geometry.get_index(list(reversed(spaces[:3])))
+    assert next_index is not index
+    box = spaces[1].get_BoundingBox(None)
+    center = ((box.Min.X + box.Max.X) / 2.0, (box.Min.Y + box.Max.Y) / 2.0)
+    assert next_index.candidates(*center) == index.candidates(*center)
+
+    clear_space_geometry_cache(doc.Title)
+    assert len(get_space_geometry(doc)) == 0
+    clear_space_geometry_cache()
+
+
+def test_session_store_holds_only_plain_data():
+    doc, spaces, _ = generate_model(100)
+    geometry = get_space_geometry(doc)
+    geometry.boundaries[spaces[0].Id.IntegerValue] = get_boundary(spaces[0])
+    geometry.get_index(spaces[:3])
+    geometry.get_index(spaces[3:6], cell_size=5.0)
+    assert_plain(get_space_geometry_cache())
+    clear_space_geometry_cache()
+
+
+def test_least_recently_used_indexes_are_evicted(monkeypatch):
+    monkeypatch.setattr(space_cache, "MAX_CACHED_INDEXES", 2)
+    _, spaces, _ = generate_model(100)
+    geometry = SpaceGeometry()
+    first_key = (tuple(space.Id.IntegerValue for space in spaces[:3]), None)
+    geometry.get_index(spaces[:3])
+    geometry.get_index(spaces[3:6])
+    # the first index is used again, the second one is the oldest
+    geometry.get_index(spaces[:3])
+    geometry.get_index(spaces[6:9])
+    assert len(geometry.data["indexes"]) == 2
+    assert geometry.data["index_keys"][0] == first_key
+    assert (tuple(space.Id.IntegerValue for space in spaces[3:6]),
+            None) not in geometry.data["indexes"]
+
+
+def test_changed_spaces_drop_their_indexes():
+    doc, spaces, _ = generate_model(100)
+    geometry = get_space_geometry(doc)
+    geometry.boundaries[spaces[0].Id.IntegerValue] = get_boundary(spaces[0])
+    geometry.get_index(spaces[:3])
+    geometry.get_index(spaces[3:6])
+    invalidate_spaces(doc.Title, set([spaces[0].Id.IntegerValue]))
+    assert geometry.data["index_keys"] == [
+        (tuple(space.Id.IntegerValue for space in spaces[3:6]), None)
+    ]
+    assert spaces[0].Id.IntegerValue not in get_space_geometry(doc).boundaries
+    clear_space_geometry_cache()
@@ -0,0 +1,38 @@
+from param_transfer.spatial_index import SpaceGridIndex
+
+# two 10 x 10 spaces side by side and one 30 x 10 space above them
+BOXES = [
+    ("A", (0.0, 0.0, 10.0, 10.0)),
+    ("B", (10.0, 0.0, 20.0, 10.0)),
+    ("C", (0.0, 10.0, 30.0, 20.0)),
+]
+
+
+def test_point_on_a_cell_border_finds_both_spaces():
+    index = SpaceGridIndex(BOXES, cell_size=10.0)
+    assert sorted(index.candidates(10.0, 5.0)) == ["A", "B"]
+    assert sorted(index.candidates(10.0, 10.0)) == ["A", "B", "C"]
+    assert index.candidates(5.0, 5.0) == ["A"]
+
+
+def test_space_spanning_several_cells_is_found_in_each():
+    index = SpaceGridIndex(BOXES, cell_size=10.0)
+    for x in (1.0, 15.0, 25.0, 29.5):
+        assert index.candidates(x, 15.0) == ["C"]
+    assert index.candidates(25.0, 5.0) == []
+    assert index.candidates(31.0, 15.0) == []
+
+
+def test_boxes_are_normalized_and_the_tolerance_applies():
+    index = SpaceGridIndex([("A", (10.0, 10.0, 0.0, 0.0))], cell_size=4.0,
+                           tolerance=0.1)
+    assert index.candidates(5.0, 5.0) == ["A"]
+    assert index.candidates(10.05, 5.0) == ["A"]
+    assert index.candidates(10.2, 5.0) == []
+
+
+def test_empty_index():
+    index = SpaceGridIndex([])
+    assert len(index) == 0
+    assert index.cell_size == 1.0
+    assert index.candidates(0.0, 0.0) == []
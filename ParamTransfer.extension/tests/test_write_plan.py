@@ -0,0 +1,58 @@
+# coding: UTF-8
+from param_transfer.values import FormattedValue, ValueConverter
+from param_transfer.write_plan import PlannedWrite, WritePlan, diff_write_plan, is_noop_write
+
+from standins import DisplayParameter, UnitsDocument
+
+
+def make_write(parameter, value):
+    return PlannedWrite(None, parameter, value, None)
+
+
+def test_formatted_value_with_other_rounding_is_a_noop():
+    converter = ValueConverter(UnitsDocument("Comma", "Dot"))
+    parameter = DisplayParameter("Area", "Double", 12.5, u"12,50 m²")
+    assert is_noop_write(make_write(parameter, FormattedValue(u"12,5 m²")),
+                         converter)
+    assert is_noop_write(make_write(parameter, FormattedValue(u"12,5")),
+                         converter)
+
+
+def test_formatted_value_with_new_number_is_written():
+    converter = ValueConverter(UnitsDocument("Comma", "Dot"))
+    parameter = DisplayParameter("Area", "Double", 12.5, u"12,50 m²")
+    assert not is_noop_write(
+        make_write(parameter, FormattedValue(u"13 m²")), converter)
+
+
+def test_formatted_value_in_another_unit_is_written():
+    converter = ValueConverter(UnitsDocument("Comma", "Dot"))
+    parameter = DisplayParameter("Area", "Double", 12.5, u"12,50 m²")
+    assert not is_noop_write(
+        make_write(parameter, FormattedValue(u"12,5 ft²")), converter)
+
+
+def test_formatted_value_into_integer():
+    converter = ValueConverter(UnitsDocument())
+    parameter = DisplayParameter("Count", "Integer", 1234, u"1,234")
+    assert is_noop_write(make_write(parameter, FormattedValue(u"1,234")),
+                         converter)
+    assert not is_noop_write(make_write(parameter, FormattedValue(u"1,235")),
+                             converter)
+
+
+def test_without_converter_display_strings_are_compared():
+    parameter = DisplayParameter("Area", "Double", 12.5, u"12,50 m²")
+    assert not is_noop_write(make_write(parameter, FormattedValue(u"12,5 m²")))
+    assert is_noop_write(make_write(parameter, FormattedValue(u"12,50 m²")))
+
+
+def test_diff_counts_the_skipped_writes():
+    converter = ValueConverter(UnitsDocument("Comma", "Dot"))
+    unchanged = DisplayParameter("Area", "Double", 12.5, u"12,50 m²")
+    changed = DisplayParameter("Volume", "Double", 30.0, u"30,00 m³")
+    plan = WritePlan([make_write(unchanged, FormattedValue(u"12,5 m²")),
+                      make_write(changed, FormattedValue(u"31 m³"))])
+    diffed_plan = diff_write_plan(plan, converter)
+    assert diffed_plan.skipped_count == 1
+    assert [write.parameter for write in diffed_plan] == [changed]